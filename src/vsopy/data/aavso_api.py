@@ -1,7 +1,8 @@
+import asyncio
 import functools
 import io
 import astropy.units as u
-from astropy.utils.data import download_file
+from astropy.utils.data import clear_download_cache, download_file
 from astropy.units import Quantity
 from collections.abc import Callable
 
@@ -65,6 +66,34 @@ class AavsoApi:
         """
         with self.fetch(uri) as stream:
             return stream.read()
+
+    async def fetch_content_async(self, uri: str) -> str:
+        """Fetch content like :py:meth:`fetch_content` without blocking the event loop.
+
+        The download runs in a thread, so many URIs can be fetched
+        concurrently, e.g. by :py:func:`~vsopy.util.gather_bounded`.
+        Unlike :py:meth:`fetch_content`, a failed download raises instead
+        of returning an error message.
+
+        :param uri: URI to fetch content from.
+        :type uri: str
+        :raises Exception: if the download fails
+        :return: Content of the URI as a string.
+        :rtype: str
+        """
+        def fetch():
+            with open(download_file(uri, cache=self.cache_web_content)) as stream:
+                return stream.read()
+        return await asyncio.to_thread(fetch)
+
+    def discard(self, uri: str) -> None:
+        """Remove content of the URI from the web content cache, e.g. an error response.
+
+        :param uri: URI of the cached content.
+        :type uri: str
+        """
+        clear_download_cache(uri)
+
     @staticmethod
     def _fetch_content(uri:Callable[..., str]) -> Callable[..., str]:
         """Decorator to fetch content from a given URI.
@@ -77,6 +106,9 @@ class AavsoApi:
             def my_method(self, arg1, arg2):
                 return f"http://example.com/api?arg1={arg1}&arg2={arg2}"
 
+        The URI of a call is available without fetching as
+        ``AavsoApi.my_method.uri(api, arg1, arg2)``.
+
         :param uri: callable that returns a URI string.
         :type uri: callable
         :return: A wrapper function that fetches content from the URI
@@ -85,6 +117,7 @@ class AavsoApi:
         @functools.wraps(uri)
         def fetcher(self, *args, **kwargs):
             return self.fetch_content(uri(self, *args, **kwargs))
+        fetcher.uri = uri
         return fetcher
 
     @_fetch_content
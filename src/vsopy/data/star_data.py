@@ -1,8 +1,9 @@
 import astropy.units as u
 import numpy as np
 from vsopy.data import AavsoApi, AavsoParser, PersistentTable
+from vsopy.util import gather_bounded
 from os import PathLike
-from typing import Mapping, Any
+from typing import Any, Callable, Mapping
 from astropy.coordinates import SkyCoord
 from astropy.table import QTable, unique, vstack
 from itertools import dropwhile
@@ -217,6 +218,68 @@ class StarData:
         else:
             return cached
 
+    def chart_uris(self, object_name:str,
+                   fov:u.Quantity[u.arcmin],
+                   maglimit:u.Quantity[u.mag]=16.0*u.mag) -> dict[str, Callable[[str], Any]]:
+        """ URIs :py:meth:`collect_stars` would download for an object.
+
+            Charts and targets stored in the charts directory are not
+            downloaded again, so their URIs are not listed.
+
+            Returns:
+            uris: parser of the content of every URI, raising on error responses
+        """
+        parse_chart = self.parser_.parse_norm_chart if self.normalize_ else self.parser_.parse_chart
+        uris = {}
+        if self.is_std_field(object_name):
+            for name in self.std_fields['name']:
+                if name != object_name and not name.startswith(f"{object_name} "):
+                    continue
+                field = self.std_fields_.row_by_key('name', name)
+                if not self.charts_.row_by_keys(dict(name=name, fov=field['fov'], maglimit=maglimit)):
+                    uris[AavsoApi.get_std_field_chart.uri(
+                        self.api_, field['radec2000'].ra, field['radec2000'].dec, field['fov'], maglimit)] = parse_chart
+        else:
+            fov = preferred_fov(fov)
+            if not self.charts_.row_by_keys(dict(name=object_name, fov=fov, maglimit=maglimit)):
+                uris[AavsoApi.get_star_chart.uri(self.api_, object_name, fov, maglimit)] = parse_chart
+            if not self.targets_.row_by_key('name', object_name):
+                uris[AavsoApi.get_vsx_votable.uri(self.api_, object_name)] = self.parser_.parse_vsx_votable
+        return uris
+
+    async def prefetch(self, object_names:list[str],
+                       fov:u.Quantity[u.arcmin],
+                       maglimit:u.Quantity[u.mag]=16.0*u.mag,
+                       limit:int=8) -> int:
+        """ Download content for many objects concurrently.
+
+            Responses land in the web content cache, so subsequent
+            :py:meth:`collect_stars` calls parse them without waiting for
+            the network.  Nothing is downloaded if web content is not cached.
+            Failed downloads and error responses of the API are not counted
+            and not kept in the cache; they are left to :py:meth:`collect_stars`
+            to report.
+
+            Returns:
+            count: number of downloaded URIs
+        """
+        if not self.api_.cache_web_content:
+            return 0
+        uris = {uri: parse for name in object_names
+                for uri, parse in self.chart_uris(name, fov, maglimit).items()}
+
+        async def fetch(uri, parse):
+            text = await self.api_.fetch_content_async(uri)
+            try:
+                parse(text)
+            except Exception:
+                self.api_.discard(uri)
+                raise
+
+        results = await gather_bounded((fetch(uri, parse) for uri, parse in uris.items()),
+                                       limit, return_exceptions=True)
+        return sum(not isinstance(result, Exception) for result in results)
+
     def collect_stars(self, object_name:str,
                   fov:u.Quantity[u.arcmin],
                   maglimit:u.Quantity[u.mag]=16.0*u.mag) -> tuple[QTable, QTable]:
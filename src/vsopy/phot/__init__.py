@@ -1,4 +1,10 @@
 from .batch_data_provider import BatchDataProvider
+from .aperture_engine import *
+from .cache import PhotometryCache
+from .catalog import CentroidCatalog
+from .background import SKY_ESTIMATORS, SkyBackground, annulus_background, clipped_background
 from .classic_transform import *
+from .shape import ShapeStats, measure_shapes, shape_moments
 from .measure import *
+from .optimize import ApertureChoice, optimize_aperture, snr_matrix
 from .transform import *
\ No newline at end of file
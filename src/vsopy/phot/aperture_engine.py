@@ -0,0 +1,489 @@
+import astropy.units as u # type: ignore
+import numpy as np
+from astropy.coordinates import SkyCoord # type: ignore
+from astropy.nddata import CCDData # type: ignore
+from photutils.aperture import SkyCircularAperture # type: ignore
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from vsopy.util import Aperture
+from .catalog import CentroidCatalog
+
+
+class PixelApertures(NamedTuple):
+    """Circular apertures and annuli projected to the pixel grid of an image."""
+    x: np.ndarray
+    """Column coordinates of aperture centers, pixels."""
+    y: np.ndarray
+    """Row coordinates of aperture centers, pixels."""
+    r: float | np.ndarray
+    """Aperture radius, pixels; a 1D array of radii measures several apertures
+    sharing the same annulus."""
+    r_in: float
+    """Inner annulus radius, pixels."""
+    r_out: float
+    """Outer annulus radius, pixels."""
+
+
+class RegionSums(NamedTuple):
+    """Pixel statistics of a region (aperture or annulus) for every star.
+
+    ``sum``, ``sum_err`` and ``area`` use exact pixel overlap weights,
+    ``mean``, ``max`` and ``count`` use the pixels with centers inside the region,
+    the same way as :py:class:`~photutils.aperture.ApertureStats` does.
+    """
+    sum: np.ndarray
+    """Overlap-weighted sum of pixel values."""
+    sum_err: np.ndarray
+    """Uncertainty of the sum propagated from the image uncertainty."""
+    area: np.ndarray
+    """Overlap-weighted area of unmasked pixels, pixels."""
+    mean: np.ndarray
+    """Mean of the unmasked pixel values."""
+    max: np.ndarray
+    """Maximum of the unmasked pixel values."""
+    count: np.ndarray
+    """Number of unmasked pixels."""
+
+
+class PhotometrySums(NamedTuple):
+    """Result of :py:func:`measure_apertures`.
+
+    Aperture statistics and centroids have shape (N,) for a single aperture
+    radius and (N, K) for K radii.
+    """
+    aperture: RegionSums
+    """Statistics of the central aperture."""
+    annulus: RegionSums
+    """Statistics of the sky annulus."""
+    x_centroid: np.ndarray
+    """Column coordinates of the flux centroid within the aperture, pixels."""
+    y_centroid: np.ndarray
+    """Row coordinates of the flux centroid within the aperture, pixels."""
+
+
+def pixel_scale(wcs, coord:SkyCoord) -> float:
+    """Local pixel scale of the image at the given position.
+
+    Uses the same estimate as photutils when converting sky apertures to pixels,
+    so that radii projected here match :py:meth:`SkyCircularAperture.to_pixel`.
+
+    :param wcs: image WCS
+    :type wcs: :py:class:`~astropy.wcs.WCS`
+    :param coord: scalar sky position
+    :type coord: :py:class:`~astropy.coordinates.SkyCoord`
+    :return: pixels per arcsecond
+    :rtype: float
+    """
+    return float(SkyCircularAperture(coord, r=1*u.arcsec).to_pixel(wcs).r)
+
+
+def project_apertures(wcs, coords:SkyCoord | CentroidCatalog,
+                      aperture:Aperture | Sequence[Aperture]) -> PixelApertures:
+    """Project all aperture centers and radii to pixels in one WCS call.
+
+    Radii are converted using the pixel scale at the first position,
+    as photutils does for sky apertures.
+
+    :param wcs: image WCS
+    :type wcs: :py:class:`~astropy.wcs.WCS`
+    :param coords: aperture centers
+    :type coords: :py:class:`~astropy.coordinates.SkyCoord` or
+                  :py:class:`~vsopy.phot.catalog.CentroidCatalog`
+    :param aperture: aperture and annulus radii in sky coordinates, or a list of
+                     apertures with the same annulus and different radii
+    :type aperture: Aperture or list[Aperture]
+    :return: apertures in pixel coordinates
+    :rtype: PixelApertures
+    :raises ValueError: if the apertures have different annuli
+    """
+    if isinstance(coords, CentroidCatalog):
+        x, y = coords.to_pixel(wcs)
+        first = coords[:1].coords[0] if len(x) > 0 else None
+    else:
+        x, y = wcs.world_to_pixel(coords)
+        x, y = np.atleast_1d(x).astype(float), np.atleast_1d(y).astype(float)
+        first = coords[0] if len(x) > 0 else None
+    scale = pixel_scale(wcs, first) if first is not None else 0.0
+    if isinstance(aperture, Aperture):
+        r = aperture.r.to(u.arcsec).value * scale
+        annulus = aperture
+    else:
+        apertures = list(aperture)
+        annulus = apertures[0]
+        if any(a.r_in != annulus.r_in or a.r_out != annulus.r_out for a in apertures):
+            raise ValueError("Apertures must share the same annulus")
+        r = np.array([a.r.to(u.arcsec).value for a in apertures]) * scale
+    return PixelApertures(x, y, r,
+                          annulus.r_in.to(u.arcsec).value * scale,
+                          annulus.r_out.to(u.arcsec).value * scale)
+
+
+def _quadrant_area(x, y, r):
+    """Area of the circle of radius r centered at origin within [0, x] x [0, y], x, y >= 0."""
+    x = np.minimum(x, r)
+    y = np.minimum(y, r)
+    r2 = r * r
+    xc = np.sqrt(np.maximum(r2 - y * y, 0.))
+
+    def primitive(t):
+        # integral of sqrt(r^2 - t^2)
+        return 0.5 * (t * np.sqrt(np.maximum(r2 - t * t, 0.))
+                      + r2 * np.arcsin(np.clip(t / r, -1., 1.)))
+
+    return np.where(x <= xc, x * y, y * xc + primitive(x) - primitive(xc))
+
+
+def circular_overlap(x_edges:np.ndarray, y_edges:np.ndarray, r:float) -> np.ndarray:
+    """Exact overlap of a circle with the pixels of a stamp, for a batch of stamps.
+
+    The circle is centered at the origin; pixel edges are given relative to it.
+    The area is evaluated in closed form as inclusion-exclusion of the cumulative
+    area function over pixel corners, so that all pixels of all stamps are
+    computed at once.
+
+    :param x_edges: column edges of the stamp pixels, shape (N, S+1)
+    :type x_edges: :py:class:`~numpy.ndarray`
+    :param y_edges: row edges of the stamp pixels, shape (N, S+1)
+    :type y_edges: :py:class:`~numpy.ndarray`
+    :param r: circle radius, pixels
+    :type r: float
+    :return: overlap fractions, shape (N, S, S), indexed as [star, row, column]
+    :rtype: :py:class:`~numpy.ndarray`
+    """
+    x_edges = np.asarray(x_edges, dtype=float)
+    y_edges = np.asarray(y_edges, dtype=float)
+    n, s = x_edges.shape[0], x_edges.shape[1] - 1
+    if r <= 0:
+        return np.zeros((n, s, s))
+    xe = x_edges[:, np.newaxis, :]
+    ye = y_edges[:, :, np.newaxis]
+    cumulative = np.sign(xe) * np.sign(ye) * _quadrant_area(np.abs(xe), np.abs(ye), r)
+    overlap = (cumulative[:, 1:, 1:] - cumulative[:, 1:, :-1]
+               - cumulative[:, :-1, 1:] + cumulative[:, :-1, :-1])
+
+    # snap pixels entirely inside or outside of the circle
+    x_near = np.minimum(np.abs(x_edges[:, :-1]), np.abs(x_edges[:, 1:]))
+    x_near[np.sign(x_edges[:, :-1]) != np.sign(x_edges[:, 1:])] = 0.
+    y_near = np.minimum(np.abs(y_edges[:, :-1]), np.abs(y_edges[:, 1:]))
+    y_near[np.sign(y_edges[:, :-1]) != np.sign(y_edges[:, 1:])] = 0.
+    x_far = np.maximum(np.abs(x_edges[:, :-1]), np.abs(x_edges[:, 1:]))
+    y_far = np.maximum(np.abs(y_edges[:, :-1]), np.abs(y_edges[:, 1:]))
+    near = y_near[:, :, np.newaxis]**2 + x_near[:, np.newaxis, :]**2
+    far = y_far[:, :, np.newaxis]**2 + x_far[:, np.newaxis, :]**2
+    overlap[near >= r * r] = 0.
+    overlap[far <= r * r] = 1.
+    return overlap
+
+
+class _Stamps(NamedTuple):
+    data: np.ndarray
+    variance: np.ndarray | None
+    valid: np.ndarray
+    x_edges: np.ndarray
+    y_edges: np.ndarray
+    dist2: np.ndarray
+    cols: np.ndarray
+    rows: np.ndarray
+
+
+def _stamp_half_size(r_out:float) -> int:
+    return int(np.ceil(r_out)) + 1
+
+
+def _cut_stamps(data, variance, mask, x, y, half):
+    """Gather square stamps around all positions with fancy indexing.
+
+    Pixels outside the image are marked invalid, as well as non-finite and
+    masked ones.
+    """
+    ny, nx = data.shape
+    offsets = np.arange(-half, half + 1)
+    cols = np.floor(x + 0.5).astype(int)[:, np.newaxis] + offsets
+    rows = np.floor(y + 0.5).astype(int)[:, np.newaxis] + offsets
+    in_x = (cols >= 0) & (cols < nx)
+    in_y = (rows >= 0) & (rows < ny)
+    index = (np.clip(rows, 0, ny - 1)[:, :, np.newaxis],
+             np.clip(cols, 0, nx - 1)[:, np.newaxis, :])
+    stamp = data[index].astype(float)
+    valid = in_y[:, :, np.newaxis] & in_x[:, np.newaxis, :] & np.isfinite(stamp)
+    if mask is not None:
+        valid &= ~mask[index]
+    stamp_var = None if variance is None else variance(index)
+
+    dx = cols - x[:, np.newaxis]
+    dy = rows - y[:, np.newaxis]
+    return _Stamps(stamp, stamp_var, valid, _edges(dx), _edges(dy),
+                   dy[:, :, np.newaxis]**2 + dx[:, np.newaxis, :]**2,
+                   cols, rows)
+
+
+def _region_sums(stamps:_Stamps, weights:np.ndarray, center:np.ndarray) -> RegionSums:
+    valid = stamps.valid
+    data = np.where(valid, stamps.data, 0.)
+    weighted = valid & (weights > 0)
+    has_weighted = np.any(weighted, axis=(1, 2))
+
+    total = np.sum(data * weights, axis=(1, 2))
+    total[~has_weighted] = np.nan
+    if stamps.variance is None:
+        err = np.full(len(total), np.nan)
+    else:
+        err = np.sqrt(np.sum(np.where(weighted, stamps.variance * weights, 0.), axis=(1, 2)))
+        err[~has_weighted] = np.nan
+
+    centered = center & valid
+    count = np.sum(centered, axis=(1, 2))
+    area = np.sum(weights * valid, axis=(1, 2))
+    area[count == 0] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.sum(data * centered, axis=(1, 2)) / count
+    peak = np.max(np.where(centered, stamps.data, -np.inf), axis=(1, 2))
+    peak[count == 0] = np.nan
+    return RegionSums(total, err, area, mean, peak, count)
+
+
+def _centroids(stamps:_Stamps, center:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    data = np.where(center & stamps.valid, stamps.data, 0.)
+    m00 = np.sum(data, axis=(1, 2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        xc = np.sum(data * stamps.cols[:, np.newaxis, :], axis=(1, 2)) / m00
+        yc = np.sum(data * stamps.rows[:, :, np.newaxis], axis=(1, 2)) / m00
+    return xc, yc
+
+
+def _concat_sums(parts:list[RegionSums]) -> RegionSums:
+    return RegionSums(*[np.concatenate(field) for field in zip(*parts)])
+
+
+class _Geometry(NamedTuple):
+    ann_weights: np.ndarray
+    ann_center: np.ndarray
+    ap_weights: np.ndarray
+    ap_center: np.ndarray
+
+
+def _edges(offsets:np.ndarray) -> np.ndarray:
+    return np.concatenate([offsets - 0.5, offsets[:, -1:] + 0.5], axis=1)
+
+
+def _geometry(x_edges, y_edges, dist2, radii, r_in, r_out) -> _Geometry:
+    """Overlap weights and center masks of the annulus and all aperture radii."""
+    ann_weights = (circular_overlap(x_edges, y_edges, r_out)
+                   - circular_overlap(x_edges, y_edges, r_in))
+    ann_center = (dist2 < r_out**2) & ~(dist2 < r_in**2)
+    ap_weights = np.stack([circular_overlap(x_edges, y_edges, r) for r in radii], axis=1)
+    ap_center = np.stack([dist2 < r**2 for r in radii], axis=1)
+    return _Geometry(ann_weights, ann_center, ap_weights, ap_center)
+
+
+class MaskCache:
+    """Aperture and annulus mask templates keyed by sub-pixel phase.
+
+    Masks of a circular aperture differ between stars only by the sub-pixel
+    phase of the center, i.e. its offset from the nearest pixel center.  The phase
+    is quantized to ``1/phase_steps`` pixel, and masks are computed once per
+    quantized phase and reused for all stars and all frames with the same pixel
+    radii; only the integer part of the per-frame offset moves the stamps.
+    The maximal position error is half of the quantization step.
+    """
+    def __init__(self, apertures:PixelApertures, phase_steps:int=20,
+                 tolerance:float=1e-3) -> None:
+        """Create an empty cache for apertures of the given pixel radii.
+
+        :param apertures: apertures defining the radii; positions are ignored
+        :type apertures: PixelApertures
+        :param phase_steps: number of quantization steps per pixel, defaults to 20
+        :type phase_steps: int, optional
+        :param tolerance: radius difference in pixels allowing to reuse the cache
+                          for other apertures, defaults to 1e-3
+        :type tolerance: float, optional
+        """
+        self.radii_ = np.atleast_1d(apertures.r).astype(float)
+        self.r_in_ = float(apertures.r_in)
+        self.r_out_ = float(apertures.r_out)
+        self.half_ = _stamp_half_size(max(self.r_out_, np.max(self.radii_, initial=0)))
+        self.steps_ = phase_steps
+        self.tolerance_ = tolerance
+        self.keys_ = {}
+        size = 2 * self.half_ + 1
+        self.templates_ = _Geometry(np.zeros((0, size, size)),
+                                    np.zeros((0, size, size), dtype=bool),
+                                    np.zeros((0, len(self.radii_), size, size)),
+                                    np.zeros((0, len(self.radii_), size, size), dtype=bool))
+
+    def __len__(self) -> int:
+        """Number of cached templates."""
+        return len(self.keys_)
+
+    @property
+    def half_size(self) -> int:
+        """Stamp half-size in pixels."""
+        return self.half_
+
+    def matches(self, apertures:PixelApertures) -> bool:
+        """Check whether the cached templates are valid for the apertures.
+
+        :param apertures: apertures projected to an image
+        :type apertures: PixelApertures
+        :return: True if all radii match within tolerance
+        :rtype: bool
+        """
+        radii = np.atleast_1d(apertures.r)
+        return (radii.shape == self.radii_.shape
+                and np.all(np.abs(radii - self.radii_) <= self.tolerance_)
+                and abs(apertures.r_in - self.r_in_) <= self.tolerance_
+                and abs(apertures.r_out - self.r_out_) <= self.tolerance_)
+
+    def prepare(self, x:np.ndarray, y:np.ndarray) -> None:
+        """Compute templates for the positions not seen before.
+
+        After preparation :py:meth:`geometry` for the same positions does not
+        modify the cache and may be called from several threads.
+        """
+        missing = sorted(set(self._keys(x, y)) - self.keys_.keys())
+        if missing:
+            self._add(missing)
+
+    def geometry(self, x:np.ndarray, y:np.ndarray) -> _Geometry:
+        """Masks for stamps centered at the nearest pixels to the positions.
+
+        Templates for phases not seen before are computed in one batch and added
+        to the cache.
+        """
+        self.prepare(x, y)
+        index = np.array([self.keys_[key] for key in self._keys(x, y)], dtype=int)
+        return _Geometry(*[template[index] for template in self.templates_])
+
+    def _keys(self, x, y):
+        qx = np.rint((x - np.floor(x + 0.5)) * self.steps_).astype(int)
+        qy = np.rint((y - np.floor(y + 0.5)) * self.steps_).astype(int)
+        return list(zip(qx.tolist(), qy.tolist()))
+
+    def _add(self, keys):
+        offsets = np.arange(-self.half_, self.half_ + 1)
+        px = np.array([kx for kx, _ in keys]) / self.steps_
+        py = np.array([ky for _, ky in keys]) / self.steps_
+        dx = offsets - px[:, np.newaxis]
+        dy = offsets - py[:, np.newaxis]
+        dist2 = dy[:, :, np.newaxis]**2 + dx[:, np.newaxis, :]**2
+        added = _geometry(_edges(dx), _edges(dy), dist2,
+                          self.radii_, self.r_in_, self.r_out_)
+        self.templates_ = _Geometry(*[np.concatenate([old, new])
+                                      for old, new in zip(self.templates_, added)])
+        for key in keys:
+            self.keys_[key] = len(self.keys_)
+
+
+def _image_arrays(image:CCDData):
+    data = np.asarray(image.data)
+    error = None if image.uncertainty is None else np.asarray(image.uncertainty.array)
+    mask = None if image.mask is None else np.asarray(image.mask, dtype=bool)
+    variance = None if error is None else (lambda index: error[index].astype(float)**2)
+    return data, variance, mask
+
+
+_THREADS = 1
+
+def set_threads(threads:int) -> None:
+    """Set the default number of threads for :py:func:`measure_apertures`.
+
+    Use it to split cores between processes: with P worker processes on a
+    machine with C cores every process should use ``C // P`` threads.
+
+    :param threads: number of threads, at least 1
+    :type threads: int
+    """
+    global _THREADS
+    _THREADS = max(1, int(threads))
+
+def get_threads() -> int:
+    """Default number of threads for :py:func:`measure_apertures`."""
+    return _THREADS
+
+
+def measure_apertures(image:CCDData, apertures:PixelApertures,
+                      chunk_size:int=256, cache:MaskCache | None=None,
+                      threads:int | None=None) -> PhotometrySums:
+    """Aperture and annulus statistics for all stars in vectorized batches.
+
+    The stars are processed in chunks of ``chunk_size``; for each chunk square pixel
+    stamps large enough for the annulus are gathered from the image, exact overlap
+    weights are computed by :py:func:`circular_overlap`, and all sums are reduced
+    over the stamp axes at once.  The results reproduce
+    :py:class:`~photutils.aperture.ApertureStats` with the default ``'exact'``
+    sum method: ``sum``, ``sum_err`` and ``sum_aper_area`` for exact overlap,
+    ``mean``, ``max`` and the centroid for pixels with centers inside the region.
+    Non-finite and masked pixels as well as pixels outside the image are excluded.
+
+    With more than one thread the chunks are processed by a thread pool; NumPy
+    releases the GIL in the array kernels, so the chunks run in parallel.
+    The chunk size is reduced if needed so that every thread gets a chunk.
+
+    :param image: image with optional uncertainty (standard deviation) and mask;
+                  arrays are read in place, never copied as a whole.
+    :type image: :py:class:`~astropy.nddata.CCDData`
+    :param apertures: apertures in pixel coordinates; for multiple radii the
+                      stamps and the annulus statistics are computed once and
+                      shared by all apertures
+    :type apertures: PixelApertures
+    :param chunk_size: number of stars per batch, bounds temporary memory, defaults to 256
+    :type chunk_size: int, optional
+    :param cache: mask templates to use instead of exact masks for every star,
+                  must match the apertures (see :py:meth:`MaskCache.matches`),
+                  defaults to None
+    :type cache: MaskCache, optional
+    :param threads: number of threads, defaults to :py:func:`get_threads`
+    :type threads: int, optional
+    :return: aperture and annulus statistics, in the order of input positions
+    :rtype: PhotometrySums
+    """
+    data, variance, mask = _image_arrays(image)
+    radii = np.atleast_1d(apertures.r)
+    half = (_stamp_half_size(max(apertures.r_out, np.max(radii, initial=0)))
+            if cache is None else cache.half_size)
+    threads = get_threads() if threads is None else max(1, threads)
+    count = len(apertures.x)
+    if threads > 1:
+        chunk_size = max(1, min(chunk_size, -(-count // threads)))
+    if cache is not None:
+        cache.prepare(apertures.x, apertures.y)
+
+    def measure_chunk(start):
+        end = start + chunk_size
+        x, y = apertures.x[start:end], apertures.y[start:end]
+        stamps = _cut_stamps(data, variance, mask, x, y, half)
+        geometry = (_geometry(stamps.x_edges, stamps.y_edges, stamps.dist2,
+                              radii, apertures.r_in, apertures.r_out)
+                    if cache is None else cache.geometry(x, y))
+
+        ann_sums = _region_sums(stamps, geometry.ann_weights, geometry.ann_center)
+        ap_sums, xc, yc = [], [], []
+        for k in range(len(radii)):
+            ap_center = geometry.ap_center[:, k]
+            ap_sums.append(_region_sums(stamps, geometry.ap_weights[:, k], ap_center))
+            x_centroid, y_centroid = _centroids(stamps, ap_center)
+            xc.append(x_centroid)
+            yc.append(y_centroid)
+        return (RegionSums(*[np.stack(field, axis=1) for field in zip(*ap_sums)]),
+                ann_sums, np.stack(xc, axis=1), np.stack(yc, axis=1))
+
+    starts = range(0, count, chunk_size)
+    if threads > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            parts = list(executor.map(measure_chunk, starts))
+    else:
+        parts = [measure_chunk(start) for start in starts]
+
+    if not parts:
+        ap_empty = RegionSums(*[np.zeros((0, len(radii)))] * 6)
+        ann_empty = RegionSums(*[np.zeros(0)] * 6)
+        sums = PhotometrySums(ap_empty, ann_empty, ap_empty.sum, ap_empty.sum)
+    else:
+        ap_parts, ann_parts, xc_parts, yc_parts = zip(*parts)
+        sums = PhotometrySums(_concat_sums(ap_parts), _concat_sums(ann_parts),
+                              np.concatenate(xc_parts), np.concatenate(yc_parts))
+    if np.ndim(apertures.r) == 0:
+        sums = PhotometrySums(RegionSums(*[field[:, 0] for field in sums.aperture]),
+                              sums.annulus, sums.x_centroid[:, 0], sums.y_centroid[:, 0])
+    return sums
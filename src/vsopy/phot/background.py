@@ -0,0 +1,105 @@
+import bottleneck as bn
+import numpy as np
+from astropy.nddata import CCDData # type: ignore
+from typing import NamedTuple
+from .aperture_engine import PixelApertures, _cut_stamps, _image_arrays, _stamp_half_size
+
+SKY_ESTIMATORS = ['mean', 'median', 'mode']
+
+
+class SkyBackground(NamedTuple):
+    """Sky background estimate for every star."""
+    level: np.ndarray
+    """Sky level per pixel."""
+    sigma: np.ndarray
+    """Standard deviation of the clipped sky pixels."""
+    count: np.ndarray
+    """Number of sky pixels left after clipping."""
+
+
+def clipped_background(values:np.ndarray, method:str='median',
+                       sigma:float=3., maxiters:int=5) -> SkyBackground:
+    """Sigma-clipped statistics along rows of a padded array.
+
+    Each row holds the sample of one star, padded with NaN.  Clipping follows
+    :py:func:`~astropy.stats.sigma_clipped_stats` with default parameters:
+    values farther than ``sigma`` standard deviations from the median are
+    rejected until no more values are clipped or ``maxiters`` is reached.
+    The mode is estimated as :math:`3 \\cdot median - 2 \\cdot mean`.
+
+    :param values: padded samples, shape (N, M)
+    :type values: :py:class:`~numpy.ndarray`
+    :param method: sky level estimator, one of `mean`, `median` and `mode`,
+                   defaults to `median`
+    :type method: str, optional
+    :param sigma: clipping threshold in standard deviations, defaults to 3
+    :type sigma: float, optional
+    :param maxiters: maximal number of clipping iterations, defaults to 5
+    :type maxiters: int, optional
+    :raises ValueError: if the method is unknown
+    :return: sky level, sigma and pixel count per row
+    :rtype: SkyBackground
+    """
+    if method not in SKY_ESTIMATORS:
+        raise ValueError(f"Unknown sky estimator '{method}', expected one of {SKY_ESTIMATORS}")
+    values = np.array(values, dtype=float)
+    for _ in range(maxiters):
+        center = bn.nanmedian(values, axis=1)[:, np.newaxis]
+        std = bn.nanstd(values, axis=1)[:, np.newaxis]
+        with np.errstate(invalid='ignore'):
+            outliers = np.abs(values - center) > sigma * std
+        if not np.any(outliers):
+            break
+        values[outliers] = np.nan
+
+    count = values.shape[1] - np.sum(np.isnan(values), axis=1)
+    mean = bn.nanmean(values, axis=1)
+    median = bn.nanmedian(values, axis=1)
+    level = dict(mean=lambda: mean,
+                 median=lambda: median,
+                 mode=lambda: 3 * median - 2 * mean)[method]()
+    return SkyBackground(level, bn.nanstd(values, axis=1), count)
+
+
+def annulus_background(image:CCDData, apertures:PixelApertures, method:str='median',
+                       sigma:float=3., maxiters:int=5,
+                       chunk_size:int=256) -> SkyBackground:
+    """Sigma-clipped sky background in the annuli of all stars.
+
+    Annulus pixels (those with centers inside the annulus, as for the annulus
+    mean of :py:func:`~vsopy.phot.aperture_engine.measure_apertures`) are gathered
+    for a chunk of stars into a NaN-padded array, and the statistics are computed
+    for the whole chunk by :py:func:`clipped_background`.  Clipping makes the
+    estimate robust to stars falling in the annulus.
+
+    :param image: image, optionally with mask
+    :type image: :py:class:`~astropy.nddata.CCDData`
+    :param apertures: apertures in pixel coordinates, only the annulus is used
+    :type apertures: PixelApertures
+    :param method: sky level estimator, one of `mean`, `median` and `mode`,
+                   defaults to `median`
+    :type method: str, optional
+    :param sigma: clipping threshold in standard deviations, defaults to 3
+    :type sigma: float, optional
+    :param maxiters: maximal number of clipping iterations, defaults to 5
+    :type maxiters: int, optional
+    :param chunk_size: number of stars per batch, defaults to 256
+    :type chunk_size: int, optional
+    :return: sky level, sigma and pixel count per star; NaN level for
+             stars without valid annulus pixels
+    :rtype: SkyBackground
+    """
+    data, _, mask = _image_arrays(image)
+    half = _stamp_half_size(apertures.r_out)
+    parts = []
+    for start in range(0, len(apertures.x), chunk_size):
+        end = start + chunk_size
+        stamps = _cut_stamps(data, None, mask, apertures.x[start:end], apertures.y[start:end], half)
+        annulus = ((stamps.dist2 < apertures.r_out**2) & ~(stamps.dist2 < apertures.r_in**2)
+                   & stamps.valid)
+        values = np.where(annulus, stamps.data, np.nan).reshape(len(annulus), -1)
+        parts.append(clipped_background(values[:, np.any(annulus, axis=0).ravel()],
+                                        method, sigma, maxiters))
+    if not parts:
+        return SkyBackground(np.zeros(0), np.zeros(0), np.zeros(0, dtype=int))
+    return SkyBackground(*[np.concatenate(field) for field in zip(*parts)])
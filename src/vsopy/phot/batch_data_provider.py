@@ -2,9 +2,13 @@ import numpy as np
 from astropy.table import QTable, join, unique
 
 class BatchDataProvider:
-    def __init__(self, session):
+    def __init__(self, session, batch_ids=None):
         self.batches_ = QTable.read(session.batches_file_path)
         self.batch_images_ = QTable.read(session.batch_images_file_path)
+        if batch_ids is not None:
+            # restrict to some batches, e.g. those just completed
+            self.batches_ = self.batches_[np.isin(self.batches_['batch_id'], batch_ids)]
+            self.batch_images_ = self.batch_images_[np.isin(self.batch_images_['batch_id'], batch_ids)]
         self.images_ = QTable.read(session.images_file_path)
         self.measured_ = QTable.read(session.measured_file_path)
         measured_stars = unique(self.measured_, keys=['auid'])
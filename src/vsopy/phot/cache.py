@@ -0,0 +1,89 @@
+import astropy.units as u # type: ignore
+import numpy as np
+import os
+import tempfile
+from astropy.table import QTable # type: ignore
+from pathlib import Path
+from typing import Any
+from ..util import fingerprint
+from .measure import photometry_table
+
+CACHE_VERSION = 1
+"""Version of the cached record layout, part of every key."""
+
+
+class PhotometryCache:
+    """Persistent per-image photometry keyed by fingerprints of the inputs.
+
+    Every entry is a photometry record array (see
+    :py:func:`~vsopy.phot.measure.measure_photometry` with ``records=True``)
+    saved in its own file named by the key, so workers of a process pool can
+    share the cache directory without locking.  The key combines the context
+    given at construction, such as star list, aperture and sky estimator,
+    with per-image fingerprints: raw frame, WCS solution and master frames.
+    """
+    def __init__(self, directory:os.PathLike | str, **context:Any) -> None:
+        """Open the cache.
+
+        :param directory: cache directory, must exist
+        :type directory: path-like
+        :param context: processing settings common to all images,
+                        anything accepted by :py:func:`~vsopy.util.fingerprint`
+        """
+        self.dir_ = Path(directory)
+        self.context_ = fingerprint(CACHE_VERSION, context)
+
+    def key(self, *parts:Any) -> str:
+        """Combine per-image fingerprints with the context.
+
+        :return: cache key
+        :rtype: str
+        """
+        return fingerprint(self.context_, parts)
+
+    def _path(self, key:str) -> Path:
+        return self.dir_ / f'{key}.npz'
+
+    def __contains__(self, key:str) -> bool:
+        return self._path(key).exists()
+
+    def get(self, key:str, records:bool=False) -> QTable | np.ndarray | None:
+        """Load the photometry table.
+
+        :param key: cache key
+        :type key: str
+        :param records: whether to return the stored records instead of a table,
+                        defaults to False
+        :type records: bool, optional
+        :return: photometry table or records, None if not cached
+        :rtype: :py:class:`~astropy.table.QTable` or :py:class:`~numpy.ndarray`
+        """
+        try:
+            with np.load(self._path(key), allow_pickle=False) as entry:
+                if records:
+                    return entry['records']
+                return photometry_table(entry['records'], u.Unit(str(entry['flux_unit'])))
+        except FileNotFoundError:
+            return None
+
+    def put(self, key:str, records:np.ndarray, flux_unit:u.UnitBase) -> None:
+        """Store photometry records.
+
+        The entry is written to a temporary file and renamed,
+        so readers never see a partial entry.
+
+        :param key: cache key
+        :type key: str
+        :param records: photometry records
+        :type records: :py:class:`~numpy.ndarray`
+        :param flux_unit: unit of the `flux` field
+        :type flux_unit: :py:class:`~astropy.units.UnitBase`
+        """
+        fd, temp = tempfile.mkstemp(dir=self.dir_, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                np.savez(file, records=records, flux_unit=np.array(str(flux_unit)))
+            os.replace(temp, self._path(key))
+        except BaseException:
+            os.remove(temp)
+            raise
@@ -0,0 +1,176 @@
+import astropy.units as u # type: ignore
+import numpy as np
+from astropy.coordinates import SkyCoord # type: ignore
+from astropy.table import QTable # type: ignore
+from scipy.spatial import cKDTree
+from ..util import fingerprint
+
+
+class CentroidCatalog:
+    """Array-backed list of star centroids.
+
+    Positions are kept as float64 RA/Dec arrays in radians together with
+    star identifiers, so that slicing, masking and pickling do not create
+    coordinate frame objects.  Unit vectors and a KD-tree over them are
+    computed on first use.
+    Conversion to :py:class:`~astropy.table.QTable` with `radec2000`
+    :py:class:`~astropy.coordinates.SkyCoord` column is meant for API edges only.
+    """
+    def __init__(self, ra:np.ndarray, dec:np.ndarray, auid:np.ndarray,
+                 name:np.ndarray | None=None) -> None:
+        """Create a catalog.
+
+        :param ra: right ascension (J2000), radians
+        :type ra: :py:class:`~numpy.ndarray`
+        :param dec: declination (J2000), radians
+        :type dec: :py:class:`~numpy.ndarray`
+        :param auid: star identifiers
+        :type auid: :py:class:`~numpy.ndarray`
+        :param name: optional star names
+        :type name: :py:class:`~numpy.ndarray`, optional
+        """
+        self.ra_ = np.atleast_1d(np.asarray(ra, dtype=np.float64))
+        self.dec_ = np.atleast_1d(np.asarray(dec, dtype=np.float64))
+        self.auid_ = np.atleast_1d(np.asarray(auid))
+        self.name_ = None if name is None else np.atleast_1d(np.asarray(name))
+        self.xyz_ = None
+        self.tree_ = None
+
+    @staticmethod
+    def from_table(table:QTable) -> 'CentroidCatalog':
+        """Create from a table with `auid`, `radec2000` and optional `name` columns.
+
+        :param table: centroid table
+        :type table: :py:class:`~astropy.table.QTable`
+        :return: catalog
+        :rtype: CentroidCatalog
+        """
+        coords = table['radec2000']
+        return CentroidCatalog(coords.ra.rad, coords.dec.rad, np.asarray(table['auid']),
+                               np.asarray(table['name']) if 'name' in table.colnames else None)
+
+    @staticmethod
+    def from_pixels(wcs, x:np.ndarray, y:np.ndarray, auid:np.ndarray) -> 'CentroidCatalog':
+        """Create from pixel positions on an image.
+
+        :param wcs: image WCS
+        :type wcs: :py:class:`~astropy.wcs.WCS`
+        :param x: column coordinates, pixels
+        :param y: row coordinates, pixels
+        :param auid: star identifiers
+        :return: catalog
+        :rtype: CentroidCatalog
+        """
+        ra, dec = wcs.pixel_to_world_values(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        return CentroidCatalog(np.deg2rad(ra), np.deg2rad(dec), auid)
+
+    def to_table(self) -> QTable:
+        """Convert to a table with `auid`, `radec2000` and optional `name` columns.
+
+        :return: centroid table
+        :rtype: :py:class:`~astropy.table.QTable`
+        """
+        table = QTable(dict(auid=self.auid_, radec2000=self.coords))
+        if self.name_ is not None:
+            table['name'] = self.name_
+        return table
+
+    def __len__(self) -> int:
+        return len(self.ra_)
+
+    def __getitem__(self, index) -> 'CentroidCatalog':
+        """Select stars by index array, slice or boolean mask."""
+        return CentroidCatalog(self.ra_[index], self.dec_[index], self.auid_[index],
+                               None if self.name_ is None else self.name_[index])
+
+    def __getstate__(self):
+        # derived arrays are cheaper to recompute than to transfer
+        return dict(ra_=self.ra_, dec_=self.dec_, auid_=self.auid_, name_=self.name_)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.xyz_ = None
+        self.tree_ = None
+
+    @property
+    def ra(self) -> np.ndarray:
+        """Right ascension, radians"""
+        return self.ra_
+
+    @property
+    def dec(self) -> np.ndarray:
+        """Declination, radians"""
+        return self.dec_
+
+    @property
+    def auid(self) -> np.ndarray:
+        return self.auid_
+
+    @property
+    def name(self) -> np.ndarray | None:
+        return self.name_
+
+    @property
+    def coords(self) -> SkyCoord:
+        """Positions as a SkyCoord array."""
+        return SkyCoord(ra=np.rad2deg(self.ra_) * u.deg, dec=np.rad2deg(self.dec_) * u.deg)
+
+    @property
+    def xyz(self) -> np.ndarray:
+        """Unit vectors, shape (N, 3)."""
+        if self.xyz_ is None:
+            cos_dec = np.cos(self.dec_)
+            self.xyz_ = np.column_stack([cos_dec * np.cos(self.ra_),
+                                         cos_dec * np.sin(self.ra_),
+                                         np.sin(self.dec_)])
+        return self.xyz_
+
+    @property
+    def tree(self) -> cKDTree:
+        """KD-tree over the unit vectors, built on first use."""
+        if self.tree_ is None:
+            self.tree_ = cKDTree(self.xyz)
+        return self.tree_
+
+    def fingerprint(self) -> str:
+        """Digest of the positions, identifiers and names.
+
+        :return: hex digest, see :py:func:`~vsopy.util.fingerprint`
+        :rtype: str
+        """
+        return fingerprint(self.ra_, self.dec_, self.auid_, self.name_)
+
+    def to_pixel(self, wcs) -> tuple[np.ndarray, np.ndarray]:
+        """Project positions to pixels.
+
+        The positions are passed to the WCS as is, i.e. assumed to be
+        in the WCS celestial frame (ICRS or FK5 J2000).
+
+        :param wcs: image WCS
+        :type wcs: :py:class:`~astropy.wcs.WCS`
+        :return: column and row coordinates, pixels
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        x, y = wcs.world_to_pixel_values(np.rad2deg(self.ra_), np.rad2deg(self.dec_))
+        return np.atleast_1d(x).astype(float), np.atleast_1d(y).astype(float)
+
+    def search_around(self, other:'CentroidCatalog',
+                      radius:u.Quantity) -> tuple[np.ndarray, np.ndarray, u.Quantity]:
+        """Find all pairs of stars closer than the radius.
+
+        :param other: catalog to match
+        :type other: CentroidCatalog
+        :param radius: maximal separation
+        :type radius: :py:class:`~astropy.units.Quantity`
+        :return: indices into this catalog, indices into `other` and separations
+        :rtype: tuple[np.ndarray, np.ndarray, :py:class:`~astropy.units.Quantity`]
+        """
+        if len(self) == 0 or len(other) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0) * u.arcsec
+        chord = 2 * np.sin(radius.to(u.rad).value / 2)
+        matches = self.tree.query_ball_tree(other.tree, chord)
+        i = np.repeat(np.arange(len(self)), [len(m) for m in matches])
+        j = np.array([k for m in matches for k in sorted(m)], dtype=int)
+        distance = np.linalg.norm(self.xyz[i] - other.xyz[j], axis=1)
+        sep = 2 * np.arcsin(np.clip(distance / 2, 0, 1)) * u.rad
+        return i, j, sep.to(u.arcsec)
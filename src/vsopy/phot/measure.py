@@ -1,27 +1,38 @@
 import astropy.units as u # type: ignore
 import numpy as np
+import itertools
+import os
+import warnings
 from .. import reduce
 from ..data import CameraRegistry
 from astropy.coordinates import SkyCoord # type: ignore
+from astropy.io import fits # type: ignore
 from astropy.nddata import CCDData # type: ignore
-from astropy.table import QTable, Column # type: ignore
-from photutils.aperture import (ApertureStats, # type: ignore
-                                SkyCircularAperture,
-                                SkyCircularAnnulus)
-from vsopy.util import Aperture
-
-
-def measure_photometry(image:CCDData, stars:QTable, aperture:Aperture,
-                       extended:bool=False) -> QTable:
+from astropy.table import QTable, Column, vstack # type: ignore
+from vsopy.util import Aperture, MagErrDtype, QualitySettings, StageMetrics, file_fingerprint
+from collections.abc import Iterable, Sequence
+from typing import Any, NamedTuple
+from .aperture_engine import (MaskCache, PhotometrySums, PixelApertures, RegionSums, measure_apertures,
+                              pixel_scale, project_apertures)
+from .background import annulus_background
+from .shape import ShapeStats, measure_shapes
+from .catalog import CentroidCatalog
+
+
+def measure_photometry(image:CCDData, stars:QTable | CentroidCatalog,
+                       aperture:Aperture | Sequence[Aperture],
+                       extended:bool=False, sky:str | None=None,
+                       threads:int | None=None, records:bool=False) -> QTable | np.ndarray:
     """Extract aperture photometry data from the image.
 
     Given the calibrated image and the list of star centroids in sky coordinates,
     measure star flux using circular aperture and sky annulus.  For detailed discussion
     see Warner B.D., A Practical Guide to Lightcurve Photometry and Analysis, 4.2.
 
-    Flux counting is performed by photutils package
-    (https://photutils.readthedocs.io). Uncertainty fromthe image is propagated to
-    the flux values. Flux is normalized by the image exposure to electrons per second.
+    Flux counting is performed by :py:func:`~vsopy.phot.aperture_engine.measure_apertures`
+    in pixel space for all stars at once, with the same exact-overlap semantics as
+    photutils package (https://photutils.readthedocs.io). Uncertainty fromthe image
+    is propagated to the flux values. Flux is normalized by the image exposure to electrons per second.
 
     The flux for central aperture :math:`F_c` contains both star and sky electrons, the flux
     for annulus :math:`F_a` - sky electrons only. Number of sky electrons in the central
@@ -33,7 +44,9 @@ def measure_photometry(image:CCDData, stars:QTable, aperture:Aperture,
         F_{sky} = \\frac{F_{a}}{N_{ann}} N_c,
 
     where :math:`N_{ann}` and :math:`N_c` are pixel counts for the annulus
-    and the central aperture respectively.
+    and the central aperture respectively.  With ``sky`` set, the annulus mean
+    :math:`F_{a} / N_{ann}` is replaced by a sigma-clipped estimate, see
+    :py:func:`~vsopy.phot.background.annulus_background`.
 
     Then star flux in electrons is
 
@@ -60,96 +73,462 @@ def measure_photometry(image:CCDData, stars:QTable, aperture:Aperture,
     :param image:       calibrated image, pixel counts in electrons.
     :type image:        :py:class:`~astropy.nddata.CCDData`
     :param stars:       list of stars to be measured: AUID, centroid, optional name
-    :type stars:        :py:class:`~astropy.table.QTable`
-    :param aperture:    circular aperture and annulus radii in sky coordinates
-    :type aperture:     Aperture
+    :type stars:        :py:class:`~astropy.table.QTable` or
+                        :py:class:`~vsopy.phot.catalog.CentroidCatalog`
+    :param aperture:    circular aperture and annulus radii in sky coordinates,
+                        or a list of apertures sharing the same annulus
+                        (see :py:meth:`~vsopy.util.Aperture.grid`); all of them
+                        are measured in one pass with one sky estimate
+    :type aperture:     Aperture or list[Aperture]
     :param extended:    whether to return additional stats (FWHM,
-                        ellipticity etc), default False
+                        ellipticity etc, see :py:func:`~vsopy.phot.shape.measure_shapes`),
+                        default False
     :type extended: bool
+    :param sky:         sigma-clipped sky estimator: `mean`, `median` or `mode`,
+                        default None for plain annulus mean
+    :type sky: str, optional
+    :param threads:     number of threads measuring chunks of the star list,
+                        defaults to :py:func:`~vsopy.phot.aperture_engine.get_threads`
+    :type threads: int, optional
+    :param records:     whether to return a structured array instead of a table,
+                        default False; the array has the table fields with the
+                        centroid as `ra` and `dec` in degrees and no units, and
+                        can be converted to the table by :py:func:`photometry_table`
+    :type records: bool
     :return:           photometry results
-    :rtype:            :py:class:`~astropy.table.QTable`, fields:
+    :rtype:            :py:class:`~astropy.table.QTable` or :py:class:`~numpy.ndarray`, fields:
 
                 - auid,
                 - centroid,
+                - name (if the star list has names)
+                - aperture radius `r_ap` (if a list of apertures is given,
+                  one row per star and aperture)
                 - flux (:math:`\\frac{e}{s}`)
                 - SNR (db)
                 - Magnitude with uncertainty,
                 - relative peak (max count / saturation level)
+                - flux-weighted centroid `sky_ra`, `sky_dec` (deg)
                 - ellipticity (if extended=True)
                 - FWHM (if extended=True)
                 - orientation (if extended=True)
     """
-    result = QTable(stars['auid', 'radec2000'])
-    if 'name' in stars.colnames:
-        result['name'] = stars['name']
-
-    corrected = CCDData(image)
-
-    apr = SkyCircularAperture(stars['radec2000'], r=aperture.r)
-    ap_stats = ApertureStats(corrected, apr)
-
-    ann = SkyCircularAnnulus(stars['radec2000'],
-                             r_in=aperture.r_in,
-                             r_out=aperture.r_out)
-    ann_stats = ApertureStats(corrected, ann)
-
-    zero_level = 1_000_000 * image.unit / u.second
-    exp = image.header['EXPTIME'] * u.second
+    pixel_apertures = project_apertures(image.wcs, _positions(stars), aperture)
+    sums = _with_sky(image, pixel_apertures,
+                     measure_apertures(image, pixel_apertures, threads=threads), sky)
+    shapes = measure_shapes(image, pixel_apertures) if extended else None
+    return _photometry_result(image, stars, aperture, sums, shapes, records)
+
+def measure_many(images:Iterable[CCDData], stars:QTable | CentroidCatalog,
+                 aperture:Aperture | Sequence[Aperture],
+                 ids:Iterable[Any] | None=None,
+                 phase_steps:int=20, sky:str | None=None) -> QTable:
+    """Measure a batch of images sharing the aperture geometry.
+
+    Same as :py:func:`measure_photometry` applied to every image, but aperture
+    masks are taken from a :py:class:`~vsopy.phot.aperture_engine.MaskCache`
+    keyed by the sub-pixel phase of star centers.  The cache is shared by
+    consecutive frames as long as their pixel scale yields the same pixel radii,
+    so for a session with stable pointing masks are computed only once.
+    Star positions are quantized to ``1/phase_steps`` pixel for mask lookup.
+
+    :param images: calibrated images with WCS
+    :type images: iterable of :py:class:`~astropy.nddata.CCDData`
+    :param stars: list of stars to be measured: AUID, centroid, optional name
+    :type stars: :py:class:`~astropy.table.QTable` or
+                 :py:class:`~vsopy.phot.catalog.CentroidCatalog`
+    :param aperture: aperture, or a list of apertures sharing the annulus
+    :type aperture: Aperture or list[Aperture]
+    :param ids: image identifiers, defaults to the image positions in `images`
+    :type ids: iterable, optional
+    :param phase_steps: sub-pixel phase quantization, defaults to 20
+    :type phase_steps: int, optional
+    :param sky: sigma-clipped sky estimator, see :py:func:`measure_photometry`
+    :type sky: str, optional
+    :return: photometry results of all images stacked, with `image_id` column
+             followed by the columns of :py:func:`measure_photometry`
+    :rtype: :py:class:`~astropy.table.QTable`
+    """
+    cache = None
+    tables = []
+    for id, image in zip(itertools.count() if ids is None else ids, images):
+        pixel_apertures = project_apertures(image.wcs, _positions(stars), aperture)
+        if cache is None or not cache.matches(pixel_apertures):
+            cache = MaskCache(pixel_apertures, phase_steps)
+        sums = _with_sky(image, pixel_apertures,
+                         measure_apertures(image, pixel_apertures, cache=cache), sky)
+        table = _photometry_result(image, stars, aperture, sums, None)
+        table.add_column(np.full(len(table), id), name='image_id', index=0)
+        tables.append(table)
+    return vstack(tables)
+
+def _with_sky(image:CCDData, apertures:PixelApertures,
+              sums:PhotometrySums, sky:str | None) -> PhotometrySums:
+    if sky is None:
+        return sums
+    background = annulus_background(image, apertures, sky)
+    return sums._replace(annulus=sums.annulus._replace(mean=background.level))
+
+def _positions(stars:QTable | CentroidCatalog) -> SkyCoord | CentroidCatalog:
+    return stars if isinstance(stars, CentroidCatalog) else stars['radec2000']
+
+PHOTOMETRY_UNITS = dict(r_ap=u.arcsec, snr=u.db, M=u.mag, sky_ra=u.deg, sky_dec=u.deg,
+                        fwhm=u.pix, orientation=u.deg)
+"""Units of the photometry record fields, except `flux` which is in the
+image unit per second."""
+
+def photometry_table(records:np.ndarray,
+                     flux_unit:u.UnitBase=u.electron / u.second,
+                     sky_coord:bool=True) -> QTable:
+    """Convert photometry records to a table.
+
+    The inverse of ``measure_photometry(..., records=True)``: `ra` and `dec`
+    fields are combined into `radec2000` column, the other fields become
+    columns with units from :py:data:`PHOTOMETRY_UNITS`.
+
+    :param records: photometry records, see :py:func:`measure_photometry`
+    :type records: :py:class:`~numpy.ndarray`
+    :param flux_unit: unit of the `flux` field, defaults to electrons per second
+    :type flux_unit: :py:class:`~astropy.units.UnitBase`, optional
+    :param sky_coord: whether to combine `ra` and `dec` into `radec2000`, defaults
+                      to True; otherwise they are kept as columns in degrees, which
+                      is much faster for tables built only to be written or stacked
+    :type sky_coord: bool, optional
+    :return: photometry table
+    :rtype: :py:class:`~astropy.table.QTable`
+    """
+    units = dict(PHOTOMETRY_UNITS, flux=flux_unit)
+    if not sky_coord:
+        units.update(ra=u.deg, dec=u.deg)
+    table = QTable()
+    for name in records.dtype.names:
+        if name == 'ra' and sky_coord:
+            table['radec2000'] = SkyCoord(ra=records['ra'] * u.deg, dec=records['dec'] * u.deg)
+        elif name != 'dec' or not sky_coord:
+            table[name] = Column(records[name], unit=units.get(name))
+    return table
+
+def select_records(records:np.ndarray, names:Sequence[str], **values:Any) -> np.ndarray:
+    """Compact copy of photometry records with the selected fields.
+
+    Worker processes return these instead of tables: a record array pickles
+    as a single buffer, with no units, column objects or sky coordinates.
+
+    :param records: photometry records, see :py:func:`measure_photometry`
+    :type records: :py:class:`~numpy.ndarray`
+    :param names: fields in the order of the result; names missing from the
+                  records and from `values` are skipped
+    :type names: sequence of str
+    :param values: values of additional fields, broadcast to all records, e.g. `image_id`
+    :return: records with the selected fields
+    :rtype: :py:class:`~numpy.ndarray`
+    """
+    values = {name: np.asarray(value) for name, value in values.items()}
+    fields = [(name, values[name].dtype if name in values else records.dtype[name])
+              for name in names if name in values or name in records.dtype.names]
+    result = np.empty(len(records), dtype=fields)
+    for name, _ in fields:
+        result[name] = values[name] if name in values else records[name]
+    return result
+
+def _photometry_result(image:CCDData, stars:QTable | CentroidCatalog,
+                       aperture:Aperture | Sequence[Aperture],
+                       sums:PhotometrySums, shapes:ShapeStats | None,
+                       records:bool=False) -> QTable | np.ndarray:
+    result = _photometry_records(image, stars, aperture, sums, shapes)
+    return result if records else photometry_table(result, image.unit / u.second)
+
+def _photometry_records(image:CCDData, stars:QTable | CentroidCatalog,
+                        aperture:Aperture | Sequence[Aperture],
+                        sums:PhotometrySums, shapes:ShapeStats | None) -> np.ndarray:
+    catalog = stars if isinstance(stars, CentroidCatalog) else CentroidCatalog.from_table(stars)
+    multiple = not isinstance(aperture, Aperture)
+    apertures = list(aperture) if multiple else [aperture]
+    size = len(catalog)
+
+    dtype = ([('auid', catalog.auid.dtype), ('ra', 'f8'), ('dec', 'f8')]
+             + ([] if catalog.name is None else [('name', catalog.name.dtype)])
+             + ([('r_ap', 'f8')] if multiple else [])
+             + [('flux', 'f8'), ('snr', 'f8'), ('M', MagErrDtype), ('peak', 'f8'),
+                ('sky_ra', 'f8'), ('sky_dec', 'f8')]
+             + ([('ellipticity', 'f8'), ('fwhm', 'f8'), ('orientation', 'f8')] if shapes is not None else []))
+    result = np.empty(size * len(apertures), dtype=dtype)
+
+    zero_level = 1_000_000
+    exp = image.header['EXPTIME']
     camera = CameraRegistry.get(image.header['instrume'])
-    read_noise = 0 if not camera or image.unit != u.electron else camera.read_noise(image.header['GAIN'])
-    Ft = ap_stats.sum
-    Fb = ap_stats.sum_aper_area.value * ann_stats.mean
-    FtFb = Ft - Fb
-    Ft2Fb = Ft + 2 * Fb + read_noise * ap_stats.sum_aper_area.value
-    result['flux'] = FtFb / exp
-    # prevent NaN in snr column
-    snr = np.clip(FtFb.value/np.sqrt(np.abs(Ft2Fb.value)), 1e-10, 1e30)
-    result['snr'] = 10 * np.log10(snr) * u.db
-    mag = -2.5 * np.log10(result['flux'] / zero_level).value
-
-    Ft_err = ap_stats.sum_err
-    Fb_err = ap_stats.sum_aper_area.value * (ann_stats.sum_err / ann_stats.sum_aper_area.value)
-    flux_err = np.sqrt(Ft_err*Ft_err + Fb_err*Fb_err) / exp
-    mag_err = (2.5 * flux_err / result['flux'] / np.log(10)).value
-    result['M'] = Column(list(zip(mag, mag_err)),
-                         unit=u.mag,
-                         dtype=[('mag','f4'), ('err', 'f4')])
-
-    result['peak'] = np.nan if not camera else ap_stats.max.value / camera.max_adu.value
-    result['sky_centroid'] = ap_stats.sky_centroid
-
-    if extended:
-        result['ellipticity'] = ap_stats.ellipticity
-        result['fwhm'] = ap_stats.fwhm
-        result['orientation'] = ap_stats.orientation
-
-    return result [~np.isnan(result['M']['mag'])]
-
-def filter_centroids(image:CCDData, centroids:QTable,
-                     radius:u.Quantity[u.arcsec]) -> QTable:
+    # a co-add sums NCOMBINE frames, each contributing read noise and saturating separately
+    frames = image.header.get('NCOMBINE', 1)
+    read_noise = (0 if not camera or image.unit != u.electron
+                  else frames * u.Quantity(camera.read_noise(image.header['GAIN']), u.electron).value)
+    ann_sums = sums.annulus
+    for k, ap in enumerate(apertures):
+        block = result[k * size:(k + 1) * size]
+        if multiple:
+            ap_sums = RegionSums(*[field[:, k] for field in sums.aperture])
+            x, y = sums.x_centroid[:, k], sums.y_centroid[:, k]
+            shape = None if shapes is None else ShapeStats(*[field[:, k] for field in shapes])
+            block['r_ap'] = ap.r.to_value(u.arcsec)
+        else:
+            ap_sums, x, y = sums.aperture, sums.x_centroid, sums.y_centroid
+            shape = shapes
+        block['auid'] = catalog.auid
+        block['ra'] = np.rad2deg(catalog.ra)
+        block['dec'] = np.rad2deg(catalog.dec)
+        if catalog.name is not None:
+            block['name'] = catalog.name
+
+        Ft = ap_sums.sum
+        Fb = ap_sums.area * ann_sums.mean
+        FtFb = Ft - Fb
+        Ft2Fb = Ft + 2 * Fb + read_noise * ap_sums.area
+        flux = FtFb / exp
+        block['flux'] = flux
+        # prevent NaN in snr column
+        snr = np.clip(FtFb / np.sqrt(np.abs(Ft2Fb)), 1e-10, 1e30)
+        block['snr'] = 10 * np.log10(snr)
+
+        Fb_err = ap_sums.area * (ann_sums.sum_err / ann_sums.area)
+        flux_err = np.sqrt(ap_sums.sum_err**2 + Fb_err**2) / exp
+        with np.errstate(invalid='ignore', divide='ignore'):
+            block['M']['mag'] = -2.5 * np.log10(flux / zero_level)
+            block['M']['err'] = 2.5 * flux_err / flux / np.log(10)
+
+        block['peak'] = np.nan if not camera else ap_sums.max / (frames * camera.max_adu.value)
+        block['sky_ra'], block['sky_dec'] = image.wcs.pixel_to_world_values(x, y)
+
+        if shape is not None:
+            block['ellipticity'] = shape.ellipticity
+            block['fwhm'] = shape.fwhm
+            block['orientation'] = shape.orientation
+
+    return result[~np.isnan(result['M']['mag'])]
+
+def filter_centroids(image:CCDData, centroids:QTable | CentroidCatalog,
+                     radius:u.Quantity[u.arcsec]) -> QTable | CentroidCatalog:
     """Filter star centroids that fits in the image accounting for aperture.
+
+    All centroids are projected to pixels in a single WCS call; a centroid is kept
+    if the square of half-size ``radius`` around it lies inside the image.
+
+    :param image: image with WCS
+    :type image: :py:class:`~astropy.nddata.CCDData`
+    :param centroids: star list with `radec2000` column, or a catalog
+    :type centroids: :py:class:`~astropy.table.QTable` or
+                     :py:class:`~vsopy.phot.catalog.CentroidCatalog`
+    :param radius: margin, usually the outer annulus radius
+    :type radius: :py:class:`~astropy.units.Quantity`
+    :return: centroids fitting in the image, of the same type as `centroids`
+    :rtype: :py:class:`~astropy.table.QTable` or
+            :py:class:`~vsopy.phot.catalog.CentroidCatalog`
     """
-    def is_in_image(centroid:SkyCoord) -> np.bool:
-        corners = [centroid.spherical_offsets_by(radius, radius),
-                   centroid.spherical_offsets_by(-radius, radius),
-                   centroid.spherical_offsets_by(radius, -radius),
-                   centroid.spherical_offsets_by(-radius, -radius)
-                   ]
-        tested = list([corner.contained_by(image.wcs, image) for corner in corners])
-        return np.array(tested).all()
-
-    mask = [is_in_image(centroid) for centroid in centroids['radec2000']]
+    if len(centroids) == 0:
+        return centroids
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        x, y = (centroids.to_pixel(image.wcs) if isinstance(centroids, CentroidCatalog)
+                else image.wcs.world_to_pixel(centroids['radec2000']))
+    ymax, xmax = image.shape
+    center = image.wcs.pixel_to_world((xmax - 1) / 2, (ymax - 1) / 2)
+    margin = radius.to(u.arcsec).value * pixel_scale(image.wcs, center)
+    with np.errstate(invalid='ignore'):
+        mask = ((x - margin > 0) & (x + margin < xmax)
+                & (y - margin > 0) & (y + margin < ymax))
     return centroids[mask]
 
 
-
-def process_image(path, matcher, solver, centroids, aperture):
+class ImageResult(NamedTuple):
+    """Outcome of :py:func:`process_image`.
+    """
+    photometry: QTable | np.ndarray | None
+    """Photometry table or records, None if processing failed"""
+    metrics: dict[str, Any]
+    """Per-stage wall and CPU time, bytes read and the failure (if any),
+    see :py:class:`~vsopy.util.StageMetrics`"""
+
+PROCESS_STAGES = ['read', 'quality', 'solve', 'calibrate', 'measure']
+
+def process_image(path, matcher, solver, centroids, aperture,
+                  buffer:reduce.FrameBuffer | None=None,
+                  sky:str | None=None,
+                  quality:QualitySettings | None=None,
+                  cache=None, records:bool=False) -> ImageResult:
+    """Read, plate solve, calibrate and measure a light frame.
+
+    Every stage is timed; a failure of any stage does not propagate,
+    its exception class and message are recorded in the metrics instead.
+
+    If ``buffer`` is given, the frame is memory-mapped and calibrated in place
+    into the buffer (see :py:func:`~vsopy.reduce.calibrate_into`), so a worker
+    holds no more than the buffer's two frames; otherwise the frame is read into
+    memory and calibrated with :py:func:`~vsopy.reduce.calibrate_image`.
+    In the former case `centroids` receives the calibrated image.
+
+    :param path: light frame path
+    :param matcher: calibration matcher, see :py:class:`~vsopy.reduce.CalibrationMatcher`
+    :param solver: callable returning WCS header for the frame path
+    :param centroids: callable returning the star list for the frame
+    :param aperture: aperture, or a list of apertures sharing the annulus
+    :param buffer: per-worker calibration buffer, defaults to None
+    :type buffer: :py:class:`~vsopy.reduce.FrameBuffer`, optional
+    :param sky: sigma-clipped sky estimator, see :py:func:`measure_photometry`
+    :type sky: str, optional
+    :param quality: frame quality thresholds checked right after reading,
+                    defaults to None (no check); a rejected frame fails with
+                    :py:class:`~vsopy.reduce.FrameRejected`
+    :type quality: :py:class:`~vsopy.util.QualitySettings`, optional
+    :param cache: photometry cache, defaults to None; the frame is looked up by
+                  fingerprints of the raw file, its WCS solution and matching
+                  master frames (the matcher must provide `match_paths`), and
+                  measured only if not found, with additional `cache` stage
+                  and `cached` flag in the metrics.  Star list, aperture and
+                  other settings are expected to be in the cache context.
+                  With `quality` checks enabled, the frame is read and checked
+                  before the lookup, so rejected frames are never solved.
+    :type cache: :py:class:`~vsopy.phot.cache.PhotometryCache`, optional
+    :param records: whether to return photometry records instead of a table,
+                    defaults to False; records are much cheaper to pass between
+                    processes, see :py:func:`select_records` and :py:func:`photometry_table`
+    :type records: bool, optional
+    :return: photometry and metrics
+    :rtype: ImageResult
+    """
+    metrics = StageMetrics(PROCESS_STAGES + ([] if cache is None else ['cache']))
+    metrics['read_bytes'] = 0
+    photometry = None
+    try:
+        key = None
+        image = None
+        if quality is not None and quality.enabled:
+            # rejected frames are not solved, the cache key needs the solution
+            image = _read_frame(path, buffer, quality, metrics)
+        if cache is not None:
+            with metrics.stage('cache'):
+                key = _cache_key(path, matcher, solver, cache)
+                photometry = cache.get(key, records=records)
+            metrics['cached'] = photometry is not None
+        if photometry is None:
+            if image is None:
+                image = _read_frame(path, buffer, quality, metrics)
+            image, reduced = _solved_frame(path, image, matcher, solver, buffer, metrics)
+            with metrics.stage('measure'):
+                photometry = measure_photometry(reduced, centroids(image), aperture, sky=sky,
+                                                records=records or cache is not None)
+                if cache is not None:
+                    flux_unit = reduced.unit / u.second
+                    cache.put(key, photometry, flux_unit)
+                    if not records:
+                        photometry = photometry_table(photometry, flux_unit)
+    except Exception as e:
+        metrics.fail(e)
+        photometry = None
+    return ImageResult(photometry, metrics.to_dict())
+
+def _cache_key(path, matcher, solver, cache) -> str:
+    masters = matcher.match_paths(fits.getheader(path))
+    return cache.key(file_fingerprint(path), solver(path),
+                     [None if master is None else file_fingerprint(master) for master in masters])
+
+def process_stack(paths, matcher, solver, centroids, aperture,
+                  buffer:reduce.FrameBuffer | None=None,
+                  sky:str | None=None,
+                  quality:QualitySettings | None=None,
+                  records:bool=False) -> ImageResult:
+    """Co-add light frames and measure the co-add (forced photometry).
+
+    Each frame is read, solved and calibrated as in :py:func:`process_image`,
+    then aligned to the first frame and summed by
+    :py:class:`~vsopy.reduce.CoaddBuilder`; the star list is projected onto the
+    co-add and measured once.  Metrics accumulate over frames, with additional
+    `stack` stage and number of `frames` stacked.  If any frame fails other
+    than by quality rejection, the whole stack fails.
+    The co-add header carries the number of frames in `NCOMBINE`, scaling
+    read noise and saturation level of the measurement.
+
+    :param paths: light frame paths, same filter
+    :param matcher: calibration matcher, see :py:class:`~vsopy.reduce.CalibrationMatcher`
+    :param solver: callable returning WCS header for the frame path
+    :param centroids: callable returning the star list for the co-add
+    :param aperture: aperture, or a list of apertures sharing the annulus
+    :param buffer: per-worker calibration buffer, defaults to None
+    :type buffer: :py:class:`~vsopy.reduce.FrameBuffer`, optional
+    :param sky: sigma-clipped sky estimator, see :py:func:`measure_photometry`
+    :type sky: str, optional
+    :param quality: frame quality thresholds, defaults to None (no check);
+                    rejected frames are skipped and counted as `rejected`
+    :type quality: :py:class:`~vsopy.util.QualitySettings`, optional
+    :param records: whether to return photometry records instead of a table,
+                    defaults to False
+    :type records: bool, optional
+    :return: photometry of the co-add and metrics
+    :rtype: ImageResult
+    """
+    metrics = StageMetrics(PROCESS_STAGES + ['stack'])
+    metrics['read_bytes'] = 0
+    metrics['frames'] = 0
+    metrics['rejected'] = 0
+    photometry = None
     try:
-        image = reduce.update_wcs(CCDData.read(path, unit='adu'), solver(path))
+        builder = reduce.CoaddBuilder()
+        for path in paths:
+            try:
+                _, reduced = _calibrated_frame(path, matcher, solver, buffer, quality, metrics)
+            except reduce.FrameRejected:
+                metrics['rejected'] += 1
+                continue
+            with metrics.stage('stack'):
+                builder.add(reduced)
+            metrics['frames'] = len(builder)
+        with metrics.stage('measure'):
+            coadd = builder.image
+            photometry = measure_photometry(coadd, centroids(coadd), aperture, sky=sky,
+                                            records=records)
+    except Exception as e:
+        metrics.fail(e)
+    return ImageResult(photometry, metrics.to_dict())
+
+def _calibrated_frame(path, matcher, solver, buffer:reduce.FrameBuffer | None,
+                      quality:QualitySettings | None,
+                      metrics:StageMetrics) -> tuple[Any, CCDData]:
+    image = _read_frame(path, buffer, quality, metrics)
+    return _solved_frame(path, image, matcher, solver, buffer, metrics)
+
+def _read_frame(path, buffer:reduce.FrameBuffer | None,
+                quality:QualitySettings | None, metrics:StageMetrics) -> Any:
+    with metrics.stage('read'):
+        image = (CCDData.read(path, unit='adu') if buffer is None
+                 else reduce.read_raw(path))
+        metrics['read_bytes'] += os.path.getsize(path)
+    if quality is not None and quality.enabled:
+        with metrics.stage('quality'):
+            _check_quality(image, quality, metrics)
+    return image
+
+def _solved_frame(path, image, matcher, solver, buffer:reduce.FrameBuffer | None,
+                  metrics:StageMetrics) -> tuple[Any, CCDData]:
+    with metrics.stage('solve'):
+        wcs_header = solver(path)
+        if buffer is None:
+            image = reduce.update_wcs(image, wcs_header)
+    with metrics.stage('calibrate'):
         calibration = matcher.match(image.header)
-        reduced = reduce.calibrate_image(image,
-                                        dark=calibration.dark,
-                                        flat=calibration.flat)
-        return measure_photometry(reduced, centroids(image), aperture)
-    except Exception:
-        return None
+        if buffer is None:
+            reduced = reduce.calibrate_image(image,
+                                            dark=calibration.dark,
+                                            flat=calibration.flat)
+        else:
+            image = reduced = reduce.update_wcs(
+                reduce.calibrate_into(image, buffer,
+                                      dark=calibration.dark,
+                                      flat=calibration.flat),
+                wcs_header)
+    return image, reduced
+
+def _check_quality(image, settings:QualitySettings, metrics:StageMetrics) -> None:
+    # raw frames are not scaled yet; CCDData.read scales and keeps BZERO in the header
+    raw = isinstance(image, reduce.RawFrame)
+    quality = reduce.frame_quality(image.data, settings.binning, settings.threshold,
+                                   image.header.get('BSCALE', 1) if raw else 1,
+                                   image.header.get('BZERO', 0) if raw else 0)
+    for name, value in quality._asdict().items():
+        metrics[name] = value
+    reduce.check_quality(quality, settings)
@@ -0,0 +1,80 @@
+import astropy.units as u # type: ignore
+import numpy as np
+from astropy.table import QTable # type: ignore
+from collections.abc import Sequence
+from typing import NamedTuple
+
+
+class ApertureChoice(NamedTuple):
+    """Aperture radius maximizing the median SNR of a magnitude bin."""
+    mag_min: float
+    """Lower bound of the instrumental magnitude bin, -inf for the brightest bin."""
+    mag_max: float
+    """Upper bound of the instrumental magnitude bin, inf for the faintest bin."""
+    radius: u.Quantity
+    """Optimal aperture radius."""
+    snr: float
+    """Median SNR at the optimal radius, dB."""
+    count: int
+    """Number of star measurements in the bin."""
+
+
+def snr_matrix(photometry:QTable) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Arrange multi-aperture photometry as a matrix of SNR by star and radius.
+
+    A star measurement is identified by `auid` and, if present, `image_id`;
+    only measurements valid for all radii are kept, so that every radius is
+    evaluated on the same set of stars.
+
+    :param photometry: photometry with `r_ap`, `snr` and `M` columns, as returned by
+                       :py:func:`~vsopy.phot.measure.measure_photometry` for a list of apertures
+    :type photometry: :py:class:`~astropy.table.QTable`
+    :return: radii (in the unit of `r_ap`), SNR in dB with shape (stars, radii),
+             and magnitudes at the largest radius
+    :rtype: tuple[np.ndarray, np.ndarray, np.ndarray]
+    """
+    radii, radius_index = np.unique(u.Quantity(photometry['r_ap']).value, return_inverse=True)
+    keys = [np.asarray(photometry[name]) for name in ['image_id', 'auid']
+            if name in photometry.colnames]
+    star_keys = np.rec.fromarrays(keys)
+    stars, star_index = np.unique(star_keys, return_inverse=True)
+
+    snr = np.full((len(stars), len(radii)), np.nan)
+    snr[star_index, radius_index] = u.Quantity(photometry['snr']).value
+    mag = np.full((len(stars), len(radii)), np.nan)
+    mag[star_index, radius_index] = u.Quantity(photometry['M']['mag']).value
+    complete = np.all(np.isfinite(snr), axis=1)
+    return radii, snr[complete], mag[complete, -1]
+
+
+def optimize_aperture(photometry:QTable,
+                      mag_bins:Sequence[float] | None=None) -> list[ApertureChoice]:
+    """Choose the aperture radius maximizing the median SNR.
+
+    The SNR of every star is computed by the CCD equation of
+    :py:func:`~vsopy.phot.measure.measure_photometry`; for every bin of
+    instrumental magnitude the radius with the highest median SNR over all
+    stars and frames in the bin is chosen.  Faint stars usually favor smaller
+    apertures, where sky noise is lower, and bright stars larger ones.
+
+    :param photometry: multi-aperture photometry, see :py:func:`snr_matrix`
+    :type photometry: :py:class:`~astropy.table.QTable`
+    :param mag_bins: inner edges of instrumental magnitude bins, defaults to
+                     None for a single bin with all stars
+    :type mag_bins: sequence of float, optional
+    :return: optimal radius for every non-empty bin, from bright to faint
+    :rtype: list[ApertureChoice]
+    """
+    radii, snr, mag = snr_matrix(photometry)
+    unit = u.Quantity(photometry['r_ap']).unit
+    edges = np.concatenate([[-np.inf], np.sort(np.asarray(mag_bins or [], dtype=float)), [np.inf]])
+    choices = []
+    for mag_min, mag_max in zip(edges[:-1], edges[1:]):
+        selected = snr[(mag >= mag_min) & (mag < mag_max)]
+        if len(selected) == 0:
+            continue
+        median = np.median(selected, axis=0)
+        best = int(np.argmax(median))
+        choices.append(ApertureChoice(float(mag_min), float(mag_max), radii[best] * unit,
+                                      float(median[best]), len(selected)))
+    return choices
@@ -0,0 +1,107 @@
+import numpy as np
+from astropy.nddata import CCDData # type: ignore
+from typing import NamedTuple
+from .aperture_engine import PixelApertures, _cut_stamps, _image_arrays, _stamp_half_size
+
+
+class ShapeStats(NamedTuple):
+    """Shape of the 2D Gaussian with the same second moments as the star."""
+    fwhm: np.ndarray
+    """Circularized FWHM, pixels."""
+    ellipticity: np.ndarray
+    """Ellipticity :math:`1 - b/a`."""
+    orientation: np.ndarray
+    """Angle of the major axis counter-clockwise from the x axis, degrees."""
+
+
+def shape_moments(values:np.ndarray, dx:np.ndarray, dy:np.ndarray) -> ShapeStats:
+    """Shape statistics of a batch of stamps from the intensity-weighted moments.
+
+    The covariance matrix is built from the second central moments; as in
+    :py:class:`~photutils.aperture.ApertureStats` (following SourceExtractor),
+    its diagonal is increased by 1/12 until the determinant is at least
+    :math:`1/12^2`, and negative determinants give NaN.
+
+    :param values: pixel values, zero for excluded pixels, shape (N, S, S)
+    :type values: :py:class:`~numpy.ndarray`
+    :param dx: pixel column offsets, broadcastable to `values`
+    :type dx: :py:class:`~numpy.ndarray`
+    :param dy: pixel row offsets, broadcastable to `values`
+    :type dy: :py:class:`~numpy.ndarray`
+    :return: shape statistics of every stamp, NaN for stamps without signal
+    :rtype: ShapeStats
+    """
+    axes = (1, 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        m00 = np.sum(values, axis=axes)
+        xc = np.sum(values * dx, axis=axes) / m00
+        yc = np.sum(values * dy, axis=axes) / m00
+        x = dx - xc[:, np.newaxis, np.newaxis]
+        y = dy - yc[:, np.newaxis, np.newaxis]
+        cxx = np.sum(values * x * x, axis=axes) / m00
+        cyy = np.sum(values * y * y, axis=axes) / m00
+        cxy = np.sum(values * x * y, axis=axes) / m00
+
+        delta = 1.0 / 12
+        det = cxx * cyy - cxy**2
+        negative = det < 0
+        cxx[negative], cyy[negative], cxy[negative] = np.nan, np.nan, np.nan
+        thin = cxx * cyy - cxy**2 < delta**2
+        while np.any(thin):
+            cxx[thin] += delta
+            cyy[thin] += delta
+            thin = cxx * cyy - cxy**2 < delta**2
+
+        half_sum = (cxx + cyy) / 2
+        half_diff = np.sqrt(((cxx - cyy) / 2)**2 + cxy**2)
+        a2, b2 = half_sum + half_diff, half_sum - half_diff
+        b2[b2 < 0] = np.nan
+        fwhm = 2.0 * np.sqrt(np.log(2.0) * (a2 + b2))
+        ellipticity = 1.0 - np.sqrt(b2 / a2)
+    orientation = np.rad2deg(0.5 * np.arctan2(2.0 * cxy, cxx - cyy))
+    return ShapeStats(fwhm, ellipticity, orientation)
+
+
+def measure_shapes(image:CCDData, apertures:PixelApertures,
+                   chunk_size:int=256) -> ShapeStats:
+    """FWHM, ellipticity and orientation of all stars in vectorized batches.
+
+    For a chunk of stars, square stamps are cut from the image as for
+    :py:func:`~vsopy.phot.aperture_engine.measure_apertures`, pixels with
+    centers inside the aperture are kept, and the moments of all stamps are
+    reduced at once by :py:func:`shape_moments`.  The results reproduce
+    `fwhm`, `ellipticity` and `orientation` of
+    :py:class:`~photutils.aperture.ApertureStats`.
+    Non-finite and masked pixels as well as pixels outside the image are excluded.
+
+    :param image: image, optionally with mask
+    :type image: :py:class:`~astropy.nddata.CCDData`
+    :param apertures: apertures in pixel coordinates, the annulus is not used;
+                      for multiple radii the fields have shape (N, K)
+    :type apertures: PixelApertures
+    :param chunk_size: number of stars per batch, defaults to 256
+    :type chunk_size: int, optional
+    :return: shape statistics, in the order of input positions
+    :rtype: ShapeStats
+    """
+    data, _, mask = _image_arrays(image)
+    radii = np.atleast_1d(apertures.r)
+    half = _stamp_half_size(np.max(radii, initial=0))
+    parts = []
+    for start in range(0, len(apertures.x), chunk_size):
+        end = start + chunk_size
+        x, y = apertures.x[start:end], apertures.y[start:end]
+        stamps = _cut_stamps(data, None, mask, x, y, half)
+        values = np.where(stamps.valid, stamps.data, 0.)
+        dx = (stamps.cols - x[:, np.newaxis])[:, np.newaxis, :]
+        dy = (stamps.rows - y[:, np.newaxis])[:, :, np.newaxis]
+        shapes = [shape_moments(values * (stamps.dist2 < r**2), dx, dy) for r in radii]
+        parts.append(ShapeStats(*[np.stack(field, axis=1) for field in zip(*shapes)]))
+
+    if not parts:
+        shapes = ShapeStats(*[np.zeros((0, len(radii)))] * 3)
+    else:
+        shapes = ShapeStats(*[np.concatenate(field) for field in zip(*parts)])
+    if np.ndim(apertures.r) == 0:
+        shapes = ShapeStats(*[field[:, 0] for field in shapes])
+    return shapes
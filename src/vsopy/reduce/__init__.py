@@ -1,4 +1,6 @@
 from .solve import *
 from .calibrate import *
+from .coadd import CoaddBuilder, coadd_images
 from .calibration_matcher import CalibrationMatcher, FrameCollection
-from .master_builder import MasterBuilder
\ No newline at end of file
+from .master_builder import MasterBuilder
+from .quality import FrameQuality, FrameRejected, check_quality, frame_quality, subsample
\ No newline at end of file
@@ -3,7 +3,9 @@ import ccdproc as ccdp
 import numpy as np
 from .. import util
 from ..data import CameraRegistry
-from astropy.nddata import CCDData
+from astropy.io import fits
+from astropy.nddata import CCDData, StdDevUncertainty
+from typing import NamedTuple
 
 
 def calibrate_image(image, bias=None, dark=None, flat=None):
@@ -34,3 +36,149 @@ def calibrate_image(image, bias=None, dark=None, flat=None):
     reduced.meta['flat-sub'] = 'T' if flat else 'F'
     reduced.meta['comment'] = 'Created by VSO reduction pipeline'
     return reduced
+
+class RawFrame(NamedTuple):
+    """Primary HDU of a FITS file as stored on disk.
+    """
+    data: np.ndarray
+    """Unscaled pixel values, memory-mapped"""
+    header: fits.Header
+    """Primary header, including BSCALE/BZERO if present"""
+
+
+def read_raw(path) -> RawFrame:
+    """Read the primary HDU without loading or scaling pixel data.
+
+    The data array is a read-only memory map of the file, so reading
+    costs neither memory nor time until the pixels are used.
+
+    :param path: FITS file path
+    :return: unscaled data and header
+    :rtype: RawFrame
+    """
+    with fits.open(path, memmap=True, do_not_scale_image_data=True) as hdul:
+        return RawFrame(hdul[0].data, hdul[0].header)
+
+
+class FrameBuffer:
+    """Reusable pixel and uncertainty buffers for in-place calibration.
+
+    One buffer per worker keeps resident memory at two frames regardless
+    of the number of images processed; the arrays are reallocated only
+    when the frame shape changes.
+    """
+    def __init__(self, dtype=np.float64) -> None:
+        self.dtype_ = np.dtype(dtype)
+        self.data_ = None
+        self.deviation_ = None
+
+    def arrays(self, shape:tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+        """Buffers for a frame of the given shape.
+
+        :param shape: frame shape
+        :type shape: tuple[int, int]
+        :return: data and deviation arrays, contents undefined
+        :rtype: tuple[np.ndarray, np.ndarray]
+        """
+        if self.data_ is None or self.data_.shape != tuple(shape):
+            self.data_ = None
+            self.deviation_ = None
+            self.data_ = np.empty(shape, dtype=self.dtype_)
+            self.deviation_ = np.empty(shape, dtype=self.dtype_)
+        return self.data_, self.deviation_
+
+
+def _check_master(master, shape):
+    if master.shape != shape:
+        raise ValueError(f"operands could not be subtracted with shapes {shape} {master.shape}")
+    if master.unit != u.electron:
+        raise u.UnitsError(f"Unit '{u.electron}' of the uncalibrated image does not "
+                           f"match unit '{master.unit}' of the calibration image")
+
+def _master_arrays(master, rows):
+    deviation = None if master.uncertainty is None else master.uncertainty.array[rows]
+    return master.data[rows], deviation
+
+def calibrate_into(raw:RawFrame, buffer:FrameBuffer,
+                   bias:CCDData=None, dark:CCDData=None, flat:CCDData=None,
+                   block_rows:int=256) -> CCDData:
+    """Calibrate a raw frame in place into a reusable buffer.
+
+    Performs the same reduction as :py:func:`calibrate_image`: ADU scaling,
+    conversion to electrons with Poisson and read noise deviation, bias and
+    dark subtraction and division by the mean-normalized flat, with the same
+    uncertainty propagation as :py:func:`ccdproc.ccd_process`.  The frame is
+    processed in blocks of rows directly from the raw (typically memory-mapped)
+    data, so apart from the buffer only block-sized temporaries are allocated.
+
+    The returned image shares the buffer arrays and is valid until the next
+    call with the same buffer.
+
+    :param raw: raw light frame, see :py:func:`read_raw`
+    :type raw: RawFrame
+    :param buffer: destination buffer
+    :type buffer: FrameBuffer
+    :param bias: master bias in electrons, defaults to None
+    :type bias: :py:class:`~astropy.nddata.CCDData`, optional
+    :param dark: master dark in electrons, defaults to None
+    :type dark: :py:class:`~astropy.nddata.CCDData`, optional
+    :param flat: master flat, defaults to None
+    :type flat: :py:class:`~astropy.nddata.CCDData`, optional
+    :param block_rows: number of rows processed at once, defaults to 256
+    :type block_rows: int, optional
+    :raises ValueError: if the camera is unknown, so gain and read noise are not available
+    :return: calibrated image in electrons with uncertainty
+    :rtype: :py:class:`~astropy.nddata.CCDData`
+    """
+    header = fits.Header(raw.header)
+    camera = CameraRegistry.get(header['instrume'])
+    if camera is None:
+        raise ValueError("gain and readnoise must be specified to create error frame.")
+    gain = camera.gain_to_e(header['gain']).value
+    read_noise2 = camera.read_noise(header['gain']).value ** 2
+    scale = header.pop('BSCALE', 1) / camera.adu_scale
+    offset = header.pop('BZERO', 0) / camera.adu_scale
+
+    shape = raw.data.shape
+    masters = [m for m in [bias, dark] if m is not None]
+    for master in masters:
+        _check_master(master, shape)
+    if flat is not None and flat.shape != shape:
+        raise ValueError(f"operands could not be divided with shapes {shape} {flat.shape}")
+    flat_mean = None if flat is None else flat.data.mean()
+    masks = [m.mask for m in masters + ([flat] if flat is not None else []) if m.mask is not None]
+    mask = None if not masks else np.logical_or.reduce(masks)
+
+    data, deviation = buffer.arrays(shape)
+    for start in range(0, shape[0], block_rows):
+        rows = slice(start, start + block_rows)
+        d, e = data[rows], deviation[rows]
+        np.multiply(raw.data[rows], scale, out=d)
+        d += offset
+        d *= gain
+        np.add(d, read_noise2, out=e)
+        np.sqrt(e, out=e)
+        e[d < 0] = np.nan
+        for master in masters:
+            m_data, m_deviation = _master_arrays(master, rows)
+            d -= m_data
+            if m_deviation is not None:
+                np.hypot(e, m_deviation, out=e)
+        if flat is not None:
+            f_data, f_deviation = _master_arrays(flat, rows)
+            f = f_data / flat_mean
+            if flat.mask is not None:
+                f[flat.mask[rows]] = 1.0
+            if f_deviation is None:
+                np.divide(e, np.abs(f), out=e)
+            else:
+                np.hypot(e * f, d * (f_deviation / flat_mean), out=e)
+                e /= f * f
+            d /= f
+
+    header['bias-sub'] = 'T' if bias is not None else 'F'
+    header['dark-sub'] = 'T' if dark is not None else 'F'
+    header['flat-sub'] = 'T' if flat is not None else 'F'
+    header['comment'] = 'Created by VSO reduction pipeline'
+    return CCDData(data, uncertainty=StdDevUncertainty(deviation, copy=False),
+                   mask=mask, meta=header, unit=u.electron)
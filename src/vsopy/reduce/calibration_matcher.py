@@ -114,20 +114,45 @@ class CalibrationMatcher:
         return self.most_recent(header, temp_filtered)['file']
 
 
-    def match(self, header, scale=False):
+    def match_files(self, header, scale=False):
+        """File names of master frames calibrating the frame, relative to the calibration directory.
+
+        Args:
+            header (dict-like): header of a frame to be calibrated
+            scale (bool): whether dark frames are scaled, so bias is needed
+
+        Returns:
+            Calibration: master frame file names, None for masters not needed
+        """
         if header['frame'] == FrameType.BIAS.value:
-            return Calibration(None, None, None)
+            files = (None, None, None)
         elif header['frame'] == FrameType.DARK.value:
-            return Calibration(None if not scale else self.load_image(self.match_bias(header)),
-                               None,
-                               None)
+            files = (None if not scale else self.match_bias(header), None, None)
         elif header['frame'] == FrameType.FLAT.value:
-            return Calibration(None if not scale else self.load_image(self.match_bias(header)),
-                               self.load_image(self.match_dark(header, scale=scale, future=True)),
-                               None)
+            files = (None if not scale else self.match_bias(header),
+                     self.match_dark(header, scale=scale, future=True),
+                     None)
         elif header['frame'] == FRAME_LIGHT:
-            return Calibration(None if not scale else self.load_image(self.match_bias(header)),
-                               self.load_image(self.match_dark(header, scale=scale)),
-                               self.load_image(self.match_flat(header)))
+            files = (None if not scale else self.match_bias(header),
+                     self.match_dark(header, scale=scale),
+                     self.match_flat(header))
         else:
             raise RuntimeError(f"Unsupported frame type '{header['frame']}'")
+        return Calibration(*files)
+
+    def match_paths(self, header, scale=False):
+        """Paths to master frames calibrating the frame, see :py:meth:`match`.
+
+        Args:
+            header (dict-like): header of a frame to be calibrated
+            scale (bool): whether dark frames are scaled, so bias is needed
+
+        Returns:
+            Calibration: master frame paths, None for masters not needed
+        """
+        return Calibration(*[None if file is None else self.calibr_dir_ / file
+                             for file in self.match_files(header, scale)])
+
+    def match(self, header, scale=False):
+        return Calibration(*[None if file is None else self.load_image(file)
+                             for file in self.match_files(header, scale)])
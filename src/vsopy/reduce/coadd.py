@@ -0,0 +1,130 @@
+import astropy.units as u
+import ccdproc as ccdp
+import numpy as np
+from astropy.io import fits
+from astropy.nddata import CCDData, StdDevUncertainty
+from astropy.wcs.utils import proj_plane_pixel_area
+from collections.abc import Iterable
+
+
+class CoaddBuilder:
+    """Accumulates calibrated frames into a sum co-add.
+
+    The first frame defines the pixel grid: its WCS and shape.  Every next frame
+    is aligned to the grid by its (solved) WCS with :py:func:`ccdproc.wcs_project`
+    and added pixel by pixel.  Alignment conserves counts: interpolated pixel
+    values are scaled by the ratio of the co-add and frame pixel areas, and
+    variances by its square, so frames of different pixel scales can be combined.  Pixel
+    values and variances are summed, so the co-add is in the units of the frames
+    (electrons) with total exposure in `EXPTIME`; flux per second measured on it
+    is comparable to single frames.
+    Pixels not covered by all frames, or masked in any of them, are NaN.
+    """
+    def __init__(self, order:str='bilinear') -> None:
+        """Create an empty co-add.
+
+        :param order: interpolation order for alignment, defaults to 'bilinear'
+        :type order: str, optional
+        """
+        self.order_ = order
+        self.data_ = None
+        self.variance_ = None
+        self.header_ = None
+        self.wcs_ = None
+        self.unit_ = None
+        self.exposure_ = 0.
+        self.count_ = 0
+
+    def __len__(self) -> int:
+        """Number of frames added."""
+        return self.count_
+
+    def add(self, image:CCDData) -> None:
+        """Align the frame and add it to the co-add.
+
+        The frame arrays are not retained, so a reusable buffer
+        (see :py:class:`~vsopy.reduce.FrameBuffer`) may be passed.
+
+        :param image: calibrated frame with WCS and uncertainty
+        :type image: :py:class:`~astropy.nddata.CCDData`
+        :raises ValueError: if the frame unit differs from the co-add unit
+        """
+        data, variance = self._align(image)
+        if self.data_ is None:
+            self.data_ = data.copy() if data is image.data else data
+            self.variance_ = variance
+            self.header_ = fits.Header(image.header)
+            self.wcs_ = image.wcs
+            self.unit_ = image.unit
+        elif image.unit != self.unit_:
+            raise ValueError(f"Frame unit '{image.unit}' differs from co-add unit '{self.unit_}'")
+        else:
+            self.data_ += data
+            if self.variance_ is not None:
+                if variance is None:
+                    self.variance_ = None
+                else:
+                    self.variance_ += variance
+        self.exposure_ += image.header['EXPTIME']
+        self.count_ += 1
+
+    def _align(self, image:CCDData) -> tuple[np.ndarray, np.ndarray | None]:
+        deviation = None if image.uncertainty is None else image.uncertainty.array
+        if self.wcs_ is None:
+            data = np.asarray(image.data, dtype=float)
+            if image.mask is not None:
+                data = np.where(image.mask, np.nan, data)
+            return data, None if deviation is None else np.asarray(deviation, dtype=float)**2
+
+        shape = self.data_.shape
+        projected = ccdp.wcs_project(image, self.wcs_, target_shape=shape, order=self.order_)
+        # wcs_project scales the data by the pixel area ratio, conserving counts
+        data = np.asarray(projected.data, dtype=float)
+        if projected.mask is not None:
+            data[projected.mask] = np.nan
+        if deviation is None:
+            return data, None
+        # the variance projected the same way is scaled once; counts scaled by
+        # the ratio have variance scaled by its square
+        area_ratio = proj_plane_pixel_area(self.wcs_) / proj_plane_pixel_area(image.wcs)
+        variance = ccdp.wcs_project(CCDData(np.asarray(deviation, dtype=float)**2,
+                                            wcs=image.wcs, unit=u.dimensionless_unscaled),
+                                    self.wcs_, target_shape=shape, order=self.order_)
+        return data, area_ratio * np.asarray(variance.data)
+
+    @property
+    def image(self) -> CCDData:
+        """The co-add.
+
+        Header is taken from the first frame, with `EXPTIME` set to the total
+        exposure and `NCOMBINE` to the number of frames.
+
+        :raises ValueError: if no frames were added
+        :return: co-added image
+        :rtype: :py:class:`~astropy.nddata.CCDData`
+        """
+        if self.data_ is None:
+            raise ValueError("No frames were added to the co-add")
+        header = fits.Header(self.header_)
+        header['EXPTIME'] = self.exposure_
+        header['NCOMBINE'] = self.count_
+        header['comment'] = 'Co-added by VSO reduction pipeline'
+        return CCDData(self.data_, wcs=self.wcs_, meta=header, unit=self.unit_,
+                       uncertainty=None if self.variance_ is None
+                       else StdDevUncertainty(np.sqrt(self.variance_), copy=False))
+
+
+def coadd_images(images:Iterable[CCDData], order:str='bilinear') -> CCDData:
+    """Align and sum calibrated frames, see :py:class:`CoaddBuilder`.
+
+    :param images: calibrated frames with WCS
+    :type images: iterable of :py:class:`~astropy.nddata.CCDData`
+    :param order: interpolation order for alignment, defaults to 'bilinear'
+    :type order: str, optional
+    :return: co-added image
+    :rtype: :py:class:`~astropy.nddata.CCDData`
+    """
+    builder = CoaddBuilder(order)
+    for image in images:
+        builder.add(image)
+    return builder.image
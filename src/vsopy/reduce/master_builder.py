@@ -1,5 +1,6 @@
 import astropy.units as u
 import ccdproc as ccdp
+import itertools
 import numpy as np
 import logging
 import tempfile
@@ -10,17 +11,41 @@ from astropy.time import Time
 from pathlib import Path
 from vsopy.reduce import CalibrationMatcher
 from vsopy.data import CameraRegistry
-from vsopy.util import FrameType
+from vsopy.util import FrameType, StageMetrics
 
 def round_Mb(x):
     return (x >> 20) << 20
 
+_WORKER_BUILDER = None
+
+def init_worker(output_dir, tmp_dir):
+    """Executor initializer making the builder of a worker."""
+    global _WORKER_BUILDER
+    _WORKER_BUILDER = MasterBuilder(output_dir, tmp_dir)
+
+def prepare_image(path, tmp_dir):
+    """Calibrate a frame by the builder of the worker, see :py:func:`init_worker`."""
+    _WORKER_BUILDER.process_image(Path(path), tmp_dir)
+
 class MasterBuilder:
-    def __init__(self, output_dir, tmp_dir, overwrite=False, delete_tmp=True) -> None:
+    def __init__(self, output_dir, tmp_dir, overwrite=False, delete_tmp=True, executor=None,
+                 progress=None) -> None:
+        """Create a builder.
+
+        :param executor: executor calibrating frames of a master, its workers
+                         initialized by :py:func:`init_worker`; defaults to
+                         None for calibrating them in this process
+        :type executor: :py:class:`~concurrent.futures.Executor`, optional
+        :param progress: reporter counting masters with their `calibrate` and
+                         `combine` stage times, defaults to None
+        :type progress: :py:class:`~vsopy.util.ProgressReporter`, optional
+        """
         self.output_dir_ = Path(output_dir)
         self.tmp_dir_ = Path(tmp_dir)
         self.overwrite_ = overwrite
         self.delete_tmp_ = delete_tmp
+        self.executor_ = executor
+        self.progress_ = progress
 
         self.matcher = CalibrationMatcher(self.output_dir_)
         logging.getLogger('astropy').setLevel(logging.ERROR)
@@ -65,8 +90,12 @@ class MasterBuilder:
 
     def prepare_images(self, group, img_dir, tmp_dir):
         paths= [img_dir / r['file'] for r in group]
-        for p in paths:
-            self.process_image(p, tmp_dir)
+        if self.executor_ is None:
+            for p in paths:
+                self.process_image(p, tmp_dir)
+        else:
+            for _ in self.executor_.map(prepare_image, paths, itertools.repeat(tmp_dir)):
+                pass
 
     def create_master(self, frame_type, num_frames, keys, temp, tmp_dir):
         deviated = ccdp.ImageFileCollection(tmp_dir)
@@ -112,6 +141,8 @@ class MasterBuilder:
         columns = ['frame', 'instrume', 'gain', 'xbinning', 'ybinning', 'offset', 'exptime', 'filter']
 
         grouped = summary.group_by(columns).groups
+        if self.progress_ is not None:
+            self.progress_.add_total(sum(keys['frame'] in self.whitelist_ for keys in grouped.keys))
         for group, keys in zip(grouped, grouped.keys):
             print(dict(keys))
             frame_type = keys['frame']
@@ -120,10 +151,16 @@ class MasterBuilder:
                 continue
             with tempfile.TemporaryDirectory(dir=self.tmp_dir_,
                                                 delete=self.delete_tmp_) as tmp:
+                metrics = StageMetrics(['calibrate', 'combine'])
                 try:
                     tmp_dir = self.tmp_dir_/tmp
-                    self.prepare_images(group, Path(dir), tmp_dir)
-                    self.create_master(frame_type, len(group), keys, np.mean(
-                        group['ccd-temp']), tmp_dir)
+                    with metrics.stage('calibrate'):
+                        self.prepare_images(group, Path(dir), tmp_dir)
+                    with metrics.stage('combine'):
+                        self.create_master(frame_type, len(group), keys, np.mean(
+                            group['ccd-temp']), tmp_dir)
                 except Exception as e:
+                    metrics.fail(e)
                     print(f"\nFailed: {e}")
+                if self.progress_ is not None:
+                    self.progress_.update(metrics=metrics.to_dict())
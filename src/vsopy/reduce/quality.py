@@ -0,0 +1,119 @@
+import numpy as np
+from astropy.stats import sigma_clipped_stats
+from scipy import ndimage
+from typing import NamedTuple
+
+FWHM_FACTOR = 2.0 * np.sqrt(2.0 * np.log(2.0))
+
+
+class FrameRejected(Exception):
+    """Frame failed the quality check."""
+    pass
+
+
+class FrameQuality(NamedTuple):
+    """Quality estimates of a light frame."""
+    background: float
+    """Median background level, ADU."""
+    noise: float
+    """Background standard deviation, ADU."""
+    stars: int
+    """Number of detected sources."""
+    fwhm: float
+    """Median FWHM of the sources, pixels of the full frame."""
+    ellipticity: float
+    """Median ellipticity :math:`1 - b/a` of the sources."""
+
+
+def subsample(data:np.ndarray, binning:int) -> np.ndarray:
+    """Block average of the frame.
+
+    The frame is cropped to a multiple of `binning` in both dimensions.
+
+    :param data: frame data
+    :type data: :py:class:`~numpy.ndarray`
+    :param binning: block size, pixels
+    :type binning: int
+    :return: binned frame
+    :rtype: :py:class:`~numpy.ndarray`
+    """
+    ny, nx = data.shape[0] // binning, data.shape[1] // binning
+    blocks = data[:ny * binning, :nx * binning].reshape(ny, binning, nx, binning)
+    return blocks.mean(axis=(1, 3), dtype=float)
+
+
+def frame_quality(data:np.ndarray, binning:int=4, threshold:float=5.,
+                  scale:float=1., offset:float=0.) -> FrameQuality:
+    """Estimate frame quality on a subsampled frame.
+
+    The frame is block-averaged by `binning`, the background and its noise
+    are estimated by sigma-clipped statistics, and sources are detected as
+    connected regions of at least 3 binned pixels above `threshold` sigma.
+    FWHM and ellipticity of every source come from its intensity-weighted
+    second moments; medians over all sources are reported.  Being computed
+    above threshold, they are underestimated for faint sources, so they are
+    meant for relative comparison of frames rather than as absolute values.
+
+    :param data: frame data, possibly raw integers
+    :type data: :py:class:`~numpy.ndarray`
+    :param binning: subsampling block size, defaults to 4
+    :type binning: int, optional
+    :param threshold: detection threshold in noise sigma, defaults to 5
+    :type threshold: float, optional
+    :param scale: scale of raw values (FITS BSCALE), defaults to 1
+    :type scale: float, optional
+    :param offset: offset of raw values (FITS BZERO), defaults to 0
+    :type offset: float, optional
+    :return: quality estimates
+    :rtype: FrameQuality
+    """
+    binned = subsample(data, binning) * scale + offset
+    _, background, noise = sigma_clipped_stats(binned, sigma=3.0)
+    signal = binned - background
+    labels, count = ndimage.label(signal > threshold * noise)
+    if count == 0:
+        return FrameQuality(float(background), float(noise), 0, np.nan, np.nan)
+
+    index = np.arange(1, count + 1)
+    size = ndimage.sum_labels(np.ones_like(signal), labels, index)
+    y, x = np.indices(signal.shape)
+    m00 = ndimage.sum_labels(signal, labels, index)
+    mx = ndimage.sum_labels(signal * x, labels, index) / m00
+    my = ndimage.sum_labels(signal * y, labels, index) / m00
+    cxx = ndimage.sum_labels(signal * x * x, labels, index) / m00 - mx**2
+    cyy = ndimage.sum_labels(signal * y * y, labels, index) / m00 - my**2
+    cxy = ndimage.sum_labels(signal * x * y, labels, index) / m00 - mx * my
+
+    # eigenvalues of the covariance matrix
+    half_sum = (cxx + cyy) / 2
+    half_diff = np.sqrt(((cxx - cyy) / 2)**2 + cxy**2)
+    a2, b2 = half_sum + half_diff, np.maximum(half_sum - half_diff, 0)
+    good = (size >= 3) & (a2 > 0)
+    if not np.any(good):
+        return FrameQuality(float(background), float(noise), 0, np.nan, np.nan)
+    a, b = np.sqrt(a2[good]), np.sqrt(b2[good])
+    fwhm = FWHM_FACTOR * np.sqrt((a**2 + b**2) / 2) * binning
+    return FrameQuality(float(background), float(noise), int(np.sum(good)),
+                        float(np.median(fwhm)), float(np.median(1 - b / a)))
+
+
+def check_quality(quality:FrameQuality, settings) -> None:
+    """Check frame quality against thresholds.
+
+    :param quality: quality estimates
+    :type quality: FrameQuality
+    :param settings: thresholds, missing ones are not checked
+    :type settings: :py:class:`~vsopy.util.QualitySettings`
+    :raises FrameRejected: listing all failed checks
+    """
+    reasons = []
+    if settings.max_background is not None and quality.background > settings.max_background:
+        reasons.append(f"background {quality.background:.1f} > {settings.max_background}")
+    if settings.min_stars is not None and quality.stars < settings.min_stars:
+        reasons.append(f"stars {quality.stars} < {settings.min_stars}")
+    if settings.max_fwhm is not None and not quality.fwhm <= settings.max_fwhm:
+        reasons.append(f"FWHM {quality.fwhm:.2f} > {settings.max_fwhm}")
+    if settings.max_ellipticity is not None and not quality.ellipticity <= settings.max_ellipticity:
+        reasons.append(f"ellipticity {quality.ellipticity:.2f} > {settings.max_ellipticity}")
+    if reasons:
+        raise FrameRejected('; '.join(reasons))
@@ -1,3 +1,4 @@
+import asyncio
 import astropy.units as u
 import ccdproc as ccdp
 import subprocess
@@ -7,18 +8,62 @@ from astropy.stats import sigma_clipped_stats
 from astropy.wcs import WCS
 from pathlib import Path
 
+def _astap_arguments(file_path, solver_path, radius):
+    return ['astap_cli', '-f', str(file_path), '-wcs', '-sip', '-r', str(radius.value),
+            '-o', str(solver_path)]
+
 def astap_solver(file_path, solved_dir, radius=10*u.deg):
     file_name = Path(file_path).name
     solver_path = Path(solved_dir) / file_name
     wcs_path = solver_path.with_suffix('.wcs')
     if not wcs_path.exists():
-        solver = f"astap_cli -f {file_path} -wcs -sip -r {radius.value} -o {solver_path}"
-        rc = subprocess.run(solver, shell=True )
+        rc = subprocess.run(_astap_arguments(file_path, solver_path, radius))
         if rc.returncode != 0:
             raise RuntimeError(f"ASTAP solver failed for {file_path}")
     hdul_wcs = fits.open(wcs_path)
     return hdul_wcs[0].header
 
+async def astap_solver_async(file_path, solved_dir, radius=10*u.deg):
+    """Plate-solve a frame like :py:func:`astap_solver` without blocking the event loop.
+
+    The solver runs as a subprocess awaited by the event loop, so many
+    frames can be solved concurrently from a single thread; the caller
+    bounds the number of solver processes.
+
+    :param file_path: frame path
+    :type file_path: path-like
+    :param solved_dir: directory of the solutions, existing ones are reused
+    :type solved_dir: path-like
+    :param radius: search radius, defaults to 10 deg
+    :type radius: :py:class:`~astropy.units.Quantity`, optional
+    :raises RuntimeError: if the solver fails
+    :return: WCS header of the solution
+    :rtype: :py:class:`~astropy.io.fits.Header`
+    """
+    solver_path = Path(solved_dir) / Path(file_path).name
+    wcs_path = solver_path.with_suffix('.wcs')
+    if not wcs_path.exists():
+        process = await asyncio.create_subprocess_exec(*_astap_arguments(file_path, solver_path, radius))
+        if await process.wait() != 0:
+            raise RuntimeError(f"ASTAP solver failed for {file_path}")
+    return fits.getheader(wcs_path)
+
+def read_solution(file_path, solved_dir):
+    """Read the plate solution of a frame stored by :py:func:`astap_solver`, never solving it.
+
+    :param file_path: frame path
+    :type file_path: path-like
+    :param solved_dir: directory of the solutions
+    :type solved_dir: path-like
+    :raises RuntimeError: if the frame has no solution
+    :return: WCS header of the solution
+    :rtype: :py:class:`~astropy.io.fits.Header`
+    """
+    wcs_path = (Path(solved_dir) / Path(file_path).name).with_suffix('.wcs')
+    if not wcs_path.exists():
+        raise RuntimeError(f"No plate solution for {file_path}")
+    return fits.getheader(wcs_path)
+
 def update_wcs(image, wcs_header):
     header = fits.Header(image.header)
     header.update(wcs_header)
@@ -30,8 +75,7 @@ def load_and_solve(file_path, solved_dir, radius=10*u.deg):
     solver_path = Path(solved_dir) / file_name
     wcs_path = solver_path.with_suffix('.wcs')
     if not wcs_path.exists():
-        solver = f"astap_cli -f {file_path} -wcs -sip -r {radius.value} -o {solver_path}"
-        rc = subprocess.run(solver, shell=True )
+        rc = subprocess.run(_astap_arguments(file_path, solver_path, radius))
         if rc.returncode != 0:
             raise RuntimeError(f"ASTAP solver failed for {file_path}")
     hdul_wcs = fits.open(wcs_path)
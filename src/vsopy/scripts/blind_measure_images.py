@@ -5,12 +5,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(
 
 import argparse
 import astropy.units as u
-import concurrent.futures as cf
 import numpy as np
 
 from astropy.coordinates import SkyCoord
 from astropy.nddata import CCDData
-from astropy.table import QTable, Column, join, vstack
+from astropy.table import QTable, Column, join
 from astropy.stats import sigma_clipped_stats
 from photutils.detection import DAOStarFinder
 from vsopy import phot
@@ -25,8 +24,12 @@ def parse_args():
     parser.add_argument('-t', '--tag', type=str, required=True, help='Tag (date)')
     parser.add_argument('-w', '--work-dir', type=str, required=True, help='Work directory')
     parser.add_argument('-p', '--parallel', type=int, default=1, help='Number of parallel workers')
+    util.add_executor_arguments(parser)
     parser.add_argument('--snr', type=float, default=15, help='SNR threshold in dB')
     parser.add_argument('--max-separation', type=float, default=1.4, help='Star separation tolerance')
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='Continue an interrupted run, skipping images it completed')
+    util.add_progress_arguments(parser)
     parser.add_argument('--overwrite', action='store_true', default=False, help='Overwrite output files')
 
     return parser.parse_args()
@@ -35,6 +38,7 @@ CONTEXT = None
 
 def make_context(args):
     print('making context')
+    phot.set_threads(util.worker_threads(args.threads, args.parallel, args.executor))
     session = util.Session(tag=args.tag, name=args.object)
     work_layout = util.WorkLayout(args.work_dir)
     session_layout = work_layout.get_session(session)
@@ -42,84 +46,78 @@ def make_context(args):
     matcher = reduce.CalibrationMatcher(work_layout.calibr_dir)
     settings = util.Settings(session_layout.settings_file_path)
     global CONTEXT
-    CONTEXT = (matcher, solver, settings.aperture)
+    CONTEXT = (matcher, solver, settings.aperture, settings.quality)
 
 def find_image_centroids(image, fwhm=10., threshold=5.):
     _, _, std = sigma_clipped_stats(image.data, sigma=3.0)
     daofind = DAOStarFinder(fwhm=fwhm, threshold=threshold*std)
     sources = daofind(image.data)
-    return QTable(dict(radec2000=image.wcs.pixel_to_world(sources['xcentroid'],
-                                                          sources['ycentroid']),
-                       auid=sources['id']))
+    return phot.CentroidCatalog.from_pixels(image.wcs, sources['xcentroid'], sources['ycentroid'],
+                                            np.asarray(sources['id']))
 
 def blind_measure_image(id, path, snr_th):
     print(f'measure {path}')
     global CONTEXT
-    matcher, solver, aperture = CONTEXT
-    result = phot.process_image(path, matcher, solver, find_image_centroids, aperture)
-    result = result[result['snr'].value > snr_th]
-    result['image_id'] = id
-    return result['image_id', 'auid', 'radec2000', 'M', 'flux', 'snr', 'peak']
+    matcher, solver, aperture, quality = CONTEXT
+    result, metrics = phot.process_image(path, matcher, solver, find_image_centroids, aperture,
+                                         quality=quality, records=True)
+    if result is None:
+        return None, metrics
+    # compact records are converted to a table by the parent
+    return phot.select_records(result[result['snr'] > snr_th],
+                               ['image_id', 'auid', 'ra', 'dec', 'M', 'flux', 'snr', 'peak'],
+                               image_id=id), metrics
 
 def build_star_table(tables, dist_th):
-    stars = None
-
-    id_map = QTable(dict(
-        star_id = Column([], dtype='int32'),
-        image_id = Column([], dtype='int32'),
-        auid = Column([], dtype='int32')
-
-    ))
+    ra, dec = np.zeros(0), np.zeros(0)
+    err = np.zeros(0) * u.arcsec
+    count = np.zeros(0, dtype='int32')
+    star_id = np.zeros(0, dtype='int32')
+    id_map = []
 
     last_sid = 1
 
     for table in tables:
-        c = stars['radec2000'] if stars is not None else SkyCoord(ra=[], dec=[], unit=(u.deg, u.deg))
+        detected = phot.CentroidCatalog.from_table(table)
+        stars = phot.CentroidCatalog(ra, dec, star_id)
         # look for matching stars (fast with K-D tree)
-        x1, xs, sep, _ = table['radec2000'].search_around_sky(c, dist_th)
+        x1, xs, sep = stars.search_around(detected, dist_th)
 
         # add new stars to the table
-        mask = np.ones(len(table), dtype=bool)
-        mask[xs]=False
-        new_rows = table[mask]
-        new_size = len(new_rows)
-        star_ids = range(last_sid, last_sid + new_size)
-        id_map = vstack([id_map, QTable(dict(
-            star_id = star_ids,
-            image_id = new_rows['image_id'],
-            auid = new_rows['auid'],
-        ))])
-        new = QTable(dict(
-            star_id = star_ids,
-            radec2000=new_rows['radec2000'],
-            err=np.zeros(new_size, dtype='float32')*u.arcsec,
-            count= np.ones(new_size, dtype='int32')
-        ))
+        mask = np.ones(len(detected), dtype=bool)
+        mask[xs] = False
+        new_size = np.sum(mask)
+        new_ids = np.arange(last_sid, last_sid + new_size, dtype='int32')
+        id_map.append((new_ids, table['image_id'][mask], table['auid'][mask]))
         last_sid += new_size
-        if (len(new) > 0):
-            stars = vstack([stars, new]) if stars is not None else new
 
         # modify existing stars in the table
-        if (len(xs) > 0):
-            mask = np.ones(len(stars), dtype=bool)
-            mask[x1]=False
-            update = table[xs]
-            old = stars[x1]
-            id_map = vstack([id_map, QTable(dict(
-                star_id = old['star_id'],
-                image_id = update['image_id'],
-                auid = update['auid'],
-            ))])
-            dra, ddec = old['radec2000'].spherical_offsets_to(update['radec2000'])
-            weight = 1.0/(old['count']+1)
-            old['radec2000'] = old['radec2000'].spherical_offsets_by(weight*dra, weight*ddec)
-            old['err'] = np.sqrt(old['err']**2/old['count'] + sep**2)
-            old['count'] += 1
-            stars = vstack([stars[mask], old])
-    mask = stars['err'] == 0.
-    update = stars[mask]
-    update['err'] = np.sqrt(dist_th**2/2)
-    stars = vstack([stars[~mask], update])
+        keep = np.ones(len(stars), dtype=bool)
+        keep[x1] = False
+        id_map.append((star_id[x1], table['image_id'][xs], table['auid'][xs]))
+        weight = 1.0 / (count[x1] + 1)
+        # running mean of the position, on unit vectors
+        xyz = stars.xyz[x1] + weight[:, np.newaxis] * (detected.xyz[xs] - stars.xyz[x1])
+        updated_ra = np.arctan2(xyz[:, 1], xyz[:, 0]) % (2 * np.pi)
+        updated_dec = np.arctan2(xyz[:, 2], np.hypot(xyz[:, 0], xyz[:, 1]))
+        updated_err = np.sqrt(err[x1]**2 / count[x1] + sep**2)
+
+        ra = np.concatenate([ra[keep], updated_ra, detected.ra[mask]])
+        dec = np.concatenate([dec[keep], updated_dec, detected.dec[mask]])
+        err = np.concatenate([err[keep], updated_err, np.zeros(new_size) * u.arcsec])
+        count = np.concatenate([count[keep], count[x1] + 1, np.ones(new_size, dtype='int32')])
+        star_id = np.concatenate([star_id[keep], star_id[x1], new_ids])
+
+    err[err == 0] = np.sqrt(dist_th**2 / 2)
+    stars = phot.CentroidCatalog(ra, dec, star_id).to_table()
+    stars.rename_column('auid', 'star_id')
+    stars['err'] = err.astype('float32')
+    stars['count'] = count
+    id_map = QTable(dict(
+        star_id=Column(np.concatenate([m[0] for m in id_map]), dtype='int32'),
+        image_id=Column(np.concatenate([m[1] for m in id_map]), dtype='int32'),
+        auid=Column(np.concatenate([m[2] for m in id_map]), dtype='int32')
+    ))
     return stars, id_map
 
 def main():
@@ -133,30 +131,61 @@ def main():
 
     blacklist = util.Blacklist(session_layout.blacklist_file_path)
 
-    with cf.ProcessPoolExecutor(initializer=make_context,
-                                initargs=(args,),
-                                max_workers=args.parallel) as executor:
-        futures = [(image['path'], executor.submit(blind_measure_image, image['image_id'], image['path'], args.snr))
-                   for image in images if not blacklist.contains(image['path'])]
-
-    def get_result(image_result):
-        path = None
-        try:
-            path, future = image_result
-            return future.result()
-        except Exception as e:
-            print(e)
-            blacklist.add(path, e)
-            return None
-
-    tables = list([t for t in [get_result(f) for f in futures] if t is not None])
+    # detections are kept in a partial table until all images are measured
+    partial_file_path = session_layout.blind_partial_file_path
+    journal = util.RunJournal(session_layout.blind_journal_file_path, resume=args.resume)
+    if args.resume:
+        print(f'resuming after {len(journal)} completed images')
+    for entry in journal.entries:
+        if 'reason' in entry:
+            blacklist.add(entry['path'], entry['reason'])
+
+    tasks = [(image['image_id'], image['path'], args.snr)
+             for image in images
+             if not blacklist.contains(image['path']) and image['image_id'] not in journal]
+    progress = util.ProgressReporter(len(tasks), workers=args.parallel, interval=args.progress,
+                                     log=args.progress_log, name='images')
+    offset = journal.offset if args.resume else None
+    with util.make_executor(args.executor, max_workers=args.parallel,
+                            initializer=make_context, initargs=(args,),
+                            queue=args.queue) as executor, \
+         util.EcsvWriter(partial_file_path, overwrite=True, offset=offset) as store, \
+         journal, progress:
+        for (id, path, _), future in util.submit_bounded(executor, blind_measure_image, tasks,
+                                                         2 * args.parallel):
+            try:
+                result, metrics = future.result()
+            except Exception as e:
+                result, metrics = None, dict(error=type(e).__name__, message=str(e))
+            progress.update(metrics=metrics)
+            if result is None:
+                reason = f"{metrics['error']}: {metrics['message']}"
+                print(reason)
+                blacklist.add(path, reason)
+                journal.record(id, path=path, reason=reason, offset=store.size)
+                continue
+            store.append(phot.photometry_table(result, sky_coord=False))
+            journal.record(id, path=path, offset=store.size)
+
+    if store.rows == 0 and not offset:
+        print('No stars detected')
+        return 1
+    detected = QTable.read(partial_file_path)
+    # sky coordinates are built once for all images
+    detected['radec2000'] = SkyCoord(ra=detected['ra'], dec=detected['dec'])
+    detected.remove_columns(['ra', 'dec'])
+    detected = detected['image_id', 'auid', 'radec2000', 'M', 'flux', 'snr', 'peak']
+    tables = [table for table in detected.group_by('image_id').groups]
     stars, id_map = build_star_table(tables, args.max_separation*u.arcsec)
-    result = join(vstack(tables), id_map, ['image_id', 'auid'])
+    result = join(detected, id_map, ['image_id', 'auid'])
     result.remove_column('auid')
 
     result.write(session_layout.root_dir / 'blind_measured.ecsv', format='ascii.ecsv', overwrite=args.overwrite)
     stars.write(session_layout.root_dir / 'detected_stars.ecsv', format='ascii.ecsv', overwrite=args.overwrite)
     blacklist.save(session_layout.blacklist_file_path)
+    # the run is complete, nothing is left to resume
+    partial_file_path.unlink()
+    session_layout.blind_journal_file_path.unlink(missing_ok=True)
 
     return 0
 
@@ -5,9 +5,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(
     os.path.dirname(__file__), '..')))
 
 import argparse
+import contextlib
 from pathlib import Path
-from vsopy.util import WorkLayout
+from vsopy.util import ProgressReporter, WorkLayout, add_executor_arguments, add_progress_arguments, make_executor
 from vsopy.reduce import MasterBuilder
+from vsopy.reduce.master_builder import init_worker
 
 
 def parse_args():
@@ -20,6 +22,11 @@ def parse_args():
                         default=None, help='Image directory')
     parser.add_argument('-m', '--memory-limit', type=int,
                         default=None, help='memory limit in MB')
+    parser.add_argument('-p', '--parallel', type=int, default=None,
+                        help='Number of parallel workers calibrating frames, '
+                             'default is to calibrate them in this process')
+    add_executor_arguments(parser, threads=False)
+    add_progress_arguments(parser)
     parser.add_argument('--no-cleanup', action='store_true',
                         default=False, help='Do not remove temporary files')
     parser.add_argument('--overwrite', action='store_true',
@@ -35,11 +42,22 @@ def process(dir, builder):
 def main():
     args = parse_args()
     layout = WorkLayout(args.work_dir)
-    builder = MasterBuilder(layout.calibr_dir,
-                            layout.tmp_dir,
-                            overwrite=args.overwrite,
-                            delete_tmp=not args.no_cleanup)
-    process(Path(args.image_dir), builder)
+    with contextlib.ExitStack() as stack:
+        progress = stack.enter_context(ProgressReporter(interval=args.progress, log=args.progress_log,
+                                                        name='masters'))
+        executor = None
+        if args.parallel or args.executor == 'queue':
+            executor = stack.enter_context(make_executor(
+                args.executor, max_workers=args.parallel,
+                initializer=init_worker, initargs=(layout.calibr_dir, layout.tmp_dir),
+                queue=args.queue))
+        builder = MasterBuilder(layout.calibr_dir,
+                                layout.tmp_dir,
+                                overwrite=args.overwrite,
+                                delete_tmp=not args.no_cleanup,
+                                executor=executor,
+                                progress=progress)
+        process(Path(args.image_dir), builder)
 
 
 # Example: python3 create_master.py -w /home/user/work -i /home/user/img/20240101/Calibr
@@ -5,13 +5,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(
 
 import sys
 import argparse
-import concurrent.futures as cf
-from astropy.table import QTable, vstack
+import asyncio
+import numpy as np
+from astropy.io import fits
+from astropy.table import QTable
 from vsopy import phot
 from vsopy import reduce
 from vsopy import util
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(
         description='Extract instrumental magnitudes from session images'
     )
@@ -19,36 +21,130 @@ def parse_args():
     parser.add_argument('-t', '--tag', type=str, required=True, help='Tag (date)')
     parser.add_argument('-w', '--work-dir', type=str, required=True, help='Work directory')
     parser.add_argument('-p', '--parallel', type=int, default=1, help='Number of parallel workers')
+    util.add_executor_arguments(parser)
+    parser.add_argument('-r', '--radii', type=float, nargs='+', default=None,
+                        help='Measure a grid of aperture radii in arcsec sharing the annulus from settings')
+    parser.add_argument('--sky', type=str, choices=phot.SKY_ESTIMATORS, default=None,
+                        help='Sigma-clipped sky estimator instead of plain annulus mean')
+    parser.add_argument('-s', '--stack', type=int, default=None,
+                        help='Co-add lights of N consecutive batches per filter and measure the co-adds; '
+                             'a co-add is attributed to the first batch of its group')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='Maximal number of images submitted to workers at a time, '
+                             'default is twice the number of workers')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='Read frames and their masters this many images ahead of the workers, '
+                             'default is 0 (no prefetching); cached frames are read too')
+    parser.add_argument('--io-threads', type=int, default=2,
+                        help='Number of threads prefetching frames (default: 2)')
+    parser.add_argument('--solvers', type=int, default=0,
+                        help='Plate-solve frames ahead of the workers running this many solver '
+                             'processes at a time, default is 0 (workers solve frames); '
+                             'replaces --prefetch since the solver reads the frames')
+    parser.add_argument('--solved-only', action='store_true', default=False,
+                        help='Use plate solutions made beforehand, e.g. by the solve stage of '
+                             'vso-pipeline; frames without one fail instead of being solved')
+    parser.add_argument('--no-cache', action='store_true', default=False,
+                        help='Measure all images even if cached photometry is up to date')
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='Continue an interrupted run, skipping images it completed')
+    util.add_progress_arguments(parser)
     parser.add_argument('--overwrite', action='store_true', default=False, help='Overwrite output files')
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 CONTEXT = None
 
+def session_context(work_layout, session, args, matcher, buffer):
+    """Measurement context of a session.
+
+    Workers measuring several sessions share the calibration `matcher`,
+    which keeps the master frames it loaded, and the frame `buffer`.
+    """
+    session_layout = work_layout.get_session(session)
+    solve = reduce.read_solution if args.solved_only else reduce.astap_solver
+    solver = lambda path: solve(path, session_layout.solved_dir)
+    centroids = phot.CentroidCatalog.from_table(QTable.read(session_layout.centroid_file_path))
+    settings = util.Settings(session_layout.settings_file_path)
+    aperture = settings.aperture if args.radii is None else settings.aperture.grid(args.radii)
+    cache = None if args.no_cache else phot.PhotometryCache(
+        session_layout.photometry_cache_dir,
+        centroids=centroids, aperture=aperture, sky=args.sky, quality=settings.quality)
+    return (matcher, solver, centroids, aperture, buffer, args.sky, settings.quality, cache)
+
 def make_context(args):
     print('making context')
+    phot.set_threads(util.worker_threads(args.threads, args.parallel, args.executor))
     session = util.Session(tag=args.tag, name=args.object)
     work_layout = util.WorkLayout(args.work_dir)
-    session_layout = work_layout.get_session(session)
-    solver = lambda path: reduce.astap_solver(path, session_layout.solved_dir)
     matcher = reduce.CalibrationMatcher(work_layout.calibr_dir)
-    centroids = QTable.read(session_layout.centroid_file_path)
-    settings = util.Settings(session_layout.settings_file_path)
     global CONTEXT
-    CONTEXT = (matcher, solver, centroids, settings.aperture)
+    CONTEXT = session_context(work_layout, session, args, matcher, reduce.FrameBuffer())
 
-def measure_image(id, path):
+def measure_image(id, path, context=None):
     print(f'measure {path}')
-    global CONTEXT
-    matcher, solver, centroids, aperture = CONTEXT
-    result = phot.process_image(path, matcher, solver,
-                                lambda image: phot.filter_centroids(image, centroids, aperture.r_out),
-                                aperture)
-    result['image_id'] = id
-    return result['image_id', 'auid', 'M', 'flux', 'snr', 'peak']
-
-def main():
-    args = parse_args()
+    cache = (context or CONTEXT)[-1]
+    return measure(id, path, lambda *args: phot.process_image(*args, cache=cache, records=True),
+                   context)
+
+def measure_stack(id, paths, context=None):
+    print(f'measure {len(paths)} frames stacked from {paths[0]}')
+    return measure(id, paths, lambda *args: phot.process_stack(*args, records=True), context)
+
+def measure(id, path, process, context=None):
+    """Measure a frame or a stack, returning compact photometry records.
+
+    The records are converted to a table by :py:func:`~vsopy.phot.photometry_table`
+    in the parent process.  The context defaults to that made by `make_context`.
+    """
+    matcher, solver, centroids, aperture, buffer, sky, quality, _ = context or CONTEXT
+    r_out = aperture.r_out if isinstance(aperture, util.Aperture) else aperture[0].r_out
+    result, metrics = process(path, matcher, solver,
+                              lambda image: phot.filter_centroids(image, centroids, r_out),
+                              aperture, buffer, sky, quality)
+    metrics = dict(image_id=id, path=str(path if isinstance(path, str) else path[0]), **metrics)
+    if result is None:
+        return None, metrics
+    columns = ['image_id', 'auid', 'r_ap', 'M', 'flux', 'snr', 'peak']
+    return phot.select_records(result, columns, image_id=id), metrics
+
+def frame_paths(matcher, task):
+    """Frames of a task followed by their master frames."""
+    _, paths = task
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    return paths + [master for path in paths for master in matcher.match_paths(fits.getheader(path))]
+
+def print_balance(stats, metrics, parallel):
+    """Report whether reading or computing limited the run."""
+    busy = sum(value for m in metrics for key, value in m.items()
+               if key.endswith('_wall') and np.isfinite(value))
+    compute = busy / (stats.wall_seconds * parallel) if stats.wall_seconds > 0 else 0.
+    print(f'prefetched {stats.files} files, {stats.bytes / 2**20:.0f} MiB in {stats.read_seconds:.1f} s '
+          f'({stats.io_utilization:.0%} of I/O threads busy); '
+          f'workers busy {compute:.0%}, waited for input {stats.wait_seconds:.1f} s ({stats.stall:.0%} of run)')
+    print('run was ' + ('I/O-bound: consider more --io-threads or a larger --prefetch'
+                        if stats.io_bound else 'CPU-bound'))
+
+async def measure_solved(executor, worker, tasks, max_pending, solvers, solved_dir, handle):
+    """Plate-solve frames of the tasks concurrently and submit the solved ones.
+
+    Solutions are stored in `solved_dir`, where the workers find them.
+    Frames the solver fails on are submitted anyway and rejected by the workers.
+    """
+    semaphore = asyncio.Semaphore(solvers)
+
+    async def solve(task):
+        _, paths = task
+        for path in [paths] if isinstance(paths, str) else paths:
+            async with semaphore:
+                await reduce.astap_solver_async(path, solved_dir)
+
+    async for (id, path), future in util.submit_staged(executor, worker, tasks, max_pending,
+                                                       prepare=solve, ahead=solvers):
+        handle(id, path, future)
+
+def main(argv=None):
+    args = parse_args(argv)
 
     session = util.Session(tag=args.tag, name=args.object)
     work_layout = util.WorkLayout(args.work_dir)
@@ -58,26 +154,84 @@ def main():
 
     blacklist = util.Blacklist(session_layout.blacklist_file_path)
 
-    with cf.ProcessPoolExecutor(initializer=make_context,
-                                    initargs=(args,),
-                                    max_workers=args.parallel) as executor:
-        futures = [(image['path'], executor.submit(measure_image, image['image_id'], image['path']))
-                  for image in images if not blacklist.contains(image['path'])]
-
-    def get_result(image_result):
-        path = None
-        try:
-            path, future = image_result
-            return future.result()
-        except Exception as e:
-            blacklist.add(path, e)
-            return None
-
-    tables = [get_result(f) for f in futures]
-
-    result = vstack([t for t in tables if t is not None])
-
-    result.write(session_layout.measured_file_path, format='ascii.ecsv', overwrite=args.overwrite)
+    journal = util.RunJournal(session_layout.measured_journal_file_path, resume=args.resume)
+    if args.resume:
+        print(f'resuming after {len(journal)} completed tasks')
+
+    if args.stack:
+        images = images[[not blacklist.contains(path) for path in images['path']]]
+        batch_images = QTable.read(session_layout.batch_images_file_path)
+        tasks = [(id, paths) for id, paths in util.stack_groups(images, batch_images, args.stack)
+                 if id not in journal]
+        worker = measure_stack
+    else:
+        tasks = [(image['image_id'], image['path'])
+                 for image in images
+                 if not blacklist.contains(image['path']) and image['image_id'] not in journal]
+        worker = measure_image
+
+    def report(path, reason):
+        # stack failures are not blacklisted: frames may be good individually
+        if args.stack:
+            print(f'Failed: {reason}')
+        else:
+            blacklist.add(path, reason)
+
+    for entry in journal.entries:
+        if 'reason' in entry:
+            report(entry['path'], entry['reason'])
+
+    progress = util.ProgressReporter(len(tasks), workers=args.parallel, interval=args.progress,
+                                     log=args.progress_log, name='stacks' if args.stack else 'images')
+    max_pending = args.max_pending if args.max_pending else 2 * args.parallel
+    prefetcher = None
+    if args.prefetch > 0 and args.solvers == 0:
+        matcher = reduce.CalibrationMatcher(work_layout.calibr_dir)
+        prefetcher = util.Prefetcher(lambda task: frame_paths(matcher, task),
+                                     ahead=args.prefetch, max_workers=args.io_threads)
+    run_metrics = []
+    # rows written after the last journal entry belong to unfinished tasks
+    offset = journal.offset if args.resume else None
+    with util.make_executor(args.executor, max_workers=args.parallel,
+                            initializer=make_context, initargs=(args,),
+                            queue=args.queue) as executor, \
+         util.EcsvWriter(session_layout.measured_file_path,
+                         overwrite=args.overwrite or len(journal) > 0, offset=offset) as store, \
+         journal, progress:
+
+        def handle(id, path, future):
+            try:
+                result, image_metrics = future.result()
+            except Exception as e:
+                report(path, str(e))
+                journal.record(id, path=path, reason=str(e), offset=store.size)
+                progress.update(error=type(e).__name__)
+                return
+            progress.update(metrics=image_metrics)
+            run_metrics.append(image_metrics)
+            if result is None:
+                reason = f"{image_metrics['error']}: {image_metrics['message']}"
+                report(path, reason)
+                journal.record(id, path=path, reason=reason, metrics=image_metrics, offset=store.size)
+            else:
+                store.append(phot.photometry_table(result))
+                journal.record(id, path=path, metrics=image_metrics, offset=store.size)
+
+        if args.solvers > 0:
+            asyncio.run(measure_solved(executor, worker, tasks, max_pending, args.solvers,
+                                       session_layout.solved_dir, handle))
+        else:
+            for (id, path), future in util.submit_bounded(executor, worker, tasks, max_pending,
+                                                                      prefetcher=prefetcher):
+                handle(id, path, future)
+    print(f'{store.rows} measurements written to {session_layout.measured_file_path}')
+    if prefetcher is not None:
+        prefetcher.close()
+        print_balance(prefetcher.stats, run_metrics, args.parallel)
+
+    metrics = [entry['metrics'] for entry in journal.entries if 'metrics' in entry]
+    util.metrics_table(metrics).write(session_layout.metrics_file_path,
+                                      format='ascii.ecsv', overwrite=True)
     blacklist.save(session_layout.blacklist_file_path)
 
     return 0
@@ -0,0 +1,235 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+from astropy.table import QTable
+from vsopy import phot
+from vsopy import reduce
+from vsopy import util
+from vsopy.scripts import measure_images
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Extract instrumental magnitudes from images of several sessions in a single run'
+    )
+    parser.add_argument('-w', '--work-dir', type=str, required=True, help='Work directory')
+    parser.add_argument('-t', '--tag', type=str, nargs='+', default=None,
+                        help='Measure all sessions of these tags (dates)')
+    parser.add_argument('-p', '--parallel', type=int, default=1, help='Number of parallel workers')
+    util.add_executor_arguments(parser)
+    parser.add_argument('-r', '--radii', type=float, nargs='+', default=None,
+                        help='Measure a grid of aperture radii in arcsec sharing the annulus from settings')
+    parser.add_argument('--sky', type=str, choices=phot.SKY_ESTIMATORS, default=None,
+                        help='Sigma-clipped sky estimator instead of plain annulus mean')
+    parser.add_argument('-s', '--stack', type=int, default=None,
+                        help='Co-add lights of N consecutive batches per filter and measure the co-adds')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='Maximal number of images submitted to workers at a time, '
+                             'default is twice the number of workers')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='Read frames and their masters this many images ahead of the workers, '
+                             'default is 0 (no prefetching)')
+    parser.add_argument('--io-threads', type=int, default=2,
+                        help='Number of threads prefetching frames (default: 2)')
+    parser.add_argument('--solved-only', action='store_true', default=False,
+                        help='Use plate solutions made beforehand, e.g. by the solve stage of '
+                             'vso-pipeline; frames without one fail instead of being solved')
+    parser.add_argument('--no-cache', action='store_true', default=False,
+                        help='Measure all images even if cached photometry is up to date')
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='Continue an interrupted run, skipping images it completed')
+    util.add_progress_arguments(parser)
+    parser.add_argument('--overwrite', action='store_true', default=False, help='Overwrite output files')
+    parser.add_argument('sessions', type=str, nargs='*', metavar='TAG/OBJECT',
+                        help='Sessions to measure; default is all sessions of --tag, '
+                             'or all sessions in the work directory')
+
+    return parser.parse_args(argv)
+
+CONTEXT = None
+
+def make_context(args):
+    """Worker context shared by all sessions.
+
+    Calibration masters and the frame buffer are shared, session contexts
+    are made when a worker meets the first image of a session.
+    """
+    print('making context')
+    phot.set_threads(util.worker_threads(args.threads, args.parallel, args.executor))
+    work_layout = util.WorkLayout(args.work_dir)
+    global CONTEXT
+    CONTEXT = (args, work_layout, reduce.CalibrationMatcher(work_layout.calibr_dir),
+               reduce.FrameBuffer(), {})
+
+def get_context(tag, name):
+    args, work_layout, matcher, buffer, contexts = CONTEXT
+    if (tag, name) not in contexts:
+        contexts[tag, name] = measure_images.session_context(
+            work_layout, util.Session(tag=tag, name=name), args, matcher, buffer)
+    return contexts[tag, name]
+
+def measure_image(tag, name, id, path):
+    return measure_images.measure_image(id, path, get_context(tag, name))
+
+def measure_stack(tag, name, id, paths):
+    return measure_images.measure_stack(id, paths, get_context(tag, name))
+
+def select_sessions(work_layout, args):
+    """Sessions named on the command line or discovered in the work directory.
+
+    Discovered sessions lacking images or centroids are not ready for
+    measurement and are skipped.
+    """
+    if args.sessions:
+        sessions = []
+        for rel_path in args.sessions:
+            tag, _, name = rel_path.strip('/').partition('/')
+            if not name:
+                raise ValueError(f"Session '{rel_path}' is not in TAG/OBJECT form")
+            sessions.append(util.Session(tag=tag, name=name))
+        return sessions
+    tags = args.tag if args.tag else [None]
+    sessions = [session for tag in tags for session in work_layout.sessions(tag)]
+    ready = []
+    for session in sessions:
+        session_layout = work_layout.get_session(session)
+        if session_layout.images_file_path.exists() and session_layout.centroid_file_path.exists():
+            ready.append(session)
+        else:
+            print(f'skipping {session.rel_path}: no images or centroids')
+    return ready
+
+class SessionRun:
+    """Tasks and outputs of a session measured in a night run."""
+    def __init__(self, work_layout, session, args):
+        self.session = session
+        self.layout = work_layout.get_session(session)
+        self.stack = args.stack
+        self.blacklist = util.Blacklist(self.layout.blacklist_file_path)
+        self.journal = util.RunJournal(self.layout.measured_journal_file_path, resume=args.resume)
+        for entry in self.journal.entries:
+            if 'reason' in entry:
+                self.report(entry['path'], entry['reason'])
+
+        images = QTable.read(self.layout.images_file_path)
+        images = images[[not self.blacklist.contains(path) for path in images['path']]]
+        if args.stack:
+            batch_images = QTable.read(self.layout.batch_images_file_path)
+            tasks = util.stack_groups(images, batch_images, args.stack)
+        else:
+            tasks = [(image['image_id'], image['path']) for image in images]
+        self.tasks = [(session.tag_, session.name_, id, path)
+                      for id, path in tasks if id not in self.journal]
+        self.pending = len(self.tasks)
+        self.closed = False
+
+        # rows written after the last journal entry belong to unfinished tasks
+        self.store = util.EcsvWriter(self.layout.measured_file_path,
+                                     overwrite=args.overwrite or len(self.journal) > 0,
+                                     offset=self.journal.offset if args.resume else None)
+
+    def report(self, path, reason):
+        # stack failures are not blacklisted: frames may be good individually
+        if self.stack:
+            print(f'{self.session.rel_path} failed: {reason}')
+        else:
+            self.blacklist.add(path, reason)
+
+    def complete(self, id, path, future):
+        """Write the result of a task, return its metrics."""
+        self.pending -= 1
+        try:
+            result, metrics = future.result()
+        except Exception as e:
+            self.report(path, str(e))
+            self.journal.record(id, path=path, reason=str(e), offset=self.store.size)
+            return dict(error=type(e).__name__, message=str(e))
+        if result is None:
+            reason = f"{metrics['error']}: {metrics['message']}"
+            self.report(path, reason)
+            self.journal.record(id, path=path, reason=reason, metrics=metrics, offset=self.store.size)
+        else:
+            self.store.append(phot.photometry_table(result))
+            self.journal.record(id, path=path, metrics=metrics, offset=self.store.size)
+        return metrics
+
+    def close(self):
+        """Close the outputs and write session metrics and blacklist.
+
+        Nothing is written for a session no task of which completed, so an
+        interrupted night leaves sessions it did not reach as they were.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.store.close()
+        self.journal.close()
+        if self.pending == len(self.tasks) > 0:
+            return
+        metrics = [entry['metrics'] for entry in self.journal.entries if 'metrics' in entry]
+        util.metrics_table(metrics).write(self.layout.metrics_file_path,
+                                          format='ascii.ecsv', overwrite=True)
+        self.blacklist.save(self.layout.blacklist_file_path)
+        print(f'{self.session.rel_path}: {self.store.rows} measurements written '
+              f'to {self.layout.measured_file_path}')
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    work_layout = util.WorkLayout(args.work_dir)
+    sessions = select_sessions(work_layout, args)
+    if not sessions:
+        print('No sessions to measure')
+        return 1
+
+    max_pending = args.max_pending if args.max_pending else 2 * args.parallel
+    worker = measure_stack if args.stack else measure_image
+    prefetcher = None
+    run_metrics = []
+    runs = {}
+    for session in sessions:
+        run = SessionRun(work_layout, session, args)
+        runs[session.tag_, session.name_] = run
+        print(f'{session.rel_path}: {len(run.tasks)} tasks'
+              + (f', {len(run.journal)} completed before' if args.resume else ''))
+
+    progress = util.ProgressReporter(sum(len(run.tasks) for run in runs.values()),
+                                     workers=args.parallel, interval=args.progress,
+                                     log=args.progress_log, name='stacks' if args.stack else 'images')
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(progress)
+        for run in runs.values():
+            # a session is closed as soon as its last task completes
+            stack.enter_context(contextlib.closing(run))
+        # sessions follow each other in a single task stream, so workers
+        # never idle at session boundaries
+        tasks = (task for run in runs.values() for task in run.tasks)
+        if args.prefetch > 0:
+            matcher = reduce.CalibrationMatcher(work_layout.calibr_dir)
+            prefetcher = util.Prefetcher(lambda task: measure_images.frame_paths(matcher, task[2:]),
+                                         ahead=args.prefetch, max_workers=args.io_threads)
+        with util.make_executor(args.executor, max_workers=args.parallel,
+                                initializer=make_context, initargs=(args,),
+                                queue=args.queue) as executor:
+            for (tag, name, id, path), future in util.submit_bounded(executor, worker, tasks, max_pending,
+                                                                              prefetcher=prefetcher):
+                run = runs[tag, name]
+                metrics = run.complete(id, path, future)
+                run_metrics.append(metrics)
+                progress.update(metrics=metrics)
+                if run.pending == 0:
+                    run.close()
+
+    if prefetcher is not None:
+        prefetcher.close()
+        measure_images.print_balance(prefetcher.stats, run_metrics, args.parallel)
+
+    return 0
+
+# Example: python3 measure_night.py -w /home/user/work -t 20230704 -p 8
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..')))
+
+import argparse
+import astropy.units as u
+import numpy as np
+from astropy.table import QTable, vstack
+from vsopy import phot
+from vsopy import reduce
+from vsopy import util
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Choose aperture radius maximizing median SNR on a sample of session images'
+    )
+    parser.add_argument('-O', '--object', type=str, required=True, help='Object name')
+    parser.add_argument('-t', '--tag', type=str, required=True, help='Tag (date)')
+    parser.add_argument('-w', '--work-dir', type=str, required=True, help='Work directory')
+    parser.add_argument('-n', '--sample', type=int, default=10,
+                        help='Number of images evenly spread over the session (default: 10)')
+    parser.add_argument('-r', '--radii', type=float, nargs='+', default=None,
+                        help='Aperture radii in arcsec to evaluate, '
+                             'default is 1 to the inner annulus radius with 0.5 step')
+    parser.add_argument('--sky', type=str, choices=phot.SKY_ESTIMATORS, default=None,
+                        help='Sigma-clipped sky estimator instead of plain annulus mean')
+    parser.add_argument('--dry-run', action='store_true', default=False,
+                        help='Print the result without updating settings')
+
+    return parser.parse_args()
+
+def sample_images(images, blacklist, size):
+    images = images[[not blacklist.contains(path) for path in images['path']]]
+    if len(images) == 0:
+        return images
+    return images[np.unique(np.linspace(0, len(images) - 1, min(size, len(images))).astype(int))]
+
+def main():
+    args = parse_args()
+
+    session = util.Session(tag=args.tag, name=args.object)
+    work_layout = util.WorkLayout(args.work_dir)
+    session_layout = work_layout.get_session(session)
+    settings = util.Settings(session_layout.settings_file_path)
+
+    base = settings.aperture
+    r_in = base.r_in.to_value(u.arcsec)
+    radii = np.arange(1., r_in, 0.5) if args.radii is None else np.asarray(args.radii)
+    radii = radii[radii < r_in]
+    if len(radii) == 0:
+        print(f'No radii smaller than the inner annulus radius {base.r_in}')
+        return 1
+    apertures = base.grid(radii * u.arcsec)
+
+    phot.set_threads(os.cpu_count() or 1)
+    solver = lambda path: reduce.astap_solver(path, session_layout.solved_dir)
+    matcher = reduce.CalibrationMatcher(work_layout.calibr_dir)
+    centroids = phot.CentroidCatalog.from_table(QTable.read(session_layout.centroid_file_path))
+    buffer = reduce.FrameBuffer()
+    blacklist = util.Blacklist(session_layout.blacklist_file_path)
+
+    tables = []
+    for image in sample_images(QTable.read(session_layout.images_file_path), blacklist, args.sample):
+        print(f'measure {image["path"]}')
+        result, metrics = phot.process_image(
+            image['path'], matcher, solver,
+            lambda frame: phot.filter_centroids(frame, centroids, base.r_out),
+            apertures, buffer, args.sky)
+        if result is None:
+            print(f"Failed: {metrics['error']}: {metrics['message']}")
+            continue
+        result['image_id'] = image['image_id']
+        tables.append(result)
+    if not tables:
+        print('No images measured')
+        return 1
+
+    photometry = vstack(tables)
+    choices = phot.optimize_aperture(photometry)
+    if not choices:
+        print('No star measured at every radius')
+        return 1
+    best = choices[0]
+    print(f'Session: r_ap = {best.radius:.1f}, median SNR {best.snr:.1f} dB, {best.count} measurements')
+
+    if not args.dry_run:
+        settings.set_aperture(base.grid([best.radius])[0])
+        settings.save()
+
+    return 0
+
+# Example: python3 optimize_aperture.py -O RR_Lyr -t 20230704 -w /home/user/work
+
+if __name__ == '__main__':
+    sys.exit(main())
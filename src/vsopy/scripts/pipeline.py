@@ -0,0 +1,373 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+import astropy.units as u
+import concurrent.futures as cf
+import numpy as np
+import time
+from astropy.table import QTable, Column, join, vstack
+from vsopy import data, phot, reduce, util
+from vsopy.scripts import measure_images
+
+STAGES = ['images', 'batches', 'charts', 'solve', 'measure', 'transform', 'report']
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Bring session products up to date, rerunning only stale stages'
+    )
+    parser.add_argument('-O', '--object', type=str, required=True, help='Object name')
+    parser.add_argument('-t', '--tag', type=str, required=True, help='Tag (date)')
+    parser.add_argument('-w', '--work-dir', type=str, required=True, help='Work directory')
+    parser.add_argument('-i', '--image-dir', type=str, required=True, help='Image directory')
+    parser.add_argument('-F', '--fov', type=float, default=60.0,
+                        help='Field of view in arcmin (default: 60.0)')
+    parser.add_argument('-p', '--parallel', type=int, default=1, help='Number of parallel workers')
+    parser.add_argument('--executor', type=str, choices=['process', 'queue'], default='process',
+                        help="Run workers as local processes or as 'queue' workers started "
+                             "by vso-worker on any node (default: process)")
+    parser.add_argument('--queue', type=str, default=None,
+                        help='Queue database for --executor queue, on storage shared by the nodes')
+    parser.add_argument('--observer', type=str, default=None,
+                        help='AAVSO observer code, the report stage is skipped if not set')
+    parser.add_argument('--force', type=str, nargs='+', choices=STAGES, default=[],
+                        help='Stages to rerun even if up to date')
+    parser.add_argument('--dry-run', action='store_true', default=False,
+                        help='List stale stages without running them')
+    parser.add_argument('--watch', action='store_true', default=False,
+                        help='Measure frames as they land in the image directory '
+                             'and transform every batch as soon as it is complete')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='Watch polling interval in seconds (default: 2.0)')
+    parser.add_argument('--idle', type=float, default=None,
+                        help='Stop watching after this many minutes without new frames, '
+                             'default is to watch until interrupted')
+    parser.add_argument('stages', type=str, nargs='*', metavar='STAGE',
+                        help=f"Stages to bring up to date with their dependencies: {', '.join(STAGES)}; "
+                             "default is all")
+
+    return parser.parse_args()
+
+def solve_images(session_layout, parallel, queue=None):
+    """Plate-solve session images not solved yet; failures are left to measurement.
+
+    Solver subprocesses are awaited by an event loop, `parallel` at a time,
+    so no worker waits for them; with a queue the images are solved by
+    queue workers.
+    """
+    images = QTable.read(session_layout.images_file_path)
+    blacklist = util.Blacklist(session_layout.blacklist_file_path)
+    paths = [path for path in images['path'] if not blacklist.contains(path)]
+    if queue is None:
+        errors = asyncio.run(util.gather_bounded(
+            (reduce.astap_solver_async(path, session_layout.solved_dir) for path in paths),
+            parallel, return_exceptions=True))
+    else:
+        with util.make_executor('queue', queue=queue) as executor:
+            futures = [executor.submit(reduce.astap_solver, path, session_layout.solved_dir)
+                       for path in paths]
+            errors = [future.exception() for future in futures]
+    for path, error in zip(paths, errors):
+        if isinstance(error, Exception):
+            print(f'{path}: {error}')
+
+def transform_batches(session_layout, settings, batch_ids=None):
+    """Transform batch photometry of the target to standard magnitudes.
+
+    Every band is transformed with the first band pair containing it;
+    the check star, if configured, is transformed the same way.
+    """
+    provider = phot.BatchDataProvider(session_layout, batch_ids)
+    done = set()
+    tables = []
+    for pair in util.band_pairs(settings.bands):
+        comp, check = settings.get_comp(pair), settings.get_check(pair)
+        target = phot.batch_diff_photometry(provider, pair, comp)
+        checked = phot.batch_diff_photometry(provider, pair, comp, check) if check else None
+        for band in pair:
+            if band in done:
+                continue
+            done.add(band)
+            sequence = provider.sequence_band(band)
+            comp_M = sequence[sequence['auid'] == comp][band][0]
+            table = QTable(dict(
+                batch_id=target['batch_id'],
+                band=Column(np.full(len(target), band)),
+                M=target[band],
+                comp=Column(np.full(len(target), comp)),
+                comp_M=Column(np.full(len(target), comp_M.value, dtype=util.MagErrDtype), unit=u.mag),
+            ))
+            if checked is not None:
+                checked_band = checked['batch_id', band]
+                checked_band.rename_column(band, 'check_M')
+                table = join(table, checked_band, 'batch_id', join_type='left')
+                table['check'] = Column(np.full(len(table), check))
+            else:
+                table['check'] = Column(np.full(len(table), 'na'))
+                table['check_M'] = Column(np.full(len(table), (np.nan, np.nan),
+                                                  dtype=util.MagErrDtype), unit=u.mag)
+            tables.append(table)
+    result = vstack(tables)
+    result.meta.update(QTable.read(session_layout.sequence_file_path).meta)
+    return result
+
+def write_report(session_layout, settings, name, observer):
+    """Write AAVSO extended format report of transformed magnitudes."""
+    transformed = QTable.read(session_layout.transformed_file_path)
+    batches = QTable.read(session_layout.batches_file_path)
+    with open(session_layout.report_file_path, mode='w') as f:
+        report = data.AavsoReport(f, transformed.meta.get('star', name),
+                                  transformed.meta.get('chart_id', 'na'), observer)
+        report.header()
+        for band in settings.bands:
+            rows = join(transformed[transformed['band'] == band], batches, 'batch_id')
+            report.body(QTable({
+                'time': rows['time'].jd,
+                band: rows['M'],
+                'comp': rows['comp'],
+                f'comp {band}': rows['comp_M'].value,
+                'check': rows['check'],
+                f'check {band}': rows['check_M'],
+                'airmass': rows['airmass'],
+                'batch': rows['batch_id'],
+            }), band)
+
+def watch_session(args, pipeline):
+    """Measure frames as they land and transform batches as they complete.
+
+    Images and batches tables are extended with every landed frame, frames
+    are solved and measured by the workers of `measure_images`, and the
+    transformed magnitudes of a batch are appended to the transformed table
+    once all its frames are measured.  An interrupted watch resumes from the
+    images table and the measurement journal.
+    """
+    session = util.Session(tag=args.tag, name=args.object)
+    work_layout = util.WorkLayout(args.work_dir)
+    session_layout = work_layout.get_session(session)
+    settings = util.Settings(session_layout.settings_file_path)
+    lights_dir = util.ImageLayout(args.image_dir).get_images(session).lights_dir
+
+    # the chart is needed before the first frame lands
+    pipeline.run(['charts'])
+
+    resume = session_layout.images_file_path.exists()
+    images = QTable.read(session_layout.images_file_path) if resume else None
+    watcher = util.FrameWatcher(lights_dir, known=[] if images is None else images['path'])
+    batcher = util.SessionBatcher()
+    transformed_path = session_layout.transformed_file_path
+    transformed_ids = set(QTable.read(transformed_path)['batch_id']) \
+        if resume and transformed_path.exists() else set()
+    blacklist = util.Blacklist(session_layout.blacklist_file_path)
+
+    def write_batches():
+        batcher.batches.write(session_layout.batches_file_path, format='ascii.ecsv', overwrite=True)
+        batcher.batch_images.write(session_layout.batch_images_file_path,
+                                   format='ascii.ecsv', overwrite=True)
+
+    measure_args = measure_images.parse_args(['-O', args.object, '-t', args.tag, '-w', args.work_dir,
+                                              '-p', str(args.parallel)] + executor_args(args))
+    pending = {}
+    tracker = util.BatchTracker()
+    journal = util.RunJournal(session_layout.measured_journal_file_path, resume=resume)
+    with util.make_executor(args.executor, max_workers=args.parallel,
+                            initializer=measure_images.make_context, initargs=(measure_args,),
+                            queue=args.queue) as executor, \
+         util.EcsvWriter(session_layout.measured_file_path, overwrite=True,
+                         offset=journal.offset) as measured, \
+         util.EcsvWriter(transformed_path, overwrite=True,
+                         offset=transformed_path.stat().st_size if transformed_ids else None) as transformed, \
+         journal:
+
+        def submit(rows):
+            for row in rows:
+                if row['image_id'] not in journal and not blacklist.contains(row['path']):
+                    future = executor.submit(measure_images.measure_image, row['image_id'], row['path'])
+                    pending[future] = (row['image_id'], row['path'])
+
+        def register(batch_ids):
+            # frames journaled or blacklisted before are not submitted, so not waited for
+            tracker.register([batch_id for batch_id in batch_ids if batch_id not in transformed_ids],
+                             batcher.batch_images, {id for id, _ in pending.values()})
+
+        def transform_ready():
+            ready = tracker.ready()
+            if not ready:
+                return
+            try:
+                result = transform_batches(session_layout, settings, ready)
+            except Exception as e:
+                print(f'Failed to transform batches {ready}: {e}')
+                return
+            transformed.append(result)
+            transformed_ids.update(ready)
+            for row in result:
+                print(f"batch {row['batch_id']} {row['band']}: "
+                      f"{row['M']['mag'].value:.3f} +/- {row['M']['err'].value:.3f}")
+
+        if images is not None:
+            images.sort('time')
+            submit(images)
+            register(batcher.add(images))
+            write_batches()
+            transform_ready()
+
+        last_frame = time.monotonic()
+        try:
+            while True:
+                landed = watcher.poll()
+                if landed:
+                    last_frame = time.monotonic()
+                    new = util.frame_image_list(landed)
+                    new.sort('time')
+                    first_id = 1 if images is None else int(np.max(images['image_id'])) + 1
+                    new['image_id'] = np.arange(first_id, first_id + len(new))
+                    images = new if images is None else vstack([images, new], metadata_conflicts='silent')
+                    images.meta = {'start': np.min(images['time']), 'finish': np.max(images['time'])}
+                    images.write(session_layout.images_file_path, format='ascii.ecsv', overwrite=True)
+                    print(f'{len(new)} frames landed')
+                    submit(new)
+                    register(batcher.add(new))
+                    write_batches()
+
+                if pending:
+                    done, _ = cf.wait(pending, timeout=args.interval, return_when=cf.FIRST_COMPLETED)
+                else:
+                    if args.idle is not None and time.monotonic() - last_frame > 60 * args.idle:
+                        break
+                    time.sleep(args.interval)
+                    done = []
+                for future in done:
+                    id, path = pending.pop(future)
+                    try:
+                        result, metrics = future.result()
+                    except Exception as e:
+                        result, metrics = None, dict(error=type(e).__name__, message=str(e))
+                    if result is None:
+                        reason = f"{metrics['error']}: {metrics['message']}"
+                        blacklist.add(path, reason)
+                        journal.record(id, path=path, reason=reason, offset=measured.size)
+                    else:
+                        measured.append(phot.photometry_table(result))
+                        journal.record(id, path=path, metrics=metrics, offset=measured.size)
+                    tracker.discard(id)
+                transform_ready()
+        except KeyboardInterrupt:
+            print('Watch interrupted, pending frames are measured on resume')
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    metrics = [entry['metrics'] for entry in journal.entries if 'metrics' in entry]
+    util.metrics_table(metrics).write(session_layout.metrics_file_path,
+                                      format='ascii.ecsv', overwrite=True)
+    blacklist.save(session_layout.blacklist_file_path)
+    print(f'{len(transformed_ids)} batches transformed to {transformed_path}')
+
+def executor_args(args):
+    """Executor arguments passed on to `measure_images`."""
+    return ['--executor', args.executor] + (['--queue', args.queue] if args.queue else [])
+
+def make_pipeline(args):
+    session = util.Session(tag=args.tag, name=args.object)
+    work_layout = util.WorkLayout(args.work_dir)
+    session_layout = work_layout.get_session(session)
+    img_layout = util.ImageLayout(args.image_dir)
+    settings = util.Settings(session_layout.settings_file_path)
+    lights_dir = img_layout.get_images(session).lights_dir
+
+    def list_images():
+        images = util.session_image_list(img_layout.get_images(session))
+        images.meta.update({'object': args.object})
+        images.write(session_layout.images_file_path, format='ascii.ecsv', overwrite=True)
+
+    def batch_images():
+        batches, batch_images = util.batch_session_images(session_layout.images_file_path)
+        batches.meta.update({'object': args.object})
+        batches.write(session_layout.batches_file_path, format='ascii.ecsv', overwrite=True)
+        batch_images.write(session_layout.batch_images_file_path, format='ascii.ecsv', overwrite=True)
+
+    def collect_stars():
+        star_data = data.StarData(work_layout.charts_dir)
+        # chart and target are downloaded concurrently
+        asyncio.run(star_data.prefetch([args.object], args.fov * u.arcmin))
+        centroids, sequence = star_data.collect_stars(args.object, args.fov * u.arcmin)
+        centroids.write(session_layout.centroid_file_path, format='ascii.ecsv', overwrite=True)
+        sequence.write(session_layout.sequence_file_path, format='ascii.ecsv', overwrite=True)
+
+    def measure():
+        # solutions come from the solve stage: measuring must not change its input solved_dir
+        rc = measure_images.main(['-O', args.object, '-t', args.tag, '-w', args.work_dir,
+                                  '-p', str(args.parallel), '--overwrite', '--solved-only']
+                                 + executor_args(args))
+        if rc != 0:
+            raise RuntimeError(f'Measurement failed with code {rc}')
+
+    pipeline = util.Pipeline(session_layout.pipeline_file_path)
+    pipeline.add(util.Stage(
+        'images', list_images,
+        inputs=[lights_dir], outputs=[session_layout.images_file_path]))
+    pipeline.add(util.Stage(
+        'batches', batch_images,
+        inputs=[session_layout.images_file_path],
+        outputs=[session_layout.batches_file_path, session_layout.batch_images_file_path]))
+    pipeline.add(util.Stage(
+        'charts', collect_stars,
+        outputs=[session_layout.centroid_file_path, session_layout.sequence_file_path],
+        params=dict(object=args.object, fov=args.fov)))
+    pipeline.add(util.Stage(
+        'solve', lambda: solve_images(session_layout, args.parallel,
+                                      args.queue if args.executor == 'queue' else None),
+        inputs=[session_layout.images_file_path], outputs=[session_layout.solved_dir]))
+    pipeline.add(util.Stage(
+        'measure', measure,
+        inputs=[session_layout.images_file_path, session_layout.centroid_file_path,
+                session_layout.solved_dir, work_layout.calibr_dir],
+        outputs=[session_layout.measured_file_path, session_layout.metrics_file_path],
+        params=dict(aperture=settings.data.get('aperture'), quality=settings.quality)))
+    pipeline.add(util.Stage(
+        'transform', lambda: transform_batches(session_layout, settings).write(
+            session_layout.transformed_file_path, format='ascii.ecsv', overwrite=True),
+        inputs=[session_layout.measured_file_path, session_layout.images_file_path,
+                session_layout.batches_file_path, session_layout.batch_images_file_path,
+                session_layout.sequence_file_path],
+        outputs=[session_layout.transformed_file_path],
+        params=dict(bands=settings.bands, photometry=settings.data.get('diff_photometry'))))
+    if args.observer:
+        pipeline.add(util.Stage(
+            'report', lambda: write_report(session_layout, settings, args.object, args.observer),
+            inputs=[session_layout.transformed_file_path, session_layout.batches_file_path],
+            outputs=[session_layout.report_file_path],
+            params=dict(object=args.object, observer=args.observer, bands=settings.bands)))
+    return pipeline
+
+def main():
+    args = parse_args()
+    pipeline = make_pipeline(args)
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        print(f"Unknown stages: {', '.join(sorted(unknown))}")
+        return 1
+    if 'report' in args.stages + args.force and not args.observer:
+        print('The report stage requires --observer')
+        return 1
+    if args.watch:
+        watch_session(args, pipeline)
+        return 0
+
+    targets = args.stages if args.stages else None
+    if args.dry_run:
+        stale = pipeline.run(targets, args.force, dry_run=True)
+        print('Stale stages: ' + (', '.join(stale) if stale else 'none'))
+        return 0
+
+    done = pipeline.run(targets, args.force)
+    print('Completed stages: ' + (', '.join(done) if done else 'none'))
+
+    return 0
+
+# Example: python3 pipeline.py -O RR_Lyr -t 20230704 -w /home/user/work -i /home/user/img --observer XYZ
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(__file__), '..')))
+
+import argparse
+import concurrent.futures as cf
+from vsopy import util
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run tasks queued by scripts started with --executor queue'
+    )
+    parser.add_argument('-q', '--queue', type=str, required=True,
+                        help='Queue database on storage shared with the submitting node')
+    parser.add_argument('-p', '--parallel', type=int, default=1,
+                        help='Number of worker processes on this node')
+    parser.add_argument('--idle', type=float, default=None,
+                        help='Stop after this many minutes without tasks, '
+                             'default is to run until interrupted')
+    parser.add_argument('--lease', type=float, default=60.,
+                        help='Seconds after which a task of a silent worker is given to another one '
+                             '(default: 60)')
+
+    return parser.parse_args(argv)
+
+def work(queue, idle, lease, workers):
+    worker = util.QueueWorker(queue, lease=lease, workers=workers)
+    try:
+        return worker.run(idle=None if idle is None else 60 * idle)
+    finally:
+        worker.close()
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f'{args.parallel} workers pulling tasks from {args.queue}')
+    try:
+        with cf.ProcessPoolExecutor(max_workers=args.parallel) as executor:
+            futures = [executor.submit(work, args.queue, args.idle, args.lease, args.parallel)
+                       for _ in range(args.parallel)]
+            count = sum(future.result() for future in futures)
+    except KeyboardInterrupt:
+        print('Interrupted, unfinished tasks are picked up by other workers once their lease expires')
+        return 1
+    print(f'{count} tasks run')
+    return 0
+
+# Example: python3 queue_worker.py -q /mnt/shared/work/queue.db -p 8
+
+if __name__ == '__main__':
+    sys.exit(main())
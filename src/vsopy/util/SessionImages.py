@@ -2,9 +2,12 @@ import astropy.units as u
 import ccdproc as ccdp
 import numpy as np
 
+from astropy.io import fits
 from astropy.io.typing import PathLike
-from astropy.table import QTable
+from astropy.table import QTable, join
 from astropy.time import Time
+from collections.abc import Iterable, Sequence
+from pathlib import Path
 from vsopy.util import TargetLayout
 
 
@@ -33,7 +36,32 @@ def session_image_list(image_layout:TargetLayout) -> QTable:
                     for d in image_layout.lights_dir.iterdir()
                     if d.is_dir()
                     for row in ccdp.ImageFileCollection(d).summary])
-    files['image_id'] = [n+1 for n in range(len(files))]
+    return _image_table(files)
+
+def frame_image_list(paths:Iterable[PathLike], first_id:int=1) -> QTable:
+    """Read headers of individual light frames into a table of images.
+
+    This is the incremental counterpart of :py:func:`session_image_list`
+    for frames arriving one by one.
+
+    :param paths: frame file paths
+    :type paths: iterable of path-like
+    :param first_id: image_id of the first frame, defaults to 1
+    :type first_id: int, optional
+    :return: table with the columns of :py:func:`session_image_list`, in the order of `paths`
+    :rtype: :py:class:`~astropy.table.QTable`
+    """
+    rows = []
+    for path in paths:
+        header = fits.getheader(path)
+        rows.append({'file': Path(path).name, 'dir': Path(path).parent,
+                     'exptime': header['EXPTIME'], 'ccd-temp': header['CCD-TEMP'],
+                     'filter': header['FILTER'], 'airmass': header['AIRMASS'],
+                     'date-obs': header['DATE-OBS']})
+    return _image_table(QTable(rows), first_id)
+
+def _image_table(files:QTable, first_id:int=1) -> QTable:
+    files['image_id'] = [first_id + n for n in range(len(files))]
     # format='isot' fixes known segfault in numpy
     # see https://github.com/astropy/astropy/issues/18254
     # and https://github.com/numpy/numpy/issues/29190
@@ -83,43 +111,145 @@ def batch_session_images(image_list_path:PathLike) -> tuple[QTable, QTable]:
     images = QTable.read(image_list_path)
     images.sort('time')
     bands = set(images['filter'])
-    batch_size = len(bands)
-    order = list(images[0:batch_size]['filter'])
-
-    images.add_column(0, name='batch_id')
-    images.add_column(0*u.second, name='time_range')
-    images.add_column(0*images['temperature'].unit, name='temperature_range')
-    images.add_column(0., name='airmass_range')
-    batches = images['batch_id', 'time', 'temperature', 'airmass',
-                     'time_range', 'temperature_range', 'airmass_range'][:0].copy()
-    batch_images = images['batch_id', 'image_id'][:0].copy()
-
-    next = 0
-    id = 0
-    while next < len(images) - batch_size + 1:
-        batch = images[next:next+batch_size]
-        if np.all(batch['filter'] == order):
-            id += 1
-            batches.add_row({
-                'batch_id': id,
-                'time': np.mean(batch['time']),
-                'time_range': np.max(batch['time']) - np.min(batch['time']),
-                'temperature': np.mean(batch['temperature']),
-                'temperature_range': np.max(batch['temperature']) - np.min(batch['temperature']),
-                'airmass': np.mean(batch['airmass']),
-                'airmass_range': np.max(batch['airmass']) - np.min(batch['airmass'])
-            })
-            for image in batch:
-               batch_images.add_row(dict(
-                   batch_id=id,
-                   image_id=image['image_id']
-               ))
-            next += batch_size
-        else:
-            print(f"Skipped file #{next} '{images['path'][next]}'")
-            next += 1
+    order = list(images[0:len(bands)]['filter'])
+
+    batcher = SessionBatcher(order)
+    batcher.add(images)
+    batches, batch_images = batcher.batches, batcher.batch_images
 
     batches.meta = {'start': np.min(images['time']), 'finish': np.max(images['time']),
                     'bands': [str(x) for x in order]}
 
     return batches, batch_images
+
+
+def stack_groups(images:QTable, batch_images:QTable, size:int) -> list[tuple[int, list[str]]]:
+    """Group lights of `size` consecutive batches by filter for co-adding.
+
+    A co-add is a single measurement filed under the id of the first image
+    of its group, the earliest in that filter.  Joined with `batch_images`,
+    its photometry is therefore attributed to the first batch of the group
+    only; the other batches of the group get no photometry in that filter,
+    so the co-added series has one point per group of batches.
+
+    :param images: image list, see :py:func:`session_image_list`
+    :type images: :py:class:`~astropy.table.QTable`
+    :param batch_images: images of every batch, see :py:func:`batch_session_images`
+    :type batch_images: :py:class:`~astropy.table.QTable`
+    :param size: number of consecutive batches per group
+    :type size: int
+    :return: (image_id, paths) of every group and filter, the frames in time order
+    :rtype: list[tuple[int, list[str]]]
+    """
+    rows = join(batch_images, images['image_id', 'filter', 'time', 'path'], 'image_id')
+    batch_ids = sorted(set(rows['batch_id']))
+    group = {batch_id: n // size for n, batch_id in enumerate(batch_ids)}
+    rows['group'] = [group[batch_id] for batch_id in rows['batch_id']]
+    rows.sort(['group', 'filter', 'time'])
+    return [(g['image_id'][0], [str(p) for p in g['path']])
+            for g in rows.group_by(['group', 'filter']).groups]
+
+
+class SessionBatcher:
+    """Incremental grouping of images into batches.
+
+    Images are added in the order of observation as they arrive, and a
+    batch is formed as soon as its last image is added.  Grouping follows
+    :py:func:`batch_session_images`: a window of images with filters in
+    the batch order forms a batch, otherwise the first image of the window
+    is skipped.  If the order is not given, it is learned from the first
+    images, up to the first repeated filter.
+    """
+    def __init__(self, order:Sequence[str] | None=None, last_id:int=0) -> None:
+        """Create a batcher with no images.
+
+        :param order: filters of a batch in the order of observation,
+                      defaults to None for learning it from the images
+        :type order: sequence of str, optional
+        :param last_id: batch_id of the last existing batch, defaults to 0
+        :type last_id: int, optional
+        """
+        self.order_ = None if order is None else [str(f) for f in order]
+        self.last_id_ = last_id
+        self.pending_:QTable | None = None
+        self.batches_:QTable | None = None
+        self.batch_images_:QTable | None = None
+
+    @property
+    def order(self) -> list[str] | None:
+        """Filters of a batch, None until learned."""
+        return self.order_
+
+    @property
+    def batches(self) -> QTable | None:
+        """Batches formed so far, see :py:func:`batch_session_images`; None before the first image."""
+        return self.batches_
+
+    @property
+    def batch_images(self) -> QTable | None:
+        """Images of the batches formed so far; None before the first image."""
+        return self.batch_images_
+
+    def add(self, images:QTable) -> list[int]:
+        """Add images observed after the ones already added.
+
+        :param images: images with the columns of :py:func:`session_image_list`,
+                       sorted by time
+        :type images: :py:class:`~astropy.table.QTable`
+        :return: ids of the batches completed by the images
+        :rtype: list[int]
+        """
+        if len(images) == 0:
+            return []
+        if self.pending_ is None:
+            self._start(images)
+        first = len(self.batches_)
+        for image in images:
+            self.pending_.add_row(image)
+            if self.order_ is None:
+                filters = [str(f) for f in self.pending_['filter']]
+                if filters[-1] in filters[:-1]:
+                    self.order_ = filters[:-1]
+            self._form_batches()
+        return [int(id) for id in self.batches_['batch_id'][first:]]
+
+    def _start(self, images:QTable) -> None:
+        template = images[:0].copy()
+        template.meta = {}
+        template.add_column(0, name='batch_id')
+        template.add_column(0*u.second, name='time_range')
+        template.add_column(0*template['temperature'].unit, name='temperature_range')
+        template.add_column(0., name='airmass_range')
+        self.pending_ = images[:0].copy()
+        self.batches_ = template['batch_id', 'time', 'temperature', 'airmass',
+                                 'time_range', 'temperature_range', 'airmass_range'].copy()
+        self.batch_images_ = template['batch_id', 'image_id'].copy()
+
+    def _form_batches(self) -> None:
+        if self.order_ is None:
+            return
+        batch_size = len(self.order_)
+        while len(self.pending_) >= batch_size:
+            batch = self.pending_[:batch_size]
+            if np.all(batch['filter'] == self.order_):
+                self.last_id_ += 1
+                self.batches_.add_row({
+                    'batch_id': self.last_id_,
+                    'time': np.mean(batch['time']),
+                    'time_range': np.max(batch['time']) - np.min(batch['time']),
+                    'temperature': np.mean(batch['temperature']),
+                    'temperature_range': np.max(batch['temperature']) - np.min(batch['temperature']),
+                    'airmass': np.mean(batch['airmass']),
+                    'airmass_range': np.max(batch['airmass']) - np.min(batch['airmass'])
+                })
+                for image in batch:
+                    self.batch_images_.add_row(dict(
+                        batch_id=self.last_id_,
+                        image_id=image['image_id']
+                    ))
+                self.pending_ = self.pending_[batch_size:]
+            else:
+                name = self.pending_['path'][0] if 'path' in self.pending_.colnames \
+                    else self.pending_['image_id'][0]
+                print(f"Skipped file '{name}'")
+                self.pending_ = self.pending_[1:]
@@ -34,6 +34,17 @@ class Aperture:
                     r_out=float(self.r_out.to(unit).value),
                     unit=str(unit))
 
+    def grid(self, radii):
+        """Apertures with the given radii sharing this aperture's annulus.
+
+        :param radii: aperture radii, in the unit of this aperture unless
+                      given as quantities
+        :return: list of apertures
+        :rtype: list[Aperture]
+        """
+        unit = self.r_.unit
+        return [Aperture(r, self.r_in_, self.r_out_, unit) for r in radii]
+
     def to_pixels(self, scale):
         return Aperture(self.r_, self.r_in_, self.r_out_,
                         u.pixel, u.pixel_scale(scale))
@@ -70,6 +81,70 @@ class PhotometrySettings:
     def set_finish(self, value):
         self.data_["finish"] = value
 
+class QualitySettings:
+    """Frame quality thresholds, see :py:func:`~vsopy.reduce.check_quality`.
+
+    Thresholds which are not set are not checked.
+    """
+    def __init__(self, data):
+        self.data_ = data
+
+    def to_dict(self):
+        return dict(self.data_)
+
+    @property
+    def enabled(self):
+        return any(self.data_.get(key) is not None
+                   for key in ['max_background', 'min_stars', 'max_fwhm', 'max_ellipticity'])
+
+    @property
+    def binning(self):
+        """Subsampling block size, pixels"""
+        return self.data_.get('binning', 4)
+
+    @property
+    def threshold(self):
+        """Source detection threshold, noise sigma"""
+        return self.data_.get('threshold', 5.)
+
+    @property
+    def max_background(self):
+        """Maximal median background, ADU"""
+        return self.data_.get('max_background')
+
+    @property
+    def min_stars(self):
+        """Minimal number of detected sources"""
+        return self.data_.get('min_stars')
+
+    @property
+    def max_fwhm(self):
+        """Maximal median FWHM, pixels"""
+        return self.data_.get('max_fwhm')
+
+    @property
+    def max_ellipticity(self):
+        """Maximal median ellipticity"""
+        return self.data_.get('max_ellipticity')
+
+    def set_binning(self, value):
+        self.data_['binning'] = value
+
+    def set_threshold(self, value):
+        self.data_['threshold'] = value
+
+    def set_max_background(self, value):
+        self.data_['max_background'] = value
+
+    def set_min_stars(self, value):
+        self.data_['min_stars'] = value
+
+    def set_max_fwhm(self, value):
+        self.data_['max_fwhm'] = value
+
+    def set_max_ellipticity(self, value):
+        self.data_['max_ellipticity'] = value
+
 class Settings:
     def __init__(self, path) -> None:
         self.data_ = {}
@@ -95,6 +170,10 @@ class Settings:
         ap = self.data_['aperture']
         return Aperture.from_dict(ap)
 
+    @property
+    def quality(self):
+        return QualitySettings(self.data_.setdefault('quality', {}))
+
     @property
     def bands(self):
         return [] if 'bands' not in self.data_ else self.data_['bands']
@@ -1,8 +1,19 @@
+from .aio import gather_bounded, submit_staged
 from .bands import ordered_bands, band_pairs
 from .blacklist import Blacklist
+from .executor import EXECUTORS, add_executor_arguments, make_executor, submit_bounded, worker_threads
+from .fingerprint import file_fingerprint, fingerprint
 from .format import default_table_format
 from .frame_type import FrameType
+from .journal import RunJournal
 from .layout import *
+from .metrics import StageMetrics, metrics_table
+from .pipeline import Pipeline, Stage
+from .prefetch import Prefetcher, PrefetchStats
+from .progress import Progress, ProgressReporter, add_progress_arguments
 from .SessionImages import *
-from .Settings import Settings, Aperture
+from .Settings import Settings, Aperture, QualitySettings
+from .table_writer import EcsvWriter
 from .types import *
+from .watch import BatchTracker, FrameWatcher
+from .work_queue import QueueExecutor, QueueWorker, node_workers
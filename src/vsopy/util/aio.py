@@ -0,0 +1,96 @@
+import asyncio
+import concurrent.futures as cf
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from typing import Any
+
+
+async def gather_bounded(coroutines:Iterable[Awaitable], limit:int,
+                         return_exceptions:bool=False) -> list[Any]:
+    """Await coroutines with a bounded number running at a time.
+
+    :param coroutines: awaitables, e.g. downloads or subprocess runs
+    :type coroutines: iterable of awaitable
+    :param limit: maximal number of awaitables running at a time
+    :type limit: int
+    :param return_exceptions: whether exceptions are returned as results
+                              instead of raised, defaults to False
+    :type return_exceptions: bool, optional
+    :return: results in the order of the coroutines
+    :rtype: list
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines),
+                                return_exceptions=return_exceptions)
+
+
+async def submit_staged(executor:cf.Executor, fn:Callable, tasks:Iterable[tuple],
+                        max_pending:int, prepare:Callable[[tuple], Awaitable] | None=None,
+                        ahead:int | None=None) -> AsyncIterator[tuple[tuple, cf.Future]]:
+    """Prepare tasks asynchronously, then submit them keeping a bounded number in flight.
+
+    Asynchronous counterpart of :py:func:`~vsopy.util.submit_bounded` for
+    tasks whose input must first be produced by I/O, e.g. plate solving by
+    an external solver or downloading.  Every task is prepared by its own
+    coroutine, so thousands of tasks can wait for I/O in a single thread;
+    only `max_pending` of them occupy the executor.  A failed preparation
+    is ignored: the task is submitted anyway and fails in the worker.
+
+    :param executor: executor running the tasks
+    :type executor: :py:class:`~concurrent.futures.Executor`
+    :param fn: callable applied to every task
+    :type fn: callable
+    :param tasks: argument tuples, ``fn(*task)`` is submitted for every one
+    :type tasks: iterable of tuple
+    :param max_pending: maximal number of submitted but not completed tasks
+    :type max_pending: int
+    :param prepare: coroutine function run on a task before it is
+                    submitted, defaults to None; it bounds its own
+                    concurrency, e.g. by a semaphore
+    :type prepare: callable, optional
+    :param ahead: maximal number of tasks prepared ahead of the executor,
+                  defaults to None for no limit
+    :type ahead: int, optional
+    :return: completed (task, future) pairs in the order of completion
+    :rtype: async iterator of tuple
+    """
+    submitted = asyncio.Semaphore(max(1, max_pending))
+    window = None if ahead is None else asyncio.Semaphore(max(1, max_pending) + max(0, ahead))
+    completed:asyncio.Queue = asyncio.Queue()
+
+    async def run(task):
+        if window is not None:
+            await window.acquire()
+        try:
+            if prepare is not None:
+                try:
+                    await prepare(task)
+                except Exception:
+                    pass
+            async with submitted:
+                try:
+                    future = executor.submit(fn, *task)
+                except Exception as e:
+                    future = cf.Future()
+                    future.set_exception(e)
+                try:
+                    await asyncio.wrap_future(future)
+                except Exception:
+                    # the consumer gets the exception from the future
+                    pass
+        finally:
+            if window is not None:
+                window.release()
+        completed.put_nowait((task, future))
+
+    running = [asyncio.ensure_future(run(task)) for task in tasks]
+    try:
+        for _ in range(len(running)):
+            yield await completed.get()
+    finally:
+        for coroutine in running:
+            coroutine.cancel()
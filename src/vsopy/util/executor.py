@@ -0,0 +1,151 @@
+import argparse
+import concurrent.futures as cf
+import os
+import time
+from collections.abc import Callable, Iterable, Iterator
+from typing import TYPE_CHECKING, Any
+
+from .work_queue import QueueExecutor, node_workers
+
+if TYPE_CHECKING:
+    from .prefetch import Prefetcher
+
+EXECUTORS = ('process', 'thread', 'queue')
+"""Kinds of executors made by :py:func:`make_executor`."""
+
+
+def make_executor(kind:str='process', max_workers:int | None=None,
+                  initializer:Callable | None=None, initargs:tuple=(),
+                  queue:Any=None) -> cf.Executor:
+    """Make an executor of the given kind.
+
+    Local ``process`` and ``thread`` pools run tasks on this machine; a
+    ``queue`` executor queues them for :py:class:`~vsopy.util.QueueWorker`
+    processes on any node sharing the queue file.
+
+    :param kind: one of :py:data:`EXECUTORS`, defaults to 'process'
+    :type kind: str, optional
+    :param max_workers: number of local workers, defaults to None for the
+                        pool default; ignored by the queue executor
+    :type max_workers: int, optional
+    :param initializer: callable run by every worker before its first task
+    :type initializer: callable, optional
+    :param initargs: arguments of the initializer
+    :type initargs: tuple, optional
+    :param queue: queue database path, required by the queue executor
+    :type queue: path-like, optional
+    :raises ValueError: if the kind is unknown or the queue is missing
+    :rtype: :py:class:`~concurrent.futures.Executor`
+    """
+    if kind == 'process':
+        return cf.ProcessPoolExecutor(max_workers=max_workers,
+                                      initializer=initializer, initargs=initargs)
+    if kind == 'thread':
+        return cf.ThreadPoolExecutor(max_workers=max_workers,
+                                     initializer=initializer, initargs=initargs)
+    if kind == 'queue':
+        if queue is None:
+            raise ValueError('Queue executor needs a queue path')
+        return QueueExecutor(queue, initializer=initializer, initargs=initargs)
+    raise ValueError(f"Unknown executor '{kind}', expected one of {', '.join(EXECUTORS)}")
+
+
+def add_executor_arguments(parser:argparse.ArgumentParser, threads:bool=True) -> None:
+    """Add the executor options shared by the scripts running workers.
+
+    Adds ``--executor`` and ``--queue``, read by :py:func:`make_executor`,
+    and optionally ``--threads``, read by :py:func:`worker_threads`.
+
+    :param parser: parser of the script arguments
+    :type parser: :py:class:`~argparse.ArgumentParser`
+    :param threads: whether workers take a number of threads, defaults to True
+    :type threads: bool, optional
+    """
+    parser.add_argument('--executor', type=str, choices=['process', 'queue'], default='process',
+                        help="Run workers as local processes or as 'queue' workers started "
+                             "by vso-worker on any node (default: process)")
+    parser.add_argument('--queue', type=str, default=None,
+                        help='Queue database for --executor queue, on storage shared by the nodes')
+    if threads:
+        parser.add_argument('--threads', type=int, default=None,
+                            help='Threads per worker, default is number of CPUs divided by number '
+                                 'of workers on the node running them')
+
+
+def worker_threads(threads:int | None, parallel:int, executor:str='process') -> int:
+    """Number of threads of a worker, called in the worker.
+
+    :param threads: requested number of threads, None for the default
+    :type threads: int, optional
+    :param parallel: number of local workers
+    :type parallel: int
+    :param executor: kind of the executor running the worker, defaults to
+                     'process'; queue workers share the CPUs of their own node
+                     with the other workers there, see :py:func:`~vsopy.util.node_workers`
+    :type executor: str, optional
+    :return: requested number of threads, or CPUs of this node per worker
+    :rtype: int
+    """
+    if threads:
+        return threads
+    workers = node_workers() if executor == 'queue' else parallel
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def submit_bounded(executor:cf.Executor, fn:Callable, tasks:Iterable[tuple],
+                   max_pending:int, prefetcher:'Prefetcher | None'=None) -> Iterator[tuple[tuple, cf.Future]]:
+    """Submit tasks keeping a bounded number in flight; yield them as they complete.
+
+    A new task is submitted only when a running one completes, so results
+    are consumed at the pace they are produced and neither pending futures
+    nor their results accumulate.  With a prefetcher, a task is submitted
+    once its files are read; completed tasks are yielded meanwhile.
+
+    :param executor: executor running the tasks
+    :type executor: :py:class:`~concurrent.futures.Executor`
+    :param fn: callable applied to every task
+    :type fn: callable
+    :param tasks: argument tuples, ``fn(*task)`` is submitted for every one;
+                  consumed lazily
+    :type tasks: iterable of tuple
+    :param max_pending: maximal number of submitted but not yet yielded tasks
+    :type max_pending: int
+    :param prefetcher: prefetcher reading files of the tasks ahead, defaults to None
+    :type prefetcher: :py:class:`~vsopy.util.Prefetcher`, optional
+    :return: completed (task, future) pairs in the order of completion
+    :rtype: iterator of tuple
+    """
+    reads = (((task, None) for task in tasks) if prefetcher is None
+             else prefetcher.reads(tasks))
+    max_pending = max(1, max_pending)
+    pending:dict[cf.Future, Any] = {}
+    # next task and its read, not submitted yet
+    head:tuple | None = None
+
+    def fill():
+        nonlocal head
+        while len(pending) < max_pending:
+            if head is None:
+                head = next(reads, None)
+                if head is None:
+                    return
+            task, read = head
+            if read is not None and not read.done():
+                return
+            head = None
+            pending[executor.submit(fn, *task)] = task
+
+    fill()
+    while pending or head is not None:
+        waiting = set(pending)
+        reading = head is not None and len(pending) < max_pending
+        if reading:
+            waiting.add(head[1])
+        start = time.perf_counter()
+        done, _ = cf.wait(waiting, return_when=cf.FIRST_COMPLETED)
+        if reading:
+            prefetcher.add_wait(time.perf_counter() - start)
+        for future in done:
+            if future in pending:
+                yield pending.pop(future), future
+        fill()
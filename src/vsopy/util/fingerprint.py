@@ -0,0 +1,71 @@
+import hashlib
+import numpy as np
+import os
+from astropy.io import fits
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+
+def file_fingerprint(path:os.PathLike | str) -> str:
+    """Fingerprint of a file by its name, size and modification time.
+
+    The content is not read, so the fingerprint is cheap even for large frames;
+    a file rewritten in place keeps its fingerprint only if both size and
+    modification time (in nanoseconds) are preserved.
+
+    :param path: file path
+    :type path: path-like
+    :return: hex digest
+    :rtype: str
+    """
+    stat = os.stat(path)
+    return fingerprint(Path(path).name, stat.st_size, stat.st_mtime_ns)
+
+
+def fingerprint(*parts:Any) -> str:
+    """Stable digest of a sequence of values.
+
+    Supported values are None, strings, numbers, NumPy arrays,
+    FITS headers, sequences and mappings of those, and objects
+    providing ``fingerprint()`` or ``to_dict()`` methods.  Digests
+    do not depend on the Python process, so they can be persisted.
+
+    :return: hex digest
+    :rtype: str
+    :raises TypeError: if a value is not supported
+    """
+    digest = hashlib.sha256()
+    _update(digest, parts)
+    return digest.hexdigest()
+
+
+def _update(digest, value:Any) -> None:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        digest.update(f'{type(value).__name__}:{value!r};'.encode())
+    elif isinstance(value, Path):
+        _update(digest, str(value))
+    elif isinstance(value, np.ndarray):
+        digest.update(f'array:{value.dtype.str}:{value.shape};'.encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.generic):
+        _update(digest, value.item())
+    elif isinstance(value, fits.Header):
+        _update(digest, value.tostring())
+    elif hasattr(value, 'fingerprint'):
+        _update(digest, value.fingerprint())
+    elif hasattr(value, 'to_dict'):
+        _update(digest, value.to_dict())
+    elif isinstance(value, Mapping):
+        digest.update(b'{')
+        for key in sorted(value, key=str):
+            _update(digest, str(key))
+            _update(digest, value[key])
+        digest.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _update(digest, item)
+        digest.update(b']')
+    else:
+        raise TypeError(f"Cannot fingerprint value of type '{type(value).__name__}'")
@@ -25,7 +25,8 @@ def default_table_format(table):
     set_column_format(table, 'snr', '.1f')
     set_column_format(table, 'peak', '.1%')
     set_column_format(table, 'radec2000', default_coord_format)
-    set_column_format(table, 'sky_centroid', default_coord_format)
+    set_column_format(table, 'sky_ra', '.5f')
+    set_column_format(table, 'sky_dec', '.5f')
     for name in table.colnames:
         column = table.columns[name]
         if hasattr(column, 'dtype'):
@@ -0,0 +1,101 @@
+import json
+import numpy as np
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+
+class RunJournal:
+    """Append-only record of completed tasks of a processing run.
+
+    Every completed task is written as one JSON line and synced to disk
+    before the next task is recorded.  A line cut short by a crash is
+    dropped when the journal is reopened, so the journal always lists
+    tasks which were fully completed.  Output written before a task is
+    recorded (e.g. by :py:class:`~vsopy.util.EcsvWriter`) can be rolled
+    back to the last recorded `offset`.
+    """
+    def __init__(self, path:os.PathLike | str, resume:bool=False) -> None:
+        """Open the journal.
+
+        :param path: journal file path
+        :type path: path-like
+        :param resume: whether to keep the recorded tasks, defaults to False
+                       for starting a new run with an empty journal; the file
+                       is not modified until the first task is recorded
+        :type resume: bool, optional
+        """
+        self.path_ = Path(path)
+        self.entries_:dict[Any, dict[str, Any]] = {}
+        size = 0
+        if resume and self.path_.exists():
+            with open(self.path_, 'rb') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith(b'\n'):
+                        break
+                    self.entries_[entry['id']] = entry
+                    size += len(line)
+        self.size_ = size
+        self.file_ = None
+
+    def __enter__(self) -> 'RunJournal':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __contains__(self, id:Any) -> bool:
+        return _plain(id) in self.entries_
+
+    def __len__(self) -> int:
+        return len(self.entries_)
+
+    @property
+    def entries(self) -> Iterable[dict[str, Any]]:
+        """Recorded entries in the order of completion."""
+        return self.entries_.values()
+
+    @property
+    def offset(self) -> int:
+        """Output offset of the last entry which recorded one, 0 if none did."""
+        return max((entry['offset'] for entry in self.entries_.values() if 'offset' in entry),
+                   default=0)
+
+    def record(self, id:Any, **fields:Any) -> None:
+        """Record a completed task.
+
+        :param id: task identifier, e.g. image_id; must be JSON serializable
+        :param fields: additional JSON serializable fields, NumPy scalars are
+                       converted; `offset` is reserved for the output size
+                       after the task results were written
+        """
+        entry = dict(id=_plain(id), **fields)
+        line = json.dumps(entry, default=_plain) + '\n'
+        if self.file_ is None:
+            self.file_ = open(self.path_, 'r+b' if self.size_ else 'wb')
+            self.file_.truncate(self.size_)
+            self.file_.seek(self.size_)
+        self.file_.write(line.encode('utf-8'))
+        self.file_.flush()
+        os.fsync(self.file_.fileno())
+        self.entries_[entry['id']] = json.loads(line)
+
+    def close(self) -> None:
+        if self.file_ is not None:
+            self.file_.close()
+            self.file_ = None
+
+
+def _plain(value:Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, (str, int, float, bool, type(None), list, dict, tuple)):
+        return value
+    raise TypeError(f"Object of type '{type(value).__name__}' is not JSON serializable")
@@ -118,6 +118,11 @@ class SessionLayout(LayoutBase):
     def solved_dir(self):
         return self.root_dir / 'solved'
 
+    @property
+    @LayoutBase._enforce
+    def photometry_cache_dir(self):
+        return self.root_dir / 'cache' / 'photometry'
+
     @property
     def blacklist_file_path(self):
         return self.root_dir / 'blacklist.json'
@@ -155,6 +160,34 @@ class SessionLayout(LayoutBase):
     def measured_file_path(self):
         return self.root_dir / 'measured.ecsv'
 
+    @property
+    def measured_journal_file_path(self):
+        return self.root_dir / 'measured.journal'
+
+    @property
+    def blind_partial_file_path(self):
+        return self.root_dir / 'blind_partial.ecsv'
+
+    @property
+    def blind_journal_file_path(self):
+        return self.root_dir / 'blind_partial.journal'
+
+    @property
+    def metrics_file_path(self):
+        return self.root_dir / 'metrics.ecsv'
+
+    @property
+    def transformed_file_path(self):
+        return self.root_dir / 'transformed.ecsv'
+
+    @property
+    def report_file_path(self):
+        return self.root_dir / 'report.txt'
+
+    @property
+    def pipeline_file_path(self):
+        return self.root_dir / 'pipeline.json'
+
     @property
     @deprecated("Use measured_file_path instead")
     def photometry_file_path(self):
@@ -189,3 +222,17 @@ class WorkLayout(LayoutBase):
         return SessionLayout(self.root_dir / Path('session') / session.rel_path,
                              create=self.create_)
 
+    def sessions(self, tag:str=None) -> list[Session]:
+        """ Discover sessions having a directory in the layout.
+
+        :param tag: session tag to restrict the search to, defaults to None for all tags
+        :type tag: str, optional
+        :return: sessions sorted by tag and object name
+        :rtype: list[Session]
+        """
+        root = self.root_ / 'session'
+        tag_dirs = [root / tag] if tag is not None else sorted(root.glob('*'))
+        return [Session(tag=tag_dir.name, name=session_dir.name)
+                for tag_dir in tag_dirs if tag_dir.is_dir()
+                for session_dir in sorted(tag_dir.iterdir()) if session_dir.is_dir()]
+
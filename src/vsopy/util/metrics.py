@@ -0,0 +1,99 @@
+import astropy.units as u
+import numpy as np
+import time
+from astropy.table import QTable
+from collections.abc import Iterable, Mapping
+from contextlib import contextmanager
+from typing import Any
+
+
+class StageMetrics:
+    """ Timing and failure record of a multi-stage processing step.
+
+        For every stage the wall clock and process CPU times are recorded
+        under keys `<stage>_wall` and `<stage>_cpu`, in seconds.
+        Stages which did not run keep NaN values, so that records of
+        failed and successful runs have the same keys.
+    """
+    def __init__(self, stages:Iterable[str]=()) -> None:
+        """Create an empty record.
+
+        :param stages: names of the expected stages, defaults to none
+        :type stages: iterable of str, optional
+        """
+        self.data_:dict[str, Any] = {}
+        for name in stages:
+            self.data_[f'{name}_wall'] = np.nan
+            self.data_[f'{name}_cpu'] = np.nan
+        self.data_['error'] = ''
+        self.data_['message'] = ''
+
+    @contextmanager
+    def stage(self, name:str):
+        """Context manager timing a stage.
+
+        Time is recorded even if the stage raises; repeated stages accumulate.
+
+        :param name: stage name
+        :type name: str
+        """
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            for key, value in [(f'{name}_wall', time.perf_counter() - wall),
+                               (f'{name}_cpu', time.process_time() - cpu)]:
+                previous = self.data_.get(key, np.nan)
+                self.data_[key] = value if np.isnan(previous) else previous + value
+
+    def fail(self, exception:BaseException) -> None:
+        """Record the exception class and message.
+
+        :param exception: exception that stopped processing
+        :type exception: BaseException
+        """
+        self.data_['error'] = type(exception).__name__
+        self.data_['message'] = str(exception)
+
+    @property
+    def failed(self) -> bool:
+        return self.data_['error'] != ''
+
+    def __setitem__(self, key:str, value:Any) -> None:
+        self.data_[key] = value
+
+    def __getitem__(self, key:str) -> Any:
+        return self.data_[key]
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(self.data_)
+
+
+def metrics_table(rows:Iterable[Mapping[str, Any]]) -> QTable:
+    """Build a table of metrics records.
+
+    Keys missing in some records are filled with NaN (or empty strings
+    for text columns); columns ending with `_wall` and `_cpu` get unit of seconds,
+    those ending with `_bytes` get unit of bytes.
+
+    :param rows: records, e.g. produced by :py:meth:`StageMetrics.to_dict`
+    :type rows: iterable of dict-like
+    :return: metrics table
+    :rtype: :py:class:`~astropy.table.QTable`
+    """
+    rows = list(rows)
+    names = list(dict.fromkeys(key for row in rows for key in row))
+    columns = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        if all(isinstance(v, str) or v is None for v in values):
+            columns[name] = ['' if v is None else v for v in values]
+        else:
+            columns[name] = [np.nan if v is None else v for v in values]
+    table = QTable(columns)
+    for name in names:
+        if name.endswith('_wall') or name.endswith('_cpu'):
+            table[name].unit = u.second
+        elif name.endswith('_bytes'):
+            table[name].unit = u.byte
+    return table
@@ -0,0 +1,181 @@
+import json
+import os
+from collections.abc import Callable, Iterable, Sequence
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from .fingerprint import file_fingerprint, fingerprint
+
+
+class Stage(NamedTuple):
+    """Processing stage producing output files from input files."""
+    name: str
+    """Unique stage name."""
+    run: Callable[[], Any]
+    """Callable producing the outputs; raises on failure."""
+    inputs: Sequence[Path] = ()
+    """Files or directories read by the stage."""
+    outputs: Sequence[Path] = ()
+    """Files or directories written by the stage."""
+    params: Any = None
+    """Settings the outputs depend on, anything accepted by :py:func:`~vsopy.util.fingerprint`."""
+
+
+class Pipeline:
+    """Stages ordered by their data dependencies, rerun only when stale.
+
+    A stage depends on the stages producing its inputs.  After a stage
+    completes, the fingerprint of its parameters and inputs is recorded
+    in the state file; the stage is stale if the fingerprint changed since
+    or if any of its outputs is missing.  Outputs of a rerun stage get new
+    fingerprints, so stale stages propagate downstream.
+    """
+    def __init__(self, state_path:os.PathLike | str) -> None:
+        """Create an empty pipeline.
+
+        :param state_path: JSON file with the fingerprints of completed stages
+        :type state_path: path-like
+        """
+        self.state_path_ = Path(state_path)
+        self.stages_:dict[str, Stage] = {}
+        self.state_:dict[str, str] = {}
+        if self.state_path_.exists():
+            with open(self.state_path_) as file:
+                self.state_ = json.load(file)
+
+    def add(self, stage:Stage) -> 'Pipeline':
+        """Add a stage.
+
+        :param stage: stage with a unique name
+        :type stage: Stage
+        :raises ValueError: if the name or an output is already taken
+        :return: self, for chaining
+        :rtype: Pipeline
+        """
+        if stage.name in self.stages_:
+            raise ValueError(f"Duplicate stage '{stage.name}'")
+        produced = {Path(p) for s in self.stages_.values() for p in s.outputs}
+        if produced.intersection(Path(p) for p in stage.outputs):
+            raise ValueError(f"Stage '{stage.name}' output is produced by another stage")
+        self.stages_[stage.name] = stage
+        return self
+
+    def __getitem__(self, name:str) -> Stage:
+        return self.stages_[name]
+
+    def dependencies(self, name:str) -> list[str]:
+        """Names of the stages producing inputs of a stage.
+
+        :param name: stage name
+        :type name: str
+        :rtype: list[str]
+        """
+        producers = {Path(p): s.name for s in self.stages_.values() for p in s.outputs}
+        return sorted({producers[Path(p)] for p in self.stages_[name].inputs
+                       if Path(p) in producers})
+
+    def order(self, targets:Iterable[str] | None=None) -> list[Stage]:
+        """Stages in dependency order.
+
+        :param targets: names of the stages to include along with their
+                        dependencies, defaults to None for all stages
+        :type targets: iterable of str, optional
+        :raises KeyError: if a target is unknown
+        :raises ValueError: if stage dependencies are cyclic
+        :rtype: list[Stage]
+        """
+        ordered:list[str] = []
+        visiting:set[str] = set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Cyclic dependency of stage '{name}'")
+            visiting.add(name)
+            for dependency in self.dependencies(name):
+                visit(dependency)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in (self.stages_ if targets is None else targets):
+            if name not in self.stages_:
+                raise KeyError(f"Unknown stage '{name}'")
+            visit(name)
+        return [self.stages_[name] for name in ordered]
+
+    def fingerprint(self, name:str) -> str:
+        """Current fingerprint of stage parameters and inputs.
+
+        Files are fingerprinted by :py:func:`~vsopy.util.file_fingerprint`,
+        directories by all files below them; missing inputs are fingerprinted
+        as such.
+
+        :param name: stage name
+        :type name: str
+        :rtype: str
+        """
+        stage = self.stages_[name]
+        return fingerprint(stage.params, [_path_fingerprint(Path(p)) for p in stage.inputs])
+
+    def is_stale(self, name:str) -> bool:
+        """Whether a stage must be rerun.
+
+        :param name: stage name
+        :type name: str
+        :rtype: bool
+        """
+        stage = self.stages_[name]
+        return (self.state_.get(name) != self.fingerprint(name)
+                or not all(Path(p).exists() for p in stage.outputs))
+
+    def run(self, targets:Iterable[str] | None=None, force:Iterable[str]=(),
+            dry_run:bool=False) -> list[str]:
+        """Run stale stages in dependency order.
+
+        Staleness of a stage is evaluated after its dependencies have run.
+        The state is saved after every completed stage, so a failed run
+        resumes from the failed stage.
+
+        :param targets: names of the stages to bring up to date along with
+                        their dependencies, defaults to None for all stages
+        :type targets: iterable of str, optional
+        :param force: names of the stages to rerun even if up to date
+        :type force: iterable of str, optional
+        :param dry_run: whether to only report the stages to run, defaults
+                        to False; stages depending on a stale stage are
+                        reported as stale
+        :type dry_run: bool, optional
+        :return: names of the stages run (or to run)
+        :rtype: list[str]
+        """
+        force = set(force)
+        run = []
+        for stage in self.order(targets):
+            upstream = dry_run and any(name in run for name in self.dependencies(stage.name))
+            if stage.name not in force and not upstream and not self.is_stale(stage.name):
+                continue
+            run.append(stage.name)
+            if dry_run:
+                continue
+            key = self.fingerprint(stage.name)
+            stage.run()
+            self.state_[stage.name] = key
+            self.save()
+        return run
+
+    def save(self) -> None:
+        """Write the state file."""
+        path = self.state_path_.with_name(self.state_path_.name + '.tmp')
+        with open(path, 'w') as file:
+            json.dump(self.state_, file, indent=4)
+        os.replace(path, self.state_path_)
+
+
+def _path_fingerprint(path:Path) -> Any:
+    if path.is_dir():
+        return [(str(p.relative_to(path)), file_fingerprint(p))
+                for p in sorted(path.rglob('*')) if p.is_file()]
+    if path.exists():
+        return file_fingerprint(path)
+    return None
@@ -0,0 +1,188 @@
+import concurrent.futures as cf
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, NamedTuple
+
+
+class PrefetchStats(NamedTuple):
+    """I/O and waiting times of a prefetched run."""
+    files: int
+    """Number of files read."""
+    bytes: int
+    """Number of bytes read."""
+    read_seconds: float
+    """Total time the I/O threads spent reading, s."""
+    wait_seconds: float
+    """Total time the consumer waited for prefetched tasks, s."""
+    wall_seconds: float
+    """Time since the first task was requested, s."""
+    io_workers: int
+    """Number of I/O threads."""
+
+    @property
+    def io_utilization(self) -> float:
+        """Fraction of the I/O thread capacity spent reading."""
+        capacity = self.wall_seconds * self.io_workers
+        return self.read_seconds / capacity if capacity > 0 else 0.
+
+    @property
+    def stall(self) -> float:
+        """Fraction of the run the consumer was starved of input."""
+        return self.wait_seconds / self.wall_seconds if self.wall_seconds > 0 else 0.
+
+    @property
+    def io_bound(self) -> bool:
+        """Whether reading limited the run.
+
+        A run is I/O-bound if the consumer waited for input for more
+        than a tenth of the run; otherwise prefetching kept up and the
+        compute workers limited the run.
+        """
+        return self.stall > 0.1
+
+
+class Prefetcher:
+    """Warm the page cache with files of upcoming tasks ahead of their processing.
+
+    Files are read by a small thread pool in the order the tasks will be
+    processed, a bounded number of tasks ahead, so that workers (typically
+    processes memory-mapping the same files) find them in the page cache
+    and compute does not wait for slow storage.  The bytes read are
+    discarded, not handed to the workers: workers read the files again,
+    from memory, and prefetching only pays off while the files of the
+    tasks ahead fit in the page cache.  Every file is read once per
+    prefetcher, so master frames shared by many tasks are read once.
+
+    Pass the prefetcher to :py:func:`~vsopy.util.submit_bounded` to keep
+    collecting results while reads are pending.
+    """
+    def __init__(self, paths:Callable[[tuple], Iterable[Any]],
+                 ahead:int=4, max_workers:int=2, block_size:int=1 << 22) -> None:
+        """Create a prefetcher.
+
+        :param paths: callable returning the paths to read for a task;
+                      None items are skipped; it runs in the I/O threads
+        :type paths: callable
+        :param ahead: number of tasks prefetched ahead of the consumer, defaults to 4
+        :type ahead: int, optional
+        :param max_workers: number of I/O threads, defaults to 2
+        :type max_workers: int, optional
+        :param block_size: read block size, bytes, defaults to 4 MiB
+        :type block_size: int, optional
+        """
+        self.paths_ = paths
+        self.ahead_ = max(1, ahead)
+        self.max_workers_ = max_workers
+        self.block_size_ = block_size
+        self.executor_ = cf.ThreadPoolExecutor(max_workers=max_workers,
+                                               thread_name_prefix='prefetch')
+        self.lock_ = threading.Lock()
+        self.seen_:set[str] = set()
+        self.files_ = 0
+        self.bytes_ = 0
+        self.read_seconds_ = 0.
+        self.wait_seconds_ = 0.
+        self.start_:float | None = None
+
+    def __enter__(self) -> 'Prefetcher':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __call__(self, tasks:Iterable[tuple]) -> Iterator[tuple]:
+        """Yield tasks in order once their files are read.
+
+        The generator blocks while the files of the next task are read.
+
+        :param tasks: tasks, consumed lazily
+        :type tasks: iterable of tuple
+        :return: the same tasks
+        :rtype: iterator of tuple
+        """
+        for task, read in self.reads(tasks):
+            wait = time.perf_counter()
+            cf.wait([read])
+            self.add_wait(time.perf_counter() - wait)
+            yield task
+
+    def reads(self, tasks:Iterable[tuple]) -> Iterator[tuple[tuple, cf.Future]]:
+        """Start reading files of tasks ahead; yield tasks with their reads in order.
+
+        The generator never blocks: reads of the next tasks start when a
+        task is taken.  A read future completes once the files of its task
+        are read or failed to read; the worker fails on the same files and
+        reports it, so the future never raises.
+
+        :param tasks: tasks, consumed lazily
+        :type tasks: iterable of tuple
+        :return: (task, read future) pairs
+        :rtype: iterator of tuple
+        """
+        if self.start_ is None:
+            self.start_ = time.perf_counter()
+        tasks = iter(tasks)
+        queue:deque = deque()
+
+        def fill():
+            for task in tasks:
+                queue.append((task, self.executor_.submit(self._prefetch, task)))
+                if len(queue) >= self.ahead_:
+                    break
+
+        fill()
+        while queue:
+            task, read = queue.popleft()
+            fill()
+            yield task, read
+
+    def add_wait(self, seconds:float) -> None:
+        """Account time the consumer waited for reads.
+
+        :param seconds: waiting time, s
+        :type seconds: float
+        """
+        with self.lock_:
+            self.wait_seconds_ += seconds
+
+    @property
+    def stats(self) -> PrefetchStats:
+        """Statistics of the run so far."""
+        wall = 0. if self.start_ is None else time.perf_counter() - self.start_
+        with self.lock_:
+            return PrefetchStats(self.files_, self.bytes_, self.read_seconds_,
+                                 self.wait_seconds_, wall, self.max_workers_)
+
+    def close(self) -> None:
+        """Stop the I/O threads, abandoning pending reads."""
+        self.executor_.shutdown(wait=True, cancel_futures=True)
+
+    def _prefetch(self, task:tuple) -> None:
+        try:
+            for path in self.paths_(task):
+                if path is None:
+                    continue
+                with self.lock_:
+                    if str(path) in self.seen_:
+                        continue
+                    self.seen_.add(str(path))
+                self._read(path)
+        except Exception:
+            pass
+
+    def _read(self, path:Any) -> None:
+        start = time.perf_counter()
+        size = 0
+        block = bytearray(self.block_size_)
+        with open(path, 'rb', buffering=0) as file:
+            while True:
+                count = file.readinto(block)
+                if not count:
+                    break
+                size += count
+        with self.lock_:
+            self.files_ += 1
+            self.bytes_ += size
+            self.read_seconds_ += time.perf_counter() - start
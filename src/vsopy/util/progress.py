@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Callable, Mapping
+from typing import Any, NamedTuple, TextIO
+
+
+class Progress(NamedTuple):
+    """State of a long run."""
+    done: int
+    """Number of completed tasks, failed ones included."""
+    failed: int
+    """Number of failed tasks."""
+    total: int | None
+    """Number of tasks of the run, None if unknown."""
+    elapsed: float
+    """Time since the run started, s."""
+    rate: float
+    """Tasks completed per second over the recent window."""
+    eta: float | None
+    """Estimated time to completion, s; None if unknown."""
+    utilization: float
+    """Fraction of worker capacity spent in timed stages."""
+    stages: dict[str, float]
+    """Total wall time of every stage, s."""
+    errors: dict[str, int]
+    """Number of failures by exception class."""
+
+    def format(self, name:str='tasks') -> str:
+        """One-line human readable summary.
+
+        :param name: name of the tasks, defaults to 'tasks'
+        :type name: str, optional
+        :rtype: str
+        """
+        line = f'{self.done}'
+        if self.total is not None:
+            line += f'/{self.total}'
+            if self.total > 0:
+                line += f' ({self.done / self.total:.0%})'
+        line += f' {name}, {self.rate:.2f}/s'
+        if self.eta is not None:
+            line += f', ETA {_duration(self.eta)}'
+        line += f', elapsed {_duration(self.elapsed)}'
+        busy = sum(self.stages.values())
+        if busy > 0:
+            line += f', workers busy {self.utilization:.0%} (' + ', '.join(
+                f'{stage} {seconds / busy:.0%}' for stage, seconds in self.stages.items()) + ')'
+        if self.failed:
+            line += f'; {self.failed} failed: ' + ', '.join(f'{error} {count}'
+                                                           for error, count in self.errors.items())
+        return line
+
+
+class ProgressReporter:
+    """Track completed tasks of a long run and report progress periodically.
+
+    Completed tasks are counted with their stage times, taken from
+    :py:class:`~vsopy.util.StageMetrics` records, and failures by exception
+    class.  A summary line is printed at most every `interval` seconds and
+    optionally appended as a JSON line to a log for monitoring.  Throughput
+    and ETA are estimated over a rolling window, so they follow changes of
+    pace, e.g. cached frames at the start of a resumed run.
+    """
+    def __init__(self, total:int | None=None, workers:int=1, interval:float=30.,
+                 window:float=120., log:os.PathLike | str | None=None, name:str='tasks',
+                 stream:TextIO | None=None, clock:Callable[[], float]=time.monotonic) -> None:
+        """Start tracking a run.
+
+        :param total: number of tasks, defaults to None if unknown yet, see :py:meth:`add_total`
+        :type total: int, optional
+        :param workers: number of workers running the tasks, defaults to 1
+        :type workers: int, optional
+        :param interval: minimal time between reports, s, defaults to 30;
+                         0 reports every update
+        :type interval: float, optional
+        :param window: time window of the throughput estimate, s, defaults to 120
+        :type window: float, optional
+        :param log: JSON lines file the reports are appended to, defaults to None
+        :type log: path-like, optional
+        :param name: name of the tasks in reports, defaults to 'tasks'
+        :type name: str, optional
+        :param stream: text stream of the reports, defaults to None for standard output
+        :type stream: text file, optional
+        :param clock: monotonic clock, s, defaults to :py:func:`time.monotonic`
+        :type clock: callable, optional
+        """
+        self.total_ = total
+        self.workers_ = max(1, workers)
+        self.interval_ = interval
+        self.window_ = window
+        self.name_ = name
+        self.stream_ = stream
+        self.clock_ = clock
+        self.log_ = None if log is None else open(log, 'a')
+        self.start_ = clock()
+        self.last_report_ = self.start_
+        self.done_ = 0
+        self.failed_ = 0
+        self.stages_:dict[str, float] = {}
+        self.errors_:dict[str, int] = {}
+        self.history_:deque = deque([(self.start_, 0)])
+
+    def __enter__(self) -> 'ProgressReporter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add_total(self, count:int) -> None:
+        """Add tasks discovered during the run.
+
+        :param count: number of new tasks
+        :type count: int
+        """
+        self.total_ = (self.total_ or 0) + count
+
+    def update(self, count:int=1, metrics:Mapping[str, Any] | None=None,
+               error:str | None=None) -> None:
+        """Count completed tasks and report if the interval has passed.
+
+        :param count: number of completed tasks, defaults to 1; 0 only adds
+                      stage times, e.g. of a step shared by many tasks
+        :type count: int, optional
+        :param metrics: stage times of the tasks, keys `<stage>_wall` are
+                        summed, missing (NaN) times skipped; a non-empty
+                        `error` marks the tasks failed
+        :type metrics: dict-like, optional
+        :param error: exception class name if the tasks failed
+        :type error: str, optional
+        """
+        if metrics is not None:
+            for key, value in metrics.items():
+                if key.endswith('_wall') and value == value:
+                    stage = key[:-len('_wall')]
+                    self.stages_[stage] = self.stages_.get(stage, 0.) + float(value)
+            if error is None and metrics.get('error'):
+                error = metrics['error']
+        if error and count:
+            self.failed_ += count
+            self.errors_[error] = self.errors_.get(error, 0) + count
+        self.done_ += count
+        now = self.clock_()
+        self.history_.append((now, self.done_))
+        # keep one point before the window as the start of the estimate
+        while len(self.history_) > 2 and self.history_[1][0] < now - self.window_:
+            self.history_.popleft()
+        if now - self.last_report_ >= self.interval_:
+            self.report()
+
+    @property
+    def progress(self) -> Progress:
+        """Current state of the run."""
+        now = self.clock_()
+        elapsed = now - self.start_
+        since, done = self.history_[0]
+        rate = (self.done_ - done) / (now - since) if now > since else 0.
+        eta = None
+        if self.total_ is not None and rate > 0:
+            eta = max(0, self.total_ - self.done_) / rate
+        busy = sum(self.stages_.values())
+        utilization = busy / (elapsed * self.workers_) if elapsed > 0 else 0.
+        return Progress(self.done_, self.failed_, self.total_, elapsed, rate, eta,
+                        utilization, dict(self.stages_), dict(self.errors_))
+
+    def report(self) -> Progress:
+        """Print the progress and append it to the log.
+
+        :return: the reported progress
+        :rtype: Progress
+        """
+        progress = self.progress
+        self.last_report_ = self.clock_()
+        print(progress.format(self.name_), file=self.stream_ or sys.stdout, flush=True)
+        if self.log_ is not None:
+            self.log_.write(json.dumps(dict(time=time.time(), name=self.name_,
+                                            **progress._asdict())) + '\n')
+            self.log_.flush()
+        return progress
+
+    def close(self) -> None:
+        """Report the final progress and close the log."""
+        self.report()
+        if self.log_ is not None:
+            self.log_.close()
+            self.log_ = None
+
+
+def add_progress_arguments(parser:argparse.ArgumentParser) -> None:
+    """Add the ``--progress`` and ``--progress-log`` options of :py:class:`ProgressReporter`.
+
+    :param parser: parser of the script arguments
+    :type parser: :py:class:`~argparse.ArgumentParser`
+    """
+    parser.add_argument('--progress', type=float, default=30.,
+                        help='Seconds between progress reports (default: 30)')
+    parser.add_argument('--progress-log', type=str, default=None,
+                        help='Append progress reports as JSON lines to this file for monitoring')
+
+
+def _duration(seconds:float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}'
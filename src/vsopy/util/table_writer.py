@@ -0,0 +1,109 @@
+import io
+import os
+from astropy.table import Table
+from pathlib import Path
+
+
+class EcsvWriter:
+    """Incremental writer of an ECSV table.
+
+    Tables with the same columns are appended as they arrive: the header is
+    written with the first non-empty table, and only data lines of the next
+    ones.  Every append is synced to disk, so rows written before a crash are
+    kept and the file is a valid ECSV table at any time.
+
+    An interrupted run is resumed by passing the file size recorded after the
+    last committed append (see :py:attr:`size`): anything written after it
+    is discarded and new rows are appended to the existing file.
+    """
+    def __init__(self, path:os.PathLike | str, overwrite:bool=False,
+                 offset:int | None=None) -> None:
+        """Prepare the writer; a new file is created on the first append.
+
+        :param path: output file path
+        :type path: path-like
+        :param overwrite: whether to replace an existing file, defaults to False
+        :type overwrite: bool, optional
+        :param offset: size of the existing file to resume from, bytes;
+                       defaults to None for a new file
+        :type offset: int, optional
+        :raises OSError: if the file exists, `overwrite` is False and no `offset` is given
+        :raises ValueError: if `offset` is beyond the end of the file
+        """
+        self.path_ = Path(path)
+        self.header_:list[bytes] | None = None
+        self.file_ = None
+        self.rows_ = 0
+        self.size_ = 0
+        if offset:
+            size = self.path_.stat().st_size
+            if offset > size:
+                raise ValueError(f"Offset {offset} is beyond the end of {self.path_} ({size} bytes), "
+                                 "rows recorded as written are missing")
+            self.file_ = open(self.path_, 'r+b')
+            self.header_ = []
+            for line in self.file_:
+                self.header_.append(line)
+                if not line.startswith(b'#'):
+                    break
+            self.file_.truncate(offset)
+            self.file_.seek(offset)
+            self.size_ = offset
+        elif self.path_.exists() and not overwrite:
+            raise OSError(f"File {self.path_} already exists. "
+                          "If you mean to replace it then use the argument \"overwrite=True\".")
+
+    def __enter__(self) -> 'EcsvWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def rows(self) -> int:
+        """Number of rows written by this writer."""
+        return self.rows_
+
+    @property
+    def size(self) -> int:
+        """File size after the last append, bytes."""
+        return self.size_
+
+    def append(self, table:Table) -> None:
+        """Append table rows.
+
+        :param table: table with the same columns, units and metadata as
+                      the tables appended before
+        :type table: :py:class:`~astropy.table.Table`
+        :raises ValueError: if the table header differs from the written one
+        """
+        if len(table) == 0:
+            return
+        text = io.StringIO()
+        table.write(text, format='ascii.ecsv')
+        header, data = _split_header(text.getvalue().encode('utf-8').splitlines(keepends=True))
+        if self.header_ is None:
+            self.file_ = open(self.path_, 'wb')
+            self.file_.writelines(header)
+            self.header_ = header
+            self.size_ = sum(len(line) for line in header)
+        elif header != self.header_:
+            raise ValueError(f"Table columns differ from those written to {self.path_}")
+        self.file_.writelines(data)
+        self.file_.flush()
+        # the size is recorded as committed, e.g. by RunJournal, only once the rows are on disk
+        os.fsync(self.file_.fileno())
+        self.rows_ += len(table)
+        self.size_ += sum(len(line) for line in data)
+
+    def close(self) -> None:
+        """Close the file; nothing is written if no rows were appended."""
+        if self.file_ is not None:
+            self.file_.close()
+            self.file_ = None
+
+
+def _split_header(lines:list[bytes]) -> tuple[list[bytes], list[bytes]]:
+    # comment lines and the line of column names
+    size = next(n for n, line in enumerate(lines) if not line.startswith(b'#')) + 1
+    return lines[:size], lines[size:]
@@ -0,0 +1,97 @@
+import os
+from collections.abc import Container, Iterable
+from pathlib import Path
+from typing import Any
+
+
+class FrameWatcher:
+    """Poll a directory tree for new frame files.
+
+    A file is reported once, after its size is unchanged between two
+    consecutive polls, so frames still being written by the capture
+    software are not picked up.  Polling keeps the watcher independent
+    of the file system and works on network shares.
+    """
+    def __init__(self, directory:os.PathLike | str,
+                 patterns:Iterable[str]=('*.fit', '*.fits', '*.fts'),
+                 known:Iterable[os.PathLike | str]=()) -> None:
+        """Start watching.
+
+        :param directory: root of the watched tree
+        :type directory: path-like
+        :param patterns: file name patterns of frames, defaults to FITS extensions
+        :type patterns: iterable of str, optional
+        :param known: paths already processed, never reported
+        :type known: iterable of path-like, optional
+        """
+        self.directory_ = Path(directory)
+        self.patterns_ = list(patterns)
+        self.known_ = {str(path) for path in known}
+        self.sizes_:dict[str, int] = {}
+
+    def poll(self) -> list[Path]:
+        """Find frames which landed since the previous poll.
+
+        :return: paths of the new complete frames, sorted by name
+        :rtype: list[Path]
+        """
+        landed = []
+        sizes = {}
+        for pattern in self.patterns_:
+            for path in self.directory_.rglob(pattern):
+                name = str(path)
+                if name in self.known_ or not path.is_file():
+                    continue
+                size = path.stat().st_size
+                if size > 0 and self.sizes_.get(name) == size:
+                    landed.append(path)
+                    self.known_.add(name)
+                else:
+                    sizes[name] = size
+        self.sizes_ = sizes
+        return sorted(landed)
+
+
+class BatchTracker:
+    """Track frames of completed batches until all of them are measured.
+
+    A batch is ready once none of its frames is outstanding: frames measured
+    before it was registered, or never submitted, e.g. blacklisted ones,
+    are not waited for.
+    """
+    def __init__(self) -> None:
+        self.waiting_:dict[Any, set] = {}
+
+    def register(self, batch_ids:Iterable[Any], batch_images:Any,
+                 outstanding:Container[Any]) -> None:
+        """Start tracking batches.
+
+        :param batch_ids: identifiers of the completed batches
+        :type batch_ids: iterable
+        :param batch_images: table of `batch_id` and `image_id` of every batch frame
+        :type batch_images: :py:class:`~astropy.table.Table`
+        :param outstanding: identifiers of frames submitted but not measured yet
+        :type outstanding: container
+        """
+        for batch_id in batch_ids:
+            rows = batch_images[batch_images['batch_id'] == batch_id]
+            self.waiting_[batch_id] = {id for id in rows['image_id'] if id in outstanding}
+
+    def discard(self, image_id:Any) -> None:
+        """Mark a frame measured, successfully or not.
+
+        :param image_id: frame identifier
+        """
+        for ids in self.waiting_.values():
+            ids.discard(image_id)
+
+    def ready(self) -> list[Any]:
+        """Stop tracking batches with all frames measured.
+
+        :return: identifiers of the ready batches
+        :rtype: list
+        """
+        ready = [batch_id for batch_id, ids in self.waiting_.items() if not ids]
+        for batch_id in ready:
+            del self.waiting_[batch_id]
+        return ready
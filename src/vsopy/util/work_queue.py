@@ -0,0 +1,354 @@
+import concurrent.futures as cf
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+_node_workers = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY,
+    setup BLOB,
+    lease REAL,
+    heartbeat REAL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    heartbeat REAL,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+CREATE INDEX IF NOT EXISTS tasks_run ON tasks (run, status);
+"""
+
+
+def node_workers() -> int:
+    """Number of queue workers on this node, as started by ``vso-worker -p``.
+
+    :return: the number the running :py:class:`QueueWorker` was created
+             with, 1 outside queue workers
+    :rtype: int
+    """
+    return _node_workers
+
+
+def _connect(path:Path) -> sqlite3.Connection:
+    # connections shared between threads are guarded by their owners
+    connection = sqlite3.connect(path, timeout=60., isolation_level=None,
+                                 check_same_thread=False)
+    connection.executescript(_SCHEMA)
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(runs)')]
+    for column in ('lease', 'heartbeat'):
+        if column not in columns:
+            # queues created before runs were leased
+            connection.execute(f'ALTER TABLE runs ADD COLUMN {column} REAL')
+    return connection
+
+
+class QueueExecutor(cf.Executor):
+    """Executor running tasks on workers pulling them from a shared queue.
+
+    Tasks are stored in an SQLite database, typically on storage shared by
+    the nodes of a cluster, and run by any number of
+    :py:class:`QueueWorker` processes, which may join and leave at any
+    time.  Functions, their arguments and the initializer are pickled, so
+    functions must be importable on the workers, and paths passed to them
+    must be valid on every node.
+
+    Every executor is a separate run in the queue; the tasks of a run are
+    deleted as their results are collected, and the run itself on
+    shutdown.  The executor renews a lease on its run while it waits for
+    results; workers drop the tasks of a run whose lease expired, because
+    its executor died.  The storage must support POSIX file locks.
+    """
+    def __init__(self, path:os.PathLike | str, initializer:Callable | None=None,
+                 initargs:tuple=(), poll_interval:float=0.5, lease:float=60.) -> None:
+        """Start a run in the queue.
+
+        :param path: queue database, created if missing
+        :type path: path-like
+        :param initializer: callable run by a worker before the first task
+                            of the run, defaults to None
+        :type initializer: callable, optional
+        :param initargs: arguments of the initializer
+        :type initargs: tuple, optional
+        :param poll_interval: interval of polling for results, s, defaults to 0.5
+        :type poll_interval: float, optional
+        :param lease: time after the last lease renewal when the run is
+                      considered abandoned, s, defaults to 60
+        :type lease: float, optional
+        """
+        self.path_ = Path(path)
+        self.run_ = uuid.uuid4().hex
+        self.poll_interval_ = poll_interval
+        self.lease_ = lease
+        self.connection_ = _connect(self.path_)
+        self.connection_.execute('INSERT INTO runs (run, setup, lease, heartbeat) VALUES (?, ?, ?, ?)',
+                                 (self.run_, pickle.dumps((initializer, initargs)), lease, time.time()))
+        self.lock_ = threading.Lock()
+        self.futures_:dict[int, cf.Future] = {}
+        self.shutdown_ = False
+        self.wakeup_ = threading.Event()
+        # renews the lease of the run from the start
+        self.collector_ = threading.Thread(target=self._collect, daemon=True, name='queue-collector')
+        self.collector_.start()
+
+    @property
+    def run(self) -> str:
+        """Identifier of the run."""
+        return self.run_
+
+    def submit(self, fn:Callable, /, *args:Any, **kwargs:Any) -> cf.Future:
+        """Queue ``fn(*args, **kwargs)``.
+
+        :raises RuntimeError: if the executor was shut down
+        :rtype: :py:class:`~concurrent.futures.Future`
+        """
+        payload = pickle.dumps((fn, args, kwargs))
+        with self.lock_:
+            if self.shutdown_:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            cursor = self.connection_.execute('INSERT INTO tasks (run, payload) VALUES (?, ?)',
+                                              (self.run_, payload))
+            future:cf.Future = cf.Future()
+            self.futures_[cursor.lastrowid] = future
+        return future
+
+    def shutdown(self, wait:bool=True, *, cancel_futures:bool=False) -> None:
+        """Stop accepting tasks.
+
+        :param wait: whether to wait for the results of queued tasks, defaults to True
+        :type wait: bool, optional
+        :param cancel_futures: whether to remove tasks no worker has started
+                               and cancel their futures, defaults to False
+        :type cancel_futures: bool, optional
+        """
+        with self.lock_:
+            self.shutdown_ = True
+            if cancel_futures:
+                self.connection_.execute('BEGIN IMMEDIATE')
+                rows = self.connection_.execute(
+                    "SELECT id FROM tasks WHERE run = ? AND status = 'pending'", (self.run_,)).fetchall()
+                self.connection_.execute(
+                    "DELETE FROM tasks WHERE run = ? AND status = 'pending'", (self.run_,))
+                self.connection_.execute('COMMIT')
+                for (id,) in rows:
+                    self.futures_.pop(id).cancel()
+            collector = self.collector_
+        self.wakeup_.set()
+        if wait:
+            collector.join()
+            self._finish()
+
+    def _finish(self) -> None:
+        with self.lock_:
+            if self.futures_ or self.connection_ is None:
+                return
+            self.connection_.execute('DELETE FROM tasks WHERE run = ?', (self.run_,))
+            self.connection_.execute('DELETE FROM runs WHERE run = ?', (self.run_,))
+            self.connection_.close()
+            self.connection_ = None
+
+    def _expire(self) -> None:
+        with self.lock_:
+            self.shutdown_ = True
+            futures, self.futures_ = self.futures_, {}
+        for future in futures.values():
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError(f"Run '{self.run_}' expired in the queue"))
+
+    def _collect(self) -> None:
+        connection = _connect(self.path_)
+        renewed = time.monotonic()
+        try:
+            while True:
+                with self.lock_:
+                    if self.shutdown_ and not self.futures_:
+                        break
+                if time.monotonic() - renewed >= self.lease_ / 4:
+                    cursor = connection.execute('UPDATE runs SET heartbeat = ? WHERE run = ?',
+                                                (time.time(), self.run_))
+                    renewed = time.monotonic()
+                    if cursor.rowcount == 0:
+                        # the executor was silent too long and workers deleted the run
+                        self._expire()
+                        break
+                rows = connection.execute(
+                    "SELECT id, status, result FROM tasks "
+                    "WHERE run = ? AND status IN ('done', 'failed')", (self.run_,)).fetchall()
+                for id, status, result in rows:
+                    connection.execute('DELETE FROM tasks WHERE id = ?', (id,))
+                    with self.lock_:
+                        future = self.futures_.pop(id, None)
+                    if future is None or not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        value = pickle.loads(result)
+                    except Exception as e:
+                        status, value = 'failed', e
+                    if status == 'done':
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+                if not rows:
+                    self.wakeup_.wait(self.poll_interval_)
+                    self.wakeup_.clear()
+        finally:
+            connection.close()
+        # after shutdown without waiting
+        self._finish()
+
+
+class QueueWorker:
+    """Worker running tasks pulled from a :py:class:`QueueExecutor` queue.
+
+    A worker runs one task at a time and keeps the state set up by the
+    initializer of a run, e.g. loaded calibration masters, until it pulls
+    a task of another run.  While a task runs, the worker renews its lease
+    on it; a task whose lease expired, because its worker died, is handed
+    to the next worker asking for a task, and the result of the first
+    worker, if it ever completes, is discarded.  Tasks of abandoned runs
+    are deleted rather than run.
+    """
+    def __init__(self, path:os.PathLike | str, name:str | None=None,
+                 lease:float=60., poll_interval:float=1., workers:int=1) -> None:
+        """Connect to a queue.
+
+        :param path: queue database, created if missing
+        :type path: path-like
+        :param name: worker name recorded with claimed tasks, unique in the
+                     queue; defaults to None for host name, process id and
+                     a random suffix
+        :type name: str, optional
+        :param lease: time after the last lease renewal when a running task
+                      is considered abandoned, s, defaults to 60; node clocks
+                      must agree to a fraction of it
+        :type lease: float, optional
+        :param poll_interval: interval of polling for tasks when the queue is empty, s,
+                              defaults to 1
+        :type poll_interval: float, optional
+        :param workers: number of workers on this node sharing its CPUs,
+                        defaults to 1; see :py:func:`node_workers`
+        :type workers: int, optional
+        """
+        self.path_ = Path(path)
+        self.name_ = name if name else f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.lease_ = lease
+        self.poll_interval_ = poll_interval
+        self.connection_ = _connect(self.path_)
+        self.current_run_:str | None = None
+        global _node_workers
+        _node_workers = max(1, workers)
+
+    def claim(self) -> tuple[int, str, bytes] | None:
+        """Claim the oldest pending or abandoned task of a live run.
+
+        Runs whose executor stopped renewing their lease are deleted with their tasks.
+
+        :return: task id, run and payload, None if there is no task
+        :rtype: tuple, optional
+        """
+        now = time.time()
+        self.connection_.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection_.execute(
+                'DELETE FROM tasks WHERE run IN (SELECT run FROM runs WHERE heartbeat + lease < ?) '
+                'OR run NOT IN (SELECT run FROM runs)', (now,))
+            self.connection_.execute('DELETE FROM runs WHERE heartbeat + lease < ?', (now,))
+            row = self.connection_.execute(
+                "SELECT id, run, payload FROM tasks WHERE status = 'pending' "
+                "OR (status = 'running' AND heartbeat < ?) ORDER BY id LIMIT 1",
+                (now - self.lease_,)).fetchone()
+            if row is not None:
+                self.connection_.execute(
+                    "UPDATE tasks SET status = 'running', worker = ?, heartbeat = ? WHERE id = ?",
+                    (self.name_, now, row[0]))
+        finally:
+            self.connection_.execute('COMMIT')
+        return row
+
+    def run(self, idle:float | None=None, max_tasks:int | None=None) -> int:
+        """Run tasks until the queue stays empty or enough tasks are run.
+
+        :param idle: time to wait for a task before returning, s, defaults
+                     to None for waiting forever
+        :type idle: float, optional
+        :param max_tasks: number of tasks to run before returning, defaults
+                          to None for no limit
+        :type max_tasks: int, optional
+        :return: number of tasks run
+        :rtype: int
+        """
+        count = 0
+        last = time.monotonic()
+        while max_tasks is None or count < max_tasks:
+            task = self.claim()
+            if task is None:
+                if idle is not None and time.monotonic() - last > idle:
+                    break
+                time.sleep(self.poll_interval_)
+                continue
+            self.execute(*task)
+            count += 1
+            last = time.monotonic()
+        return count
+
+    def execute(self, id:int, run:str, payload:bytes) -> None:
+        """Run a claimed task and store its result.
+
+        The result is dropped if the task was handed to another worker or
+        deleted meanwhile.
+        """
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._renew, args=(id, stop), daemon=True)
+        heartbeat.start()
+        try:
+            self._setup(run)
+            fn, args, kwargs = pickle.loads(payload)
+            status, value = 'done', fn(*args, **kwargs)
+        except Exception as e:
+            status, value = 'failed', e
+        finally:
+            stop.set()
+            heartbeat.join()
+        try:
+            result = pickle.dumps(value)
+        except Exception as e:
+            status, result = 'failed', pickle.dumps(RuntimeError(f'Unpicklable result: {e}'))
+        self.connection_.execute(
+            "UPDATE tasks SET status = ?, result = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (status, result, id, self.name_))
+
+    def close(self) -> None:
+        self.connection_.close()
+
+    def _setup(self, run:str) -> None:
+        if run == self.current_run_:
+            return
+        row = self.connection_.execute('SELECT setup FROM runs WHERE run = ?', (run,)).fetchone()
+        if row is None:
+            raise RuntimeError(f"Run '{run}' is not in the queue")
+        initializer, initargs = pickle.loads(row[0])
+        if initializer is not None:
+            initializer(*initargs)
+        self.current_run_ = run
+
+    def _renew(self, id:int, stop:threading.Event) -> None:
+        connection = _connect(self.path_)
+        try:
+            while not stop.wait(self.lease_ / 4):
+                connection.execute('UPDATE tasks SET heartbeat = ? WHERE id = ? AND worker = ?',
+                                   (time.time(), id, self.name_))
+        finally:
+            connection.close()
@@ -1,3 +1,4 @@
+import asyncio
 import io
 import unittest
 from unittest.mock import patch
@@ -37,3 +38,11 @@ class AavsoApiTest(unittest.TestCase):
             api.get_chart_by_id('ABCD'),
             ("https://apps.aavso.org/vsp/api/chart/ABCD/?format=json")
         )
+
+    @patch(f"vsopy.data.aavso_api.download_file", mock_download_success)
+    @patch(f"builtins.open", mock_open)
+    def test_download_async(self):
+        api = AavsoApi()
+        uri = AavsoApi.get_vsx_votable.uri(api, 'SX UMa')
+        self.assertEqual(uri, "http://www.aavso.org/vsx/index.php?view=query.votable&ident=SX+UMa")
+        self.assertEqual(asyncio.run(api.fetch_content_async(uri)), uri)
@@ -1,8 +1,9 @@
+import asyncio
 import unittest
 import astropy.units as u
 from astropy.table import QTable
 from astropy.coordinates import SkyCoord
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock
 from vsopy.data import StarData, PersistentTable, AavsoApi, AavsoParser
 
 
@@ -113,6 +114,26 @@ class StarDataTest(unittest.TestCase):
         target = sd.get_target('Polaris')
         self.assertEqual(len(target), 6)
 
+    @patch(f"vsopy.data.star_data.QTable.write")
+    @patch.object(AavsoApi, 'discard')
+    @patch.object(AavsoApi, 'fetch_content_async', new_callable=AsyncMock)
+    @patch.object(AavsoParser, 'parse_vsx_votable')
+    @patch.object(AavsoParser, 'parse_std_fields')
+    def test_prefetch(self, parse_std_fields, parse_vsx_votable, fetch_content_async, discard, mock_write):
+        parse_std_fields.return_value = STD_FIELDS
+        # the API reports errors in the response body
+        parse_vsx_votable.side_effect = RuntimeError('VOTABLE does not contain RESOURCE element')
+        fetch_content_async.side_effect = lambda uri: STAR_CHART if 'chart' in uri else '<error/>'
+        sd = StarData('/home/test')
+        uris = sd.chart_uris('Polaris', 60*u.arcmin, 15*u.mag)
+        self.assertEqual(len(uris), 2)
+
+        self.assertEqual(asyncio.run(sd.prefetch(['Polaris'], 60*u.arcmin, 15*u.mag)), 1)
+        votable_uri = AavsoApi.get_vsx_votable.uri(sd.api_, 'Polaris')
+        discard.assert_called_once_with(votable_uri)
+        self.assertEqual(asyncio.run(StarData('/home/test', cache_web_content=False).prefetch(
+            ['Polaris'], 60*u.arcmin)), 0)
+
     @patch(f"vsopy.data.star_data.QTable.write")
     @patch.object(AavsoApi, 'get_star_chart')
     @patch.object(AavsoApi, 'get_vsx_votable')
@@ -80,4 +80,12 @@ class MeasurePhotometryTest(unittest.TestCase):
         self.assertSequenceEqual(sbp.colnames, ['auid', 'A', 'B'])
         # star3 should not be included in the sequence
         self.assertEqual(len(sbp), 2)
-        assert_array_equal(sbp['auid'], ['star1', 'star2'])
\ No newline at end of file
+        assert_array_equal(sbp['auid'], ['star1', 'star2'])
+    @patch(f"vsopy.phot.batch_data_provider.QTable.read")
+    def test_batch_ids(self, mock_read):
+        mock_read.side_effect = [BATCHES, BATCHES_IMAGES, IMAGES, MEASURED, SEQUENCE]
+        provider = BatchDataProvider(mock_session('/home/test'), batch_ids=[2])
+
+        self.assertEqual(len(provider.batch_band('A')), 0)
+        batch_B = provider.batch_band('B')
+        assert_array_equal(batch_B['batch_id'], [2, 2, 2, 2])
@@ -0,0 +1,190 @@
+import astropy.units as u
+import numpy as np
+import unittest
+
+from astropy.coordinates import SkyCoord
+from astropy.nddata import CCDData
+from astropy.table import QTable
+from photutils.aperture import ApertureStats, SkyCircularAperture, SkyCircularAnnulus
+from photutils.geometry import circular_overlap_grid
+from vsopy.mock import MockImageBuilder, MockStar
+from vsopy.phot import (MaskCache, circular_overlap, measure_apertures, measure_many,
+                        measure_photometry, photometry_table, project_apertures)
+from vsopy.util import Aperture, MagErrDtype
+
+SHAPE = (101, 101)
+PIXEL_SCALE = 1.2 * u.arcsec
+HEADER = dict(EXPTIME=2, GAIN=100, instrume="ZWO CCD ASI533MM Pro")
+STARS = [(50, 50), (20, 30), (75, 22), (33, 80), (90, 90)]
+
+
+def make_image():
+    builder = MockImageBuilder(SHAPE)
+    builder.add_noise(100, 10)
+    for n, pos in enumerate(STARS):
+        builder.add_star(MockStar(1000 + 500 * n, pos, 3, 0.1 * n, 10 * n * u.deg))
+    image = builder.get_image(PIXEL_SCALE, HEADER)
+    image.data[48, 53] = np.nan
+    return image
+
+
+def make_centroids(image):
+    x = np.array([p[0] for p in STARS]) + 0.3
+    y = np.array([p[1] for p in STARS]) - 0.2
+    return QTable(dict(
+        auid=[f'star-{n}' for n in range(len(STARS))],
+        radec2000=image.wcs.pixel_to_world(x, y)
+    ))
+
+
+class CircularOverlapTest(unittest.TestCase):
+
+    def test_matches_photutils(self):
+        rng = np.random.default_rng(1)
+        for r in [0.7, 3.2, 7.5]:
+            phase = rng.uniform(-0.5, 0.5, size=(8, 2))
+            half = int(np.ceil(r)) + 1
+            offsets = np.arange(-half, half + 1)
+            x_edges = np.array([np.append(offsets - 0.5, half + 0.5) - px for px, _ in phase])
+            y_edges = np.array([np.append(offsets - 0.5, half + 0.5) - py for _, py in phase])
+            actual = circular_overlap(x_edges, y_edges, r)
+            for n in range(len(phase)):
+                size = 2 * half + 1
+                expected = circular_overlap_grid(x_edges[n, 0], x_edges[n, -1],
+                                                 y_edges[n, 0], y_edges[n, -1],
+                                                 size, size, r, 1, 1)
+                np.testing.assert_allclose(actual[n], expected, atol=1e-12)
+
+
+class MeasureAperturesTest(unittest.TestCase):
+
+    def test_matches_aperture_stats(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        aperture = Aperture(5, 10, 15)
+        sums = measure_apertures(image,
+                                 project_apertures(image.wcs, centroids['radec2000'], aperture),
+                                 chunk_size=2)
+
+        ap = ApertureStats(CCDData(image), SkyCircularAperture(centroids['radec2000'], r=aperture.r))
+        ann = ApertureStats(CCDData(image), SkyCircularAnnulus(centroids['radec2000'],
+                                                               r_in=aperture.r_in,
+                                                               r_out=aperture.r_out))
+        np.testing.assert_allclose(sums.aperture.sum, ap.sum.value, rtol=1e-10)
+        np.testing.assert_allclose(sums.aperture.sum_err, ap.sum_err.value, rtol=1e-10)
+        np.testing.assert_allclose(sums.aperture.area, ap.sum_aper_area.value, rtol=1e-10)
+        np.testing.assert_allclose(sums.aperture.max, ap.max.value, rtol=1e-10)
+        np.testing.assert_allclose(sums.annulus.mean, ann.mean.value, rtol=1e-10)
+        np.testing.assert_allclose(sums.annulus.sum_err, ann.sum_err.value, rtol=1e-10)
+        np.testing.assert_allclose(sums.annulus.area, ann.sum_aper_area.value, rtol=1e-10)
+        np.testing.assert_allclose(sums.x_centroid, ap.x_centroid, rtol=1e-10)
+        np.testing.assert_allclose(sums.y_centroid, ap.y_centroid, rtol=1e-10)
+
+    def test_threads(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        apertures = project_apertures(image.wcs, centroids['radec2000'], Aperture(5, 10, 15).grid([3, 5]))
+        single = measure_apertures(image, apertures, threads=1)
+        threaded = measure_apertures(image, apertures, threads=3)
+        cached = measure_apertures(image, apertures, cache=MaskCache(apertures), threads=3)
+
+        for expected, actual in zip(single.aperture + single.annulus, threaded.aperture + threaded.annulus):
+            np.testing.assert_array_equal(actual, expected)
+        np.testing.assert_array_equal(threaded.x_centroid, single.x_centroid)
+        np.testing.assert_allclose(cached.aperture.sum, single.aperture.sum, rtol=1e-3)
+
+    def test_outside_image(self):
+        image = make_image()
+        coords = SkyCoord(ra=[0, 3600] * u.arcsec, dec=[0, 3600] * u.arcsec)
+        sums = measure_apertures(image, project_apertures(image.wcs, coords, Aperture(5, 10, 15)))
+        self.assertTrue(np.isfinite(sums.aperture.sum[0]))
+        self.assertTrue(np.isnan(sums.aperture.sum[1]))
+        self.assertTrue(np.isnan(sums.annulus.mean[1]))
+
+
+class MeasurePhotometryEngineTest(unittest.TestCase):
+
+    def test_same_as_aperture_stats(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        aperture = Aperture(5, 10, 15)
+        result = measure_photometry(image, centroids, aperture)
+
+        ap = ApertureStats(CCDData(image), SkyCircularAperture(centroids['radec2000'], r=aperture.r))
+        ann = ApertureStats(CCDData(image), SkyCircularAnnulus(centroids['radec2000'],
+                                                               r_in=aperture.r_in,
+                                                               r_out=aperture.r_out))
+        flux = (ap.sum - ap.sum_aper_area.value * ann.mean) / (HEADER['EXPTIME'] * u.second)
+        self.assertEqual(len(result), len(STARS))
+        np.testing.assert_allclose(result['flux'].value, flux.value, rtol=1e-10)
+        np.testing.assert_allclose(result['M']['mag'].value,
+                                   -2.5 * np.log10(flux.value / 1e6), rtol=1e-6)
+        sky_centroid = SkyCoord(ra=result['sky_ra'], dec=result['sky_dec'])
+        self.assertTrue(np.all(sky_centroid.separation(ap.sky_centroid) < 1e-6 * u.arcsec))
+
+    def test_multiple_apertures(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        apertures = Aperture(5, 10, 15).grid([3, 5, 7])
+        result = measure_photometry(image, centroids, apertures)
+
+        self.assertSequenceEqual(
+            result.colnames, ['auid', 'radec2000', 'r_ap', 'flux', 'snr', 'M', 'peak', 'sky_ra', 'sky_dec'])
+        self.assertEqual(len(result), 3 * len(STARS))
+        for aperture in apertures:
+            single = measure_photometry(image, centroids, aperture)
+            selected = result[result['r_ap'] == aperture.r]
+            np.testing.assert_allclose(selected['flux'].value, single['flux'].value, rtol=1e-12)
+            np.testing.assert_allclose(selected['M']['err'].value, single['M']['err'].value)
+
+    def test_different_annuli(self):
+        image = make_image()
+        with self.assertRaises(ValueError):
+            measure_photometry(image, make_centroids(image), [Aperture(5, 10, 15), Aperture(5, 10, 20)])
+
+    def test_records(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        apertures = Aperture(5, 10, 15).grid([3, 5])
+        table = measure_photometry(image, centroids, apertures, extended=True)
+        records = measure_photometry(image, centroids, apertures, extended=True, records=True)
+
+        self.assertIsInstance(records, np.ndarray)
+        self.assertEqual(records.dtype['M'], np.dtype(MagErrDtype))
+        restored = photometry_table(records, image.unit / u.second)
+        self.assertSequenceEqual(restored.colnames, table.colnames)
+        for name in table.colnames:
+            if name == 'radec2000':
+                self.assertTrue(np.all(restored[name].separation(table[name]) < 1e-6 * u.arcsec))
+            elif name == 'auid':
+                self.assertListEqual(list(restored[name]), list(table[name]))
+            else:
+                self.assertEqual(restored[name].unit, table[name].unit)
+                np.testing.assert_array_equal(restored[name], table[name])
+
+
+class MeasureManyTest(unittest.TestCase):
+
+    def test_cached_masks(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        aperture = Aperture(5, 10, 15)
+        shifted = CCDData(image)
+        shifted.wcs = image.wcs.deepcopy()
+        shifted.wcs.wcs.crpix = shifted.wcs.wcs.crpix + [2, -3]
+
+        pixel_apertures = project_apertures(image.wcs, centroids['radec2000'], aperture)
+        cache = MaskCache(pixel_apertures)
+        measure_apertures(image, pixel_apertures, cache=cache)
+        cached = len(cache)
+        shifted_apertures = project_apertures(shifted.wcs, centroids['radec2000'], aperture)
+        self.assertTrue(cache.matches(shifted_apertures))
+        measure_apertures(shifted, shifted_apertures, cache=cache)
+        self.assertEqual(len(cache), cached)
+
+        result = measure_many([image, shifted], centroids, aperture, ids=[7, 8])
+        self.assertEqual(result.colnames[0], 'image_id')
+        for id, frame in [(7, image), (8, shifted)]:
+            single = measure_photometry(frame, centroids, aperture)
+            np.testing.assert_allclose(result[result['image_id'] == id]['flux'].value,
+                                       single['flux'].value, rtol=1e-3)
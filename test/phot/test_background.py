@@ -0,0 +1,63 @@
+import astropy.units as u
+import numpy as np
+import unittest
+
+from astropy.stats import sigma_clip, sigma_clipped_stats
+from vsopy.mock import MockImageBuilder, MockStar
+from vsopy.phot import (annulus_background, clipped_background, measure_photometry,
+                        project_apertures)
+from vsopy.util import Aperture
+
+from test_aperture_engine import HEADER, PIXEL_SCALE, SHAPE, make_centroids, make_image
+
+
+class ClippedBackgroundTest(unittest.TestCase):
+
+    def test_matches_sigma_clipped_stats(self):
+        rng = np.random.default_rng(5)
+        values = rng.normal(100, 10, size=(6, 200))
+        values[:, :5] += 500
+        values[2, 150:] = np.nan
+        actual = clipped_background(values, 'mean')
+        median = clipped_background(values, 'median')
+        mode = clipped_background(values, 'mode')
+        for n, row in enumerate(values):
+            mean, med, std = sigma_clipped_stats(row[np.isfinite(row)])
+            self.assertAlmostEqual(actual.level[n], mean)
+            self.assertAlmostEqual(median.level[n], med)
+            self.assertAlmostEqual(actual.sigma[n], std)
+            self.assertAlmostEqual(mode.level[n], 3 * med - 2 * mean)
+            self.assertEqual(actual.count[n], np.ma.count(sigma_clip(row[np.isfinite(row)])))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            clipped_background(np.zeros((1, 3)), 'max')
+
+
+class AnnulusBackgroundTest(unittest.TestCase):
+
+    def test_star_in_annulus(self):
+        builder = MockImageBuilder(SHAPE)
+        builder.add_noise(100, 10)
+        builder.add_star(MockStar(5000, (50, 50), 3, 0, 0 * u.deg))
+        builder.add_star(MockStar(20000, (60, 50), 3, 0, 0 * u.deg))
+        image = builder.get_image(PIXEL_SCALE, HEADER)
+        coords = image.wcs.pixel_to_world([50], [50])
+        apertures = project_apertures(image.wcs, coords, Aperture(5, 10, 15))
+
+        clipped = annulus_background(image, apertures, 'median')
+        plain = annulus_background(image, apertures, 'mean', maxiters=0)
+
+        self.assertLess(abs(clipped.level[0] - 100), 2)
+        self.assertGreater(plain.level[0], clipped.level[0] + 5)
+        self.assertLess(abs(clipped.sigma[0] - 10), 2)
+
+    def test_measure_photometry(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        aperture = Aperture(5, 10, 15)
+        plain = measure_photometry(image, centroids, aperture)
+        clipped = measure_photometry(image, centroids, aperture, sky='median')
+        self.assertEqual(len(clipped), len(plain))
+        np.testing.assert_allclose(clipped['flux'].value, plain['flux'].value, rtol=0.05)
+        self.assertFalse(np.all(clipped['flux'] == plain['flux']))
@@ -0,0 +1,88 @@
+import astropy.units as u
+import numpy as np
+import pickle
+import unittest
+
+from astropy.coordinates import SkyCoord
+from vsopy.phot import CentroidCatalog, filter_centroids, measure_photometry
+from vsopy.util import Aperture
+
+from test_aperture_engine import make_centroids, make_image
+
+
+def random_catalog(rng, size, center=(120., 45.), spread=0.05):
+    ra = np.deg2rad(center[0] + rng.uniform(-spread, spread, size))
+    dec = np.deg2rad(center[1] + rng.uniform(-spread, spread, size))
+    return CentroidCatalog(ra, dec, np.arange(size))
+
+
+class CentroidCatalogTest(unittest.TestCase):
+
+    def test_table_roundtrip(self):
+        image = make_image()
+        table = make_centroids(image)
+        catalog = CentroidCatalog.from_table(table)
+        self.assertEqual(len(catalog), len(table))
+        result = catalog.to_table()
+        self.assertListEqual(list(result['auid']), list(table['auid']))
+        np.testing.assert_allclose(result['radec2000'].separation(table['radec2000']).to_value(u.arcsec),
+                                   0, atol=1e-8)
+
+    def test_slice_and_pickle(self):
+        catalog = random_catalog(np.random.default_rng(1), 10)
+        _ = catalog.tree
+        part = catalog[catalog.auid % 2 == 0]
+        self.assertListEqual(list(part.auid), [0, 2, 4, 6, 8])
+        np.testing.assert_array_equal(part.ra, catalog.ra[::2])
+        restored = pickle.loads(pickle.dumps(catalog))
+        self.assertIsNone(restored.tree_)
+        np.testing.assert_array_equal(restored.xyz, catalog.xyz)
+
+    def test_to_pixel(self):
+        image = make_image()
+        table = make_centroids(image)
+        x, y = CentroidCatalog.from_table(table).to_pixel(image.wcs)
+        ex, ey = image.wcs.world_to_pixel(table['radec2000'])
+        np.testing.assert_allclose(x, ex, atol=1e-6)
+        np.testing.assert_allclose(y, ey, atol=1e-6)
+
+    def test_search_around(self):
+        rng = np.random.default_rng(2)
+        a, b = random_catalog(rng, 200), random_catalog(rng, 150)
+        radius = 20 * u.arcsec
+        i, j, sep = a.search_around(b, radius)
+        ei, ej, esep, _ = b.coords.search_around_sky(a.coords, radius)
+        self.assertSetEqual(set(zip(i, j)), set(zip(ei, ej)))
+        order = np.lexsort((j, i))
+        expected = np.lexsort((ej, ei))
+        np.testing.assert_allclose(sep[order].to_value(u.arcsec),
+                                   esep[expected].to_value(u.arcsec), atol=1e-6)
+
+    def test_search_around_empty(self):
+        empty = CentroidCatalog(np.zeros(0), np.zeros(0), np.zeros(0, dtype=int))
+        i, j, sep = empty.search_around(random_catalog(np.random.default_rng(3), 5), 1 * u.arcsec)
+        self.assertEqual(len(i), 0)
+        self.assertEqual(len(sep), 0)
+
+    def test_photometry_with_catalog(self):
+        image = make_image()
+        table = make_centroids(image)
+        catalog = CentroidCatalog.from_table(table)
+        aperture = Aperture(4, 8, 12)
+        expected = measure_photometry(image, table, aperture)
+        actual = measure_photometry(image, catalog, aperture)
+        self.assertListEqual(actual.colnames, expected.colnames)
+        self.assertListEqual(list(actual['auid']), list(expected['auid']))
+        np.testing.assert_allclose(actual['flux'].value, expected['flux'].value)
+
+    def test_filter_centroids_with_catalog(self):
+        image = make_image()
+        table = make_centroids(image)
+        filtered = filter_centroids(image, CentroidCatalog.from_table(table), 5 * u.arcsec)
+        self.assertIsInstance(filtered, CentroidCatalog)
+        self.assertListEqual(list(filtered.auid),
+                             list(filter_centroids(image, table, 5 * u.arcsec)['auid']))
+
+
+if __name__ == '__main__':
+    unittest.main()
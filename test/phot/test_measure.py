@@ -1,12 +1,19 @@
 import astropy.units as u
 import numpy as np
+import os
+import tempfile
 import unittest
 
 from astropy.coordinates import SkyCoord
+from astropy.io import fits
 from astropy.table import QTable
+from pathlib import Path
 from vsopy.mock import MockImageBuilder, MockStar
-from vsopy.phot import measure_photometry, filter_centroids
-from vsopy.util import Aperture
+from vsopy.phot import (PhotometryCache, measure_photometry, filter_centroids, photometry_table,
+                        process_image, process_stack, select_records)
+from vsopy.reduce import FrameBuffer
+from vsopy.reduce.calibration_matcher import Calibration
+from vsopy.util import Aperture, QualitySettings
 
 SHAPE = (31,31)
 NOISE_MEAN = 100
@@ -39,10 +46,34 @@ class MeasurePhotometryTest(unittest.TestCase):
         ph = measure_photometry(image, centroids, Aperture(5, 10, 15))
 
         self.assertSequenceEqual(
-            ph.colnames, ['auid', 'radec2000', 'flux', 'snr', 'M', 'peak', 'sky_centroid'])
+            ph.colnames, ['auid', 'radec2000', 'flux', 'snr', 'M', 'peak', 'sky_ra', 'sky_dec'])
         self.assertEqual(len(ph), 1)
         self.assertEqual(ph['auid'][0], STAR_AUID)
 
+    def test_coadd_noise(self):
+        builder = MockImageBuilder(SHAPE)
+        builder.add_noise(NOISE_MEAN, NOISE_STDDEV)
+        builder.add_star(MockStar(STAR_PEAK, STAR_POS, STAR_FWHM, 0, 0*u.deg))
+        image = builder.get_image(1.2 * u.arcsec,
+                        dict(
+                            EXPTIME=2,
+                            GAIN=100,
+                            instrume="ZWO CCD ASI533MM Pro"
+                        ))
+        image.unit = u.electron
+        centroids = QTable(dict(
+            auid = [STAR_AUID],
+            radec2000 = SkyCoord(ra=[0] * u.arcsec, dec=[0] * u.arcsec)
+        ))
+        single = measure_photometry(image, centroids, Aperture(5, 10, 15))
+        # the same pixels as a sum of two frames: read noise twice, saturation level twice
+        image.header['NCOMBINE'] = 2
+        coadd = measure_photometry(image, centroids, Aperture(5, 10, 15))
+
+        self.assertAlmostEqual(coadd['peak'][0], single['peak'][0] / 2)
+        self.assertLess(coadd['snr'][0], single['snr'][0])
+        self.assertAlmostEqual(coadd['flux'][0].value, single['flux'][0].value)
+
     def test_filter_centroids(self):
 
         builder = MockImageBuilder(SHAPE)
@@ -65,3 +96,188 @@ class MeasurePhotometryTest(unittest.TestCase):
         self.assertSequenceEqual(filtered.colnames, ['auid', 'radec2000'])
         self.assertEqual(len(filtered), 1)
         self.assertEqual(filtered['auid'][0], STAR_AUID)
+
+    def test_filter_centroids_grid(self):
+
+        builder = MockImageBuilder(SHAPE)
+        image = builder.get_image(1.2 * u.arcsec)
+        x, y = np.meshgrid(np.linspace(-5, 35, 41), np.linspace(-5, 35, 41))
+        coords = image.wcs.pixel_to_world(x.ravel(), y.ravel())
+        centroids = QTable(dict(
+            auid = [f'star-{n}' for n in range(len(coords))],
+            radec2000 = coords
+        ))
+
+        filtered = filter_centroids(image, centroids, 3 * u.arcsec)
+
+        fx, fy = image.wcs.world_to_pixel(filtered['radec2000'])
+        self.assertEqual(len(filtered), 26 * 26)
+        self.assertTrue(np.all((fx > 2.5) & (fx < 28.5) & (fy > 2.5) & (fy < 28.5)))
+
+    def test_process_image_failure(self):
+
+        result = process_image('/nonexistent/light.fits', None, None, None, Aperture(5, 10, 15))
+
+        self.assertIsNone(result.photometry)
+        self.assertEqual(result.metrics['error'], 'FileNotFoundError')
+        self.assertEqual(result.metrics['read_bytes'], 0)
+        self.assertFalse(np.isnan(result.metrics['read_wall']))
+        self.assertTrue(np.isnan(result.metrics['solve_wall']))
+
+    def test_process_image_cache(self):
+
+        builder = MockImageBuilder(SHAPE)
+        builder.add_noise(NOISE_MEAN, NOISE_STDDEV)
+        builder.add_star(MockStar(STAR_PEAK, STAR_POS, STAR_FWHM, 0, 0*u.deg))
+        image = builder.get_image(1.2 * u.arcsec)
+        header = fits.Header(dict(EXPTIME=2, GAIN=100, INSTRUME="ZWO CCD ASI533MM Pro"))
+        centroids = QTable(dict(auid=[STAR_AUID], radec2000=SkyCoord(ra=[0] * u.arcsec, dec=[0] * u.arcsec)))
+        solver = lambda path: image.wcs.to_header()
+        measured = []
+
+        def find_centroids(image):
+            measured.append(image)
+            return centroids
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path, dark = Path(tmp) / 'light.fits', Path(tmp) / 'dark.fits'
+            fits.PrimaryHDU((image.data * 16).astype(np.uint16), header=header).writeto(path)
+            dark.write_bytes(b'dark')
+            matcher = type('Matcher', (), dict(
+                match=lambda self, header: Calibration(None, None, None),
+                match_paths=lambda self, header: Calibration(None, dark, None)))()
+            cache = PhotometryCache(tmp, centroids=centroids['auid'].data, aperture=Aperture(5, 10, 15))
+            run = lambda: process_image(path, matcher, solver, find_centroids,
+                                        Aperture(5, 10, 15), FrameBuffer(), cache=cache)
+            first, second = run(), run()
+            os.utime(dark, ns=(0, 0))
+            third = run()
+
+        self.assertEqual(len(measured), 2)
+        self.assertFalse(first.metrics['cached'])
+        self.assertTrue(second.metrics['cached'])
+        self.assertFalse(third.metrics['cached'])
+        self.assertTrue(np.isnan(second.metrics['read_wall']))
+        self.assertSequenceEqual(second.photometry.colnames, first.photometry.colnames)
+        np.testing.assert_array_equal(second.photometry['flux'], first.photometry['flux'])
+        self.assertEqual(second.photometry['flux'].unit, u.electron / u.second)
+
+    def test_process_image_buffer(self):
+
+        builder = MockImageBuilder(SHAPE)
+        builder.add_noise(NOISE_MEAN, NOISE_STDDEV)
+        builder.add_star(MockStar(STAR_PEAK, STAR_POS, STAR_FWHM, 0, 0*u.deg))
+        image = builder.get_image(1.2 * u.arcsec)
+        header = fits.Header(dict(EXPTIME=2, GAIN=100, INSTRUME="ZWO CCD ASI533MM Pro"))
+        centroids = QTable(dict(auid=[STAR_AUID], radec2000=SkyCoord(ra=[0] * u.arcsec, dec=[0] * u.arcsec)))
+        matcher = type('Matcher', (), dict(match=lambda self, header: Calibration(None, None, None)))()
+        solver = lambda path: image.wcs.to_header()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'light.fits'
+            fits.PrimaryHDU((image.data * 16).astype(np.uint16), header=header).writeto(path)
+            results = [process_image(path, matcher, solver, lambda image: centroids,
+                                     Aperture(5, 10, 15), buffer)
+                       for buffer in [None, FrameBuffer()]]
+
+        for result in results:
+            self.assertEqual(result.metrics['error'], '')
+            self.assertEqual(len(result.photometry), 1)
+        np.testing.assert_allclose(results[1].photometry['flux'].value,
+                                   results[0].photometry['flux'].value, rtol=1e-6)
+
+    def test_process_stack(self):
+
+        builder = MockImageBuilder(SHAPE)
+        builder.add_noise(NOISE_MEAN, NOISE_STDDEV)
+        builder.add_star(MockStar(STAR_PEAK, STAR_POS, STAR_FWHM, 0, 0*u.deg))
+        image = builder.get_image(1.2 * u.arcsec)
+        header = fits.Header(dict(EXPTIME=2, GAIN=100, INSTRUME="ZWO CCD ASI533MM Pro"))
+        centroids = QTable(dict(auid=[STAR_AUID], radec2000=SkyCoord(ra=[0] * u.arcsec, dec=[0] * u.arcsec)))
+        matcher = type('Matcher', (), dict(match=lambda self, header: Calibration(None, None, None)))()
+        solver = lambda path: image.wcs.to_header()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [Path(tmp) / f'light{n}.fits' for n in range(3)]
+            for path in paths:
+                fits.PrimaryHDU((image.data * 16).astype(np.uint16), header=header).writeto(path)
+            single = process_image(paths[0], matcher, solver, lambda image: centroids,
+                                   Aperture(5, 10, 15))
+            stacked = process_stack(paths, matcher, solver, lambda image: centroids,
+                                    Aperture(5, 10, 15), FrameBuffer())
+
+        self.assertEqual(stacked.metrics['error'], '')
+        self.assertEqual(stacked.metrics['frames'], 3)
+        self.assertFalse(np.isnan(stacked.metrics['stack_wall']))
+        np.testing.assert_allclose(stacked.photometry['flux'].value,
+                                   single.photometry['flux'].value, rtol=1e-6)
+        self.assertGreater(stacked.photometry['snr'][0], single.photometry['snr'][0])
+
+    def test_process_image_rejected(self):
+
+        builder = MockImageBuilder(SHAPE)
+        builder.add_noise(NOISE_MEAN, NOISE_STDDEV)
+        header = fits.Header(dict(EXPTIME=2, GAIN=100, INSTRUME="ZWO CCD ASI533MM Pro"))
+        solver = lambda path: self.fail('solver must not run for rejected frames')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'light.fits'
+            fits.PrimaryHDU(builder.data.astype(np.uint16), header=header).writeto(path)
+            result = process_image(path, None, solver, None, Aperture(5, 10, 15),
+                                   FrameBuffer(), quality=QualitySettings(dict(min_stars=1, binning=2)))
+            # the cache key needs the solution, so it is looked up after the check
+            matcher = type('Matcher', (), dict(
+                match_paths=lambda self, header: Calibration(None, None, None)))()
+            cache = PhotometryCache(tmp, centroids=np.array([STAR_AUID]), aperture=Aperture(5, 10, 15))
+            cached = process_image(path, matcher, solver, None, Aperture(5, 10, 15), FrameBuffer(),
+                                   quality=QualitySettings(dict(min_stars=1, binning=2)), cache=cache)
+
+        self.assertIsNone(result.photometry)
+        self.assertEqual(result.metrics['error'], 'FrameRejected')
+        self.assertEqual(result.metrics['stars'], 0)
+        self.assertAlmostEqual(result.metrics['background'], NOISE_MEAN, delta=2)
+        self.assertTrue(np.isnan(result.metrics['solve_wall']))
+        self.assertEqual(cached.metrics['error'], 'FrameRejected')
+        self.assertTrue(np.isnan(cached.metrics['cache_wall']))
+
+    def test_process_image_records(self):
+
+        builder = MockImageBuilder(SHAPE)
+        builder.add_noise(NOISE_MEAN, NOISE_STDDEV)
+        builder.add_star(MockStar(STAR_PEAK, STAR_POS, STAR_FWHM, 0, 0*u.deg))
+        image = builder.get_image(1.2 * u.arcsec)
+        header = fits.Header(dict(EXPTIME=2, GAIN=100, INSTRUME="ZWO CCD ASI533MM Pro"))
+        centroids = QTable(dict(auid=[STAR_AUID], radec2000=SkyCoord(ra=[0] * u.arcsec, dec=[0] * u.arcsec)))
+        solver = lambda path: image.wcs.to_header()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path, dark = Path(tmp) / 'light.fits', Path(tmp) / 'dark.fits'
+            fits.PrimaryHDU((image.data * 16).astype(np.uint16), header=header).writeto(path)
+            dark.write_bytes(b'dark')
+            matcher = type('Matcher', (), dict(
+                match=lambda self, header: Calibration(None, None, None),
+                match_paths=lambda self, header: Calibration(None, dark, None)))()
+            cache = PhotometryCache(tmp, centroids=centroids['auid'].data, aperture=Aperture(5, 10, 15))
+            table = process_image(path, matcher, solver, lambda image: centroids, Aperture(5, 10, 15))
+            results = [process_image(path, matcher, solver, lambda image: centroids,
+                                     Aperture(5, 10, 15), cache=cache, records=True)
+                       for _ in range(2)]
+
+        self.assertFalse(results[0].metrics['cached'])
+        self.assertTrue(results[1].metrics['cached'])
+        for result in results:
+            self.assertIsInstance(result.photometry, np.ndarray)
+            np.testing.assert_allclose(result.photometry['flux'], table.photometry['flux'].value)
+
+        compact = select_records(results[0].photometry, ['image_id', 'auid', 'M', 'flux', 'r_ap'],
+                                 image_id=7)
+        self.assertTupleEqual(compact.dtype.names, ('image_id', 'auid', 'M', 'flux'))
+        np.testing.assert_array_equal(compact['image_id'], [7])
+        restored = photometry_table(compact)
+        self.assertEqual(restored['M'].unit, u.mag)
+        self.assertEqual(restored['flux'].unit, u.electron / u.second)
+
+        plain = photometry_table(results[0].photometry, sky_coord=False)
+        self.assertNotIn('radec2000', plain.colnames)
+        self.assertEqual(plain['ra'].unit, u.deg)
+        np.testing.assert_allclose(plain['dec'].value, table.photometry['radec2000'].dec.deg)
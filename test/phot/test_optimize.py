@@ -0,0 +1,64 @@
+import astropy.units as u
+import numpy as np
+import unittest
+
+from astropy.table import QTable
+from vsopy.phot import measure_photometry, optimize_aperture, snr_matrix
+from vsopy.util import Aperture, MagErrDtype
+
+from test_aperture_engine import make_centroids, make_image
+
+
+def make_photometry(snr, mag):
+    """Rows for stars x radii with given SNR (dB) and magnitudes per star."""
+    stars, radii = np.shape(snr)
+    return QTable(dict(
+        image_id=np.repeat(np.arange(stars) % 2, radii),
+        auid=np.repeat([f'star-{n // 2}' for n in range(stars)], radii),
+        r_ap=np.tile(np.arange(1, radii + 1), stars) * 2. * u.arcsec,
+        snr=np.ravel(snr) * u.db,
+        M=np.array(list(zip(np.repeat(mag, radii), np.zeros(stars * radii))), dtype=MagErrDtype) * u.mag,
+    ))
+
+
+class OptimizeApertureTest(unittest.TestCase):
+
+    def test_snr_matrix(self):
+        photometry = make_photometry([[10, 20, 15], [5, 8, 6]], [11., 13.])
+        photometry = photometry[1:]  # first star is incomplete
+        radii, snr, mag = snr_matrix(photometry)
+        np.testing.assert_array_equal(radii, [2, 4, 6])
+        np.testing.assert_array_equal(snr, [[5, 8, 6]])
+        np.testing.assert_array_equal(mag, [13.])
+
+    def test_bins(self):
+        snr = [[10, 14, 15], [11, 14, 14], [8, 7, 5], [9, 8, 4]]
+        photometry = make_photometry(snr, [10., 10.5, 14., 14.5])
+
+        single, = optimize_aperture(photometry)
+        self.assertEqual(single.count, 4)
+        self.assertEqual(single.radius, 4 * u.arcsec)
+        self.assertEqual(single.snr, 11.)
+
+        bright, faint = optimize_aperture(photometry, [12., 20.])
+        self.assertEqual((bright.mag_min, bright.mag_max), (-np.inf, 12.))
+        self.assertEqual(bright.radius, 6 * u.arcsec)
+        self.assertEqual(faint.radius, 2 * u.arcsec)
+        self.assertEqual(faint.count, 2)
+
+    def test_incomplete(self):
+        photometry = make_photometry([[10, 20, 15], [5, 8, 6]], [11., 13.])
+        # no star is measured at every radius
+        self.assertListEqual(optimize_aperture(photometry[[1, 2, 3, 5]]), [])
+
+    def test_measured(self):
+        image = make_image()
+        apertures = Aperture(5, 10, 15).grid([1, 2, 3, 4, 5, 6, 7, 8])
+        photometry = measure_photometry(image, make_centroids(image), apertures)
+        choice, = optimize_aperture(photometry)
+        self.assertGreater(choice.radius, 1 * u.arcsec)
+        self.assertLess(choice.radius, 8 * u.arcsec)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import astropy.units as u
+import numpy as np
+import unittest
+
+from astropy.nddata import CCDData
+from photutils.aperture import ApertureStats, SkyCircularAperture
+from vsopy.phot import measure_photometry, measure_shapes, project_apertures, shape_moments
+from vsopy.util import Aperture
+
+from test_aperture_engine import make_centroids, make_image
+
+
+class ShapeMomentsTest(unittest.TestCase):
+
+    def test_gaussian(self):
+        offsets = np.arange(-15, 16)
+        dy, dx = np.meshgrid(offsets, offsets, indexing='ij')
+        angle = np.deg2rad(30)
+        u_, v_ = dx * np.cos(angle) + dy * np.sin(angle), -dx * np.sin(angle) + dy * np.cos(angle)
+        values = np.exp(-0.5 * (u_**2 / 3.**2 + v_**2 / 2.**2))[np.newaxis]
+        shapes = shape_moments(values, dx, dy)
+        self.assertAlmostEqual(shapes.orientation[0], 30, places=3)
+        self.assertAlmostEqual(shapes.ellipticity[0], 1 - 2. / 3., places=3)
+
+    def test_degenerate(self):
+        values = np.zeros((2, 3, 3))
+        values[0, 1, 1] = 1.
+        offsets = np.arange(-1, 2)
+        shapes = shape_moments(values, offsets[np.newaxis, np.newaxis, :],
+                               offsets[np.newaxis, :, np.newaxis])
+        # a single pixel has the covariance of 1/12 on the diagonal
+        self.assertAlmostEqual(shapes.fwhm[0], 2 * np.sqrt(np.log(2) / 6))
+        self.assertEqual(shapes.ellipticity[0], 0)
+        self.assertTrue(np.isnan(shapes.fwhm[1]))
+
+
+class MeasureShapesTest(unittest.TestCase):
+
+    def test_same_as_aperture_stats(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        for radius in [4, 6]:
+            aperture = Aperture(radius, 10, 15)
+            shapes = measure_shapes(image, project_apertures(image.wcs, centroids['radec2000'], aperture),
+                                    chunk_size=2)
+            stats = ApertureStats(CCDData(image), SkyCircularAperture(centroids['radec2000'], r=aperture.r))
+            np.testing.assert_allclose(shapes.fwhm, stats.fwhm.value, rtol=1e-8)
+            np.testing.assert_allclose(shapes.ellipticity, stats.ellipticity.value, rtol=1e-8, atol=1e-12)
+            np.testing.assert_allclose(shapes.orientation, stats.orientation.value, rtol=1e-8)
+
+    def test_multiple_apertures(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        apertures = Aperture(5, 10, 15).grid([4, 6])
+        shapes = measure_shapes(image, project_apertures(image.wcs, centroids['radec2000'], apertures))
+        self.assertEqual(shapes.fwhm.shape, (len(centroids), 2))
+        for k, aperture in enumerate(apertures):
+            single = measure_shapes(image, project_apertures(image.wcs, centroids['radec2000'], aperture))
+            np.testing.assert_array_equal(shapes.fwhm[:, k], single.fwhm)
+
+    def test_extended_photometry(self):
+        image = make_image()
+        centroids = make_centroids(image)
+        aperture = Aperture(5, 10, 15)
+        result = measure_photometry(image, centroids, aperture, extended=True)
+        stats = ApertureStats(CCDData(image), SkyCircularAperture(centroids['radec2000'], r=aperture.r))
+        self.assertEqual(result['fwhm'].unit, u.pix)
+        self.assertEqual(result['orientation'].unit, u.deg)
+        np.testing.assert_allclose(result['fwhm'].value, stats.fwhm.value, rtol=1e-8)
+        np.testing.assert_allclose(result['orientation'].value, stats.orientation.value, rtol=1e-8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from pathlib import Path
 from unittest.mock import patch, Mock
 from vsopy.reduce import CalibrationMatcher
 from astropy.table import Table
@@ -80,3 +81,9 @@ class CalibrationMatcherTest(unittest.TestCase):
         self.assertIsNone(c.bias)
         self.assertIsNotNone(c.dark)
         self.assertIsNotNone(c.flat)
+        # masters are read once from the calibration directory
+        self.assertListEqual([call.args[0] for call in mock_read.call_args_list],
+                             [Path('home/test/fd1'), Path('home/test/ff1')])
+        header = dict(frame='Light', instrume='Cam1', gain=100, xbinning=1, ybinning=1, offset=10,
+                      filter='', **{'ccd-temp': -10.2, 'date-obs': '2024-07-20T08:00:00', 'exptime': 10})
+        self.assertEqual(m.match_paths(header).dark, Path('home/test/fd1'))
@@ -0,0 +1,66 @@
+import astropy.units as u
+import numpy as np
+import tempfile
+import unittest
+
+from astropy.io import fits
+from astropy.nddata import CCDData, StdDevUncertainty
+from pathlib import Path
+from vsopy.reduce import FrameBuffer, calibrate_image, calibrate_into, read_raw
+
+SHAPE = (300, 40)
+HEADER = dict(EXPTIME=2., GAIN=100, INSTRUME="ZWO CCD ASI533MM Pro")
+
+
+def write_light(path):
+    rng = np.random.default_rng(3)
+    data = rng.integers(100, 60000, size=SHAPE).astype(np.uint16)
+    data[0, 0] = 0
+    hdu = fits.PrimaryHDU(data, header=fits.Header(HEADER))
+    hdu.writeto(path)
+    return data
+
+
+def make_master(value, spread, uncertainty=True):
+    rng = np.random.default_rng(7)
+    data = (value + spread * rng.standard_normal(SHAPE)).astype(np.float32)
+    return CCDData(data, unit=u.electron, meta=fits.Header(dict(EXPTIME=2.)),
+                   uncertainty=StdDevUncertainty(np.full(SHAPE, spread, dtype=np.float32))
+                   if uncertainty else None)
+
+
+class CalibrateIntoTest(unittest.TestCase):
+
+    def check(self, **masters):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'light.fits'
+            write_light(path)
+            expected = calibrate_image(CCDData.read(path, unit='adu'), **masters)
+            raw = read_raw(path)
+            self.assertFalse(raw.data.flags.owndata)
+            buffer = FrameBuffer()
+            actual = calibrate_into(raw, buffer, block_rows=64, **masters)
+            del raw
+
+        self.assertIs(actual.data, buffer.arrays(SHAPE)[0])
+        self.assertEqual(actual.unit, expected.unit)
+        np.testing.assert_allclose(actual.data, expected.data, rtol=1e-6, atol=1e-3)
+        np.testing.assert_allclose(actual.uncertainty.array, expected.uncertainty.array,
+                                   rtol=1e-6, equal_nan=True)
+        for key in ['bias-sub', 'dark-sub', 'flat-sub', 'EXPTIME']:
+            self.assertEqual(actual.header[key], expected.header[key])
+
+    def test_no_masters(self):
+        self.check()
+
+    def test_dark_and_flat(self):
+        self.check(dark=make_master(50, 5), flat=make_master(20000, 100))
+
+    def test_masters_without_uncertainty(self):
+        self.check(dark=make_master(50, 5, False), flat=make_master(20000, 100, False))
+
+    def test_buffer_reuse(self):
+        buffer = FrameBuffer()
+        data, deviation = buffer.arrays(SHAPE)
+        self.assertIs(buffer.arrays(SHAPE)[0], data)
+        self.assertIsNot(buffer.arrays((10, 10))[0], data)
@@ -0,0 +1,64 @@
+import astropy.units as u
+import numpy as np
+import unittest
+
+from astropy.nddata import CCDData, StdDevUncertainty
+from astropy.wcs import WCS
+from vsopy.mock import MockImageBuilder, MockStar
+from vsopy.reduce import CoaddBuilder, coadd_images
+
+SHAPE = (60, 80)
+
+
+def make_frames(shift):
+    builder = MockImageBuilder(SHAPE)
+    builder.add_noise(100, 10)
+    builder.add_star(MockStar(1000, (40, 30), 3, 0, 0 * u.deg))
+    first = builder.get_image(1.2 * u.arcsec, dict(EXPTIME=2.))
+    # same sky, shifted by integer pixels
+    data = np.roll(first.data, shift, axis=(0, 1))
+    second = CCDData(data, unit=first.unit, meta=dict(EXPTIME=3.),
+                     uncertainty=first.uncertainty.__class__(np.roll(first.uncertainty.array, shift, axis=(0, 1))),
+                     wcs=first.wcs.deepcopy())
+    second.wcs.wcs.crpix = second.wcs.wcs.crpix + [shift[1], shift[0]]
+    return first, second
+
+
+class CoaddTest(unittest.TestCase):
+
+    def test_aligned_sum(self):
+        first, second = make_frames((3, -4))
+        coadd = coadd_images([first, second])
+
+        self.assertEqual(coadd.header['EXPTIME'], 5.)
+        self.assertEqual(coadd.header['NCOMBINE'], 2)
+        self.assertEqual(coadd.shape, SHAPE)
+        inner = (slice(5, -5), slice(5, -5))
+        np.testing.assert_allclose(coadd.data[inner], 2 * first.data[inner], rtol=1e-6)
+        np.testing.assert_allclose(coadd.uncertainty.array[inner],
+                                   np.sqrt(2) * first.uncertainty.array[inner], rtol=1e-6)
+        self.assertTrue(np.all(np.isnan(coadd.data[-3:, :])))
+        self.assertTrue(np.all(np.isnan(coadd.data[:, :4])))
+
+    def test_pixel_scale(self):
+        def frame(value, deviation, scale):
+            wcs = WCS(naxis=2)
+            wcs.wcs.ctype = ['RA---TAN', 'DEC--TAN']
+            wcs.wcs.crval = [10., 20.]
+            wcs.wcs.crpix = [(SHAPE[1] + 1) / 2, (SHAPE[0] + 1) / 2]
+            wcs.wcs.cdelt = [-scale / 3600, scale / 3600]
+            return CCDData(np.full(SHAPE, value), unit=u.electron, wcs=wcs, meta=dict(EXPTIME=1.),
+                           uncertainty=StdDevUncertainty(np.full(SHAPE, deviation)))
+
+        # the second frame has pixels twice as large, collecting four times the sky
+        coadd = coadd_images([frame(100., 10., 1.), frame(400., 20., 2.)])
+        inner = (slice(10, -10), slice(10, -10))
+        np.testing.assert_allclose(coadd.data[inner], 200., rtol=1e-6)
+        np.testing.assert_allclose(coadd.uncertainty.array[inner], np.sqrt(10.**2 + (20. / 4)**2),
+                                   rtol=1e-6)
+
+    def test_empty(self):
+        builder = CoaddBuilder()
+        self.assertEqual(len(builder), 0)
+        with self.assertRaises(ValueError):
+            builder.image
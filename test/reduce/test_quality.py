@@ -0,0 +1,56 @@
+import astropy.units as u
+import numpy as np
+import unittest
+
+from vsopy.mock import MockImageBuilder, MockStar
+from vsopy.reduce import FrameRejected, check_quality, frame_quality, subsample
+from vsopy.util import QualitySettings
+
+SHAPE = (200, 240)
+POSITIONS = [(x, y) for x in range(30, 220, 40) for y in range(30, 180, 40)]
+
+
+def make_frame(fwhm, ellipticity=0., noise=(100, 5)):
+    builder = MockImageBuilder(SHAPE)
+    builder.add_noise(*noise)
+    for pos in POSITIONS:
+        builder.add_star(MockStar(3000, pos, fwhm, ellipticity, 30 * u.deg))
+    return builder.data
+
+
+class FrameQualityTest(unittest.TestCase):
+
+    def test_subsample(self):
+        data = np.arange(6 * 9).reshape(6, 9)
+        binned = subsample(data, 3)
+        self.assertEqual(binned.shape, (2, 3))
+        self.assertEqual(binned[0, 0], np.mean(data[:3, :3]))
+
+    def test_round_and_trailed(self):
+        sharp = frame_quality(make_frame(6))
+        wide = frame_quality(make_frame(12))
+        trailed = frame_quality(make_frame(6, 0.5))
+
+        self.assertEqual(sharp.stars, len(POSITIONS))
+        self.assertAlmostEqual(sharp.background, 100, delta=2)
+        self.assertLess(sharp.ellipticity, 0.2)
+        self.assertGreater(wide.fwhm, 1.5 * sharp.fwhm)
+        self.assertGreater(trailed.ellipticity, 0.3)
+
+    def test_raw_scaling(self):
+        data = make_frame(6)
+        raw = (data - 32768).astype(np.int16)
+        scaled = frame_quality(raw, scale=1, offset=32768)
+        self.assertAlmostEqual(scaled.background, frame_quality(data).background, delta=1)
+
+    def test_check(self):
+        quality = frame_quality(make_frame(6, 0.5))
+        settings = QualitySettings(dict(max_ellipticity=0.3, min_stars=5))
+        with self.assertRaisesRegex(FrameRejected, 'ellipticity'):
+            check_quality(quality, settings)
+        check_quality(quality, QualitySettings(dict(min_stars=5)))
+
+        cloudy = frame_quality(np.full(SHAPE, 100.) + np.random.default_rng(1).normal(0, 5, SHAPE))
+        self.assertEqual(cloudy.stars, 0)
+        with self.assertRaisesRegex(FrameRejected, 'stars 0 < 5'):
+            check_quality(cloudy, settings)
@@ -0,0 +1,24 @@
+import tempfile
+import unittest
+
+from astropy.io import fits
+from pathlib import Path
+from vsopy.reduce import read_solution
+
+
+class ReadSolutionTest(unittest.TestCase):
+
+    def test_read_solution(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            solved_dir = Path(tmp)
+            fits.PrimaryHDU(header=fits.Header(dict(CTYPE1='RA---TAN'))).writeto(solved_dir / 'a.wcs')
+            header = read_solution('/images/V/a.fits', solved_dir)
+            self.assertEqual(header['CTYPE1'], 'RA---TAN')
+            # missing solutions are not made
+            with self.assertRaises(RuntimeError):
+                read_solution('/images/V/b.fits', solved_dir)
+            self.assertListEqual(sorted(p.name for p in solved_dir.iterdir()), ['a.wcs'])
+
+
+if __name__ == '__main__':
+    unittest.main()
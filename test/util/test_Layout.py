@@ -1,3 +1,4 @@
+import tempfile
 import unittest
 from unittest.mock import patch
 from pathlib import Path
@@ -74,6 +75,21 @@ class WorkLayoutTest(unittest.TestCase):
         self.assertEqual(str(l.get_session(session).root_dir),
                          str(Path(root) / 'session' / Path(tag) / Path(target)))
 
+    def test_sessions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            l = WorkLayout(tmp)
+            self.assertListEqual(l.sessions(), [])
+            for tag, target in [('19010102', 'Polaris'), ('19010101', 'RR Lyr'), ('19010102', 'Mira')]:
+                l.get_session(Session(tag=tag, name=target)).root_dir
+            (Path(tmp) / 'session' / '19010102' / 'notes.txt').write_text('')
+
+            self.assertListEqual([str(s.rel_path) for s in l.sessions()],
+                                 [str(Path('19010101') / 'RR_Lyr'),
+                                  str(Path('19010102') / 'Mira'),
+                                  str(Path('19010102') / 'Polaris')])
+            self.assertListEqual([s.name for s in l.sessions('19010102')], ['Mira', 'Polaris'])
+            self.assertListEqual(l.sessions('19000101'), [])
+
 class SessionLayoutTest(unittest.TestCase):
 
     def test_layout(self):
@@ -86,6 +102,7 @@ class SessionLayoutTest(unittest.TestCase):
         self.assertEqual(str(l.root_dir),
                          str(Path(root) / Path(tag) / Path(target)))
         self.assertEqual(str(l.solved_dir), str(l.root_dir / 'solved'))
+        self.assertEqual(str(l.photometry_cache_dir), str(l.root_dir / 'cache' / 'photometry'))
         self.assertEqual(str(l.blacklist_file_path), str(l.root_dir / 'blacklist.json'))
         self.assertEqual(str(l.batches_file_path), str(l.root_dir / 'batches.ecsv'))
         self.assertEqual(str(l.batch_images_file_path), str(l.root_dir / 'batch_images.ecsv'))
@@ -95,6 +112,13 @@ class SessionLayoutTest(unittest.TestCase):
         self.assertEqual(str(l.sequence_file_path), str(l.root_dir / 'sequence.ecsv'))
         self.assertEqual(str(l.images_file_path), str(l.root_dir / 'images.ecsv'))
         self.assertEqual(str(l.measured_file_path), str(l.root_dir / 'measured.ecsv'))
+        self.assertEqual(str(l.measured_journal_file_path), str(l.root_dir / 'measured.journal'))
+        self.assertEqual(str(l.blind_partial_file_path), str(l.root_dir / 'blind_partial.ecsv'))
+        self.assertEqual(str(l.blind_journal_file_path), str(l.root_dir / 'blind_partial.journal'))
+        self.assertEqual(str(l.metrics_file_path), str(l.root_dir / 'metrics.ecsv'))
+        self.assertEqual(str(l.transformed_file_path), str(l.root_dir / 'transformed.ecsv'))
+        self.assertEqual(str(l.report_file_path), str(l.root_dir / 'report.txt'))
+        self.assertEqual(str(l.pipeline_file_path), str(l.root_dir / 'pipeline.json'))
         self.assertEqual(str(l.photometry_file_path), str(l.root_dir / 'photometry.ecsv'))
 
 
@@ -1,11 +1,11 @@
 import unittest
 import numpy as np
-from astropy.table import QTable
+from astropy.table import QTable, join
 from astropy.time import Time
 import astropy.units as u
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 from pathlib import Path
-from vsopy.util.SessionImages import session_image_list, batch_session_images
+from vsopy.util.SessionImages import session_image_list, batch_session_images, SessionBatcher, stack_groups
 from unittest.mock import patch, MagicMock, PropertyMock
 
 def mock_dir(name):
@@ -121,4 +121,54 @@ class BatchSessionImagesTest(unittest.TestCase):
         })
 
         assert_array_equal(batch_images['batch_id'], expected_batch_images['batch_id'])
-        assert_array_equal(batch_images['image_id'], expected_batch_images['image_id'])
\ No newline at end of file
+        assert_array_equal(batch_images['image_id'], expected_batch_images['image_id'])
+
+def make_images(filters):
+    size = len(filters)
+    return QTable({
+        'image_id': list(range(1, size + 1)),
+        'filter': filters,
+        'time': Time('2023-10-01T00:00:00') + [10 * n for n in range(size)] * u.second,
+        'exposure': [10] * size * u.second,
+        'airmass': [1.2 + 0.001 * n for n in range(size)],
+        'temperature': [-10.] * size * u.deg_C,
+        'path': [f'image{n + 1}.fits' for n in range(size)],
+    })
+
+class SessionBatcherTest(unittest.TestCase):
+
+    def test_incremental(self):
+        images = make_images(['V', 'R', 'V', 'R', 'R', 'V', 'R', 'V'])
+        batcher = SessionBatcher()
+        completed = [batcher.add(images[n:n+1]) for n in range(len(images))]
+
+        # order is learned when V repeats
+        self.assertListEqual(batcher.order, ['V', 'R'])
+        self.assertListEqual(completed, [[], [], [1], [2], [], [], [3], []])
+        assert_array_equal(batcher.batch_images['image_id'], [1, 2, 3, 4, 6, 7])
+        assert_array_almost_equal(batcher.batches['airmass'], [1.2005, 1.2025, 1.2055])
+
+    def test_order(self):
+        images = make_images(['R', 'V', 'R', 'V', 'R'])
+        batcher = SessionBatcher(['V', 'R'], last_id=10)
+        self.assertListEqual(batcher.add(images), [11, 12])
+        assert_array_equal(batcher.batch_images['image_id'], [2, 3, 4, 5])
+        self.assertListEqual(batcher.add(images[:0]), [])
+
+    def test_stack_groups(self):
+        images = make_images(['V', 'R'] * 5)
+        batcher = SessionBatcher(['V', 'R'])
+        batcher.add(images)
+        batch_images = batcher.batch_images
+        groups = stack_groups(images, batch_images, 2)
+
+        self.assertListEqual(groups, [
+            (2, ['image2.fits', 'image4.fits']), (1, ['image1.fits', 'image3.fits']),
+            (6, ['image6.fits', 'image8.fits']), (5, ['image5.fits', 'image7.fits']),
+            (10, ['image10.fits']), (9, ['image9.fits']),
+        ])
+        # co-adds join the first batch of their group only
+        stacks = QTable(dict(image_id=[id for id, _ in groups]))
+        joined = join(stacks, batch_images, 'image_id')
+        self.assertListEqual(sorted(set(joined['batch_id'])), [1, 3, 5])
+        self.assertEqual(len(joined), len(groups))
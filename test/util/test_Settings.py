@@ -39,6 +39,13 @@ class ApertureTest(unittest.TestCase):
         self.assertEqual(ap2.r_in, 1.0*u.pixel)
         self.assertEqual(ap2.r_out, 1.5*u.pixel)
 
+    def test_grid(self):
+
+        apertures = Aperture(1, 4, 6).grid([2, 3*u.arcsec, 0.05*u.arcmin])
+        self.assertEqual(len(apertures), 3)
+        self.assertEqual([a.r for a in apertures], [2*u.arcsec, 3*u.arcsec, 3*u.arcsec])
+        self.assertTrue(all(a.r_in == 4*u.arcsec and a.r_out == 6*u.arcsec for a in apertures))
+
 class SettingsTest(unittest.TestCase):
 
     DEFAULT_JSON="""
@@ -89,6 +96,15 @@ class SettingsTest(unittest.TestCase):
         s.photometry(('X', 'Y')).set_check('check-star-1')
         self.assertEqual(s.data_["diff_photometry"]["XY"]["check"], 'check-star-1')
 
+    def test_quality_settings(self):
+        s = Settings(None)
+        self.assertFalse(s.quality.enabled)
+        self.assertEqual(s.quality.binning, 4)
+        self.assertIsNone(s.quality.max_fwhm)
+        s.quality.set_max_fwhm(6.5)
+        self.assertTrue(s.quality.enabled)
+        self.assertEqual(s.data_["quality"]["max_fwhm"], 6.5)
+
     @patch('vsopy.util.Settings.Path.exists', return_value=True)
     @patch('builtins.open', new_callable=mock_open, read_data=DEFAULT_JSON)
     def test_load(self, mock_open, mock_exists):
@@ -0,0 +1,65 @@
+import asyncio
+import concurrent.futures as cf
+import unittest
+
+from vsopy.util import gather_bounded, submit_staged
+
+
+def square(x):
+    if x < 0:
+        raise ValueError(x)
+    return x * x
+
+
+class AioTest(unittest.TestCase):
+
+    def test_gather_bounded(self):
+        running = []
+        peak = []
+
+        async def wait(x):
+            running.append(x)
+            peak.append(len(running))
+            await asyncio.sleep(0.01 * (5 - x))
+            running.remove(x)
+            return x
+
+        results = asyncio.run(gather_bounded((wait(x) for x in range(5)), 2))
+        self.assertListEqual(results, list(range(5)))
+        self.assertEqual(max(peak), 2)
+
+        async def fail():
+            raise RuntimeError('solver failed')
+
+        results = asyncio.run(gather_bounded([wait(4), fail()], 1, return_exceptions=True))
+        self.assertEqual(results[0], 4)
+        self.assertIsInstance(results[1], RuntimeError)
+
+    def test_submit_staged(self):
+        prepared = []
+
+        async def prepare(task):
+            await asyncio.sleep(0.001)
+            prepared.append(task)
+            if task == (2,):
+                raise OSError('not solved')
+
+        async def run(executor):
+            results = {}
+            async for (x,), future in submit_staged(executor, square, [(x,) for x in range(-1, 6)],
+                                                    2, prepare=prepare, ahead=1):
+                try:
+                    results[x] = future.result()
+                except ValueError:
+                    results[x] = None
+            return results
+
+        with cf.ThreadPoolExecutor(max_workers=2) as executor:
+            results = asyncio.run(run(executor))
+        # a failed preparation does not stop the task
+        self.assertDictEqual(results, {-1: None, **{x: x * x for x in range(6)}})
+        self.assertEqual(len(prepared), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
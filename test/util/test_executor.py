@@ -0,0 +1,113 @@
+import argparse
+import concurrent.futures as cf
+import tempfile
+import threading
+import unittest
+
+from pathlib import Path
+from unittest import mock
+from vsopy.util import (Prefetcher, QueueWorker, add_executor_arguments, node_workers,
+                        submit_bounded, worker_threads)
+
+
+class SubmitBoundedTest(unittest.TestCase):
+
+    def test_bounded(self):
+        lock = threading.Lock()
+        running = [0, 0]  # current, maximal
+
+        def square(x):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            with lock:
+                running[0] -= 1
+            return x * x
+
+        submitted = []
+
+        def tasks():
+            for x in range(20):
+                submitted.append(x)
+                yield (x,)
+
+        results = {}
+        with cf.ThreadPoolExecutor(max_workers=4) as executor:
+            for (x,), future in submit_bounded(executor, square, tasks(), 3):
+                # never more than 3 tasks submitted ahead of the consumer
+                self.assertLessEqual(len(submitted) - len(results), 3)
+                results[x] = future.result()
+
+        self.assertDictEqual(results, {x: x * x for x in range(20)})
+        self.assertLessEqual(running[1], 3)
+
+    def test_exception(self):
+        def fail(x):
+            raise ValueError(x)
+
+        with cf.ThreadPoolExecutor(max_workers=2) as executor:
+            completed = list(submit_bounded(executor, fail, [(1,), (2,)], 1))
+        self.assertEqual([task for task, _ in completed], [(1,), (2,)])
+        self.assertTrue(all(isinstance(future.exception(), ValueError) for _, future in completed))
+
+    def test_prefetcher(self):
+        released = threading.Event()
+
+        def paths(task):
+            if task[0] == 2:
+                # the read of the third task is stuck until results are collected
+                released.wait(5.)
+            return []
+
+        results = {}
+        with Prefetcher(paths, ahead=3) as prefetcher, \
+             cf.ThreadPoolExecutor(max_workers=2) as executor:
+            for (x,), future in submit_bounded(executor, lambda x: x * x, [(x,) for x in range(4)], 3,
+                                               prefetcher=prefetcher):
+                if x == 2:
+                    # submitted only once its files were read
+                    self.assertTrue(released.is_set())
+                results[x] = future.result()
+                if len(results) == 2:
+                    self.assertFalse(released.is_set())
+                    released.set()
+            stats = prefetcher.stats
+
+        self.assertDictEqual(results, {x: x * x for x in range(4)})
+        self.assertGreater(stats.wait_seconds, 0.)
+
+
+class ExecutorArgumentsTest(unittest.TestCase):
+
+    def test_arguments(self):
+        parser = argparse.ArgumentParser()
+        add_executor_arguments(parser)
+        args = parser.parse_args([])
+        self.assertEqual((args.executor, args.queue, args.threads), ('process', None, None))
+        args = parser.parse_args(['--executor', 'queue', '--queue', 'q.db', '--threads', '2'])
+        self.assertEqual((args.executor, args.queue, args.threads), ('queue', 'q.db', 2))
+
+        parser = argparse.ArgumentParser()
+        add_executor_arguments(parser, threads=False)
+        self.assertFalse(hasattr(parser.parse_args([]), 'threads'))
+
+    def test_worker_threads(self):
+        with mock.patch('os.cpu_count', return_value=16):
+            self.assertEqual(worker_threads(3, 4), 3)
+            self.assertEqual(worker_threads(None, 4), 4)
+            self.assertEqual(worker_threads(None, 32), 1)
+            # queue workers ignore -p of the submitting host
+            self.assertEqual(worker_threads(None, 4, 'queue'), 16)
+            with tempfile.TemporaryDirectory() as tmp:
+                worker = QueueWorker(Path(tmp) / 'queue.db', workers=8)
+                try:
+                    self.assertEqual(node_workers(), 8)
+                    self.assertEqual(worker_threads(None, 4, 'queue'), 2)
+                finally:
+                    worker.close()
+                    QueueWorker(Path(tmp) / 'queue.db').close()
+            self.assertEqual(node_workers(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import numpy as np
+import os
+import tempfile
+import unittest
+
+from astropy.io import fits
+from pathlib import Path
+from vsopy.util import Aperture, file_fingerprint, fingerprint
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def test_values(self):
+        self.assertEqual(fingerprint(1, 'a', [2.5, None]), fingerprint(1, 'a', [2.5, None]))
+        self.assertNotEqual(fingerprint(1), fingerprint('1'))
+        self.assertNotEqual(fingerprint([1, 2]), fingerprint([[1], 2]))
+        self.assertEqual(fingerprint(dict(a=1, b=2)), fingerprint(dict(b=2, a=1)))
+        self.assertEqual(fingerprint(np.arange(3)), fingerprint(np.arange(3)))
+        self.assertNotEqual(fingerprint(np.arange(3)), fingerprint(np.arange(3.)))
+        self.assertEqual(fingerprint(Aperture(5, 10, 15)), fingerprint(Aperture(5, 10, 15)))
+        self.assertNotEqual(fingerprint(Aperture(5, 10, 15)), fingerprint(Aperture(5, 10, 16)))
+        self.assertNotEqual(fingerprint(fits.Header(dict(CRVAL1=1.))),
+                            fingerprint(fits.Header(dict(CRVAL1=1.5))))
+        with self.assertRaises(TypeError):
+            fingerprint(object())
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'light.fits'
+            path.write_bytes(b'data')
+            first = file_fingerprint(path)
+            self.assertEqual(file_fingerprint(str(path)), first)
+            os.utime(path, ns=(0, 0))
+            self.assertNotEqual(file_fingerprint(path), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
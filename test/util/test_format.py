@@ -26,6 +26,20 @@ flux snr   peak  mag_err [mag, err]
 '''
         self.assertEqual(str(formatted_table), EXPECTED.strip())
 
+    def test_sky_centroid_formatting(self):
+        table = QTable()
+        table['sky_ra'] = [10.25, 300.0123456] * u.deg
+        table['sky_dec'] = [-20.5, 40.0000123] * u.deg
+
+        EXPECTED = '''
+  sky_ra   sky_dec\x20
+   deg       deg\x20\x20\x20
+--------- ---------
+ 10.25000 -20.50000
+300.01235  40.00001'''
+        formatted_table = default_table_format(table)
+        self.assertEqual(str(formatted_table), EXPECTED.strip('\n'))
+
     def test_coord_formatting(self):
         table = QTable()
         table['radec2000'] = SkyCoord([[10.25, 20.5] * u.deg, [30.011, 40.0001] * u.deg])
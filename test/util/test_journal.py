@@ -0,0 +1,66 @@
+import numpy as np
+import tempfile
+import unittest
+
+from pathlib import Path
+from vsopy.util import RunJournal
+
+
+class RunJournalTest(unittest.TestCase):
+
+    def test_record(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'run.journal'
+            with RunJournal(path) as journal:
+                journal.record(np.int32(1), path=Path('a.fits'), offset=100)
+                journal.record(2, path='b.fits', reason='no stars', offset=100)
+                journal.record(3, path='c.fits', metrics=dict(fwhm=np.float32(2.5)), offset=250)
+            self.assertEqual(len(path.read_text().splitlines()), 3)
+
+            with RunJournal(path, resume=True) as journal:
+                self.assertEqual(len(journal), 3)
+                self.assertIn(np.int64(1), journal)
+                self.assertNotIn(4, journal)
+                self.assertEqual(journal.offset, 250)
+                entries = list(journal.entries)
+                self.assertEqual(entries[0]['path'], 'a.fits')
+                self.assertEqual(entries[1]['reason'], 'no stars')
+                self.assertAlmostEqual(entries[2]['metrics']['fwhm'], 2.5)
+                journal.record(4, path='d.fits', offset=300)
+
+            with RunJournal(path, resume=True) as journal:
+                self.assertEqual(len(journal), 4)
+                self.assertEqual(journal.offset, 300)
+
+    def test_truncated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'run.journal'
+            with RunJournal(path) as journal:
+                journal.record(1, offset=10)
+            with open(path, 'a') as file:
+                file.write('{"id": 2, "off')
+
+            with RunJournal(path, resume=True) as journal:
+                self.assertEqual(len(journal), 1)
+                self.assertNotIn(2, journal)
+                journal.record(2, offset=20)
+            with RunJournal(path, resume=True) as journal:
+                self.assertEqual([e['id'] for e in journal.entries], [1, 2])
+
+    def test_new_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'run.journal'
+            with RunJournal(path) as journal:
+                journal.record(1, offset=10)
+            with RunJournal(path) as journal:
+                self.assertEqual(len(journal), 0)
+                self.assertEqual(journal.offset, 0)
+                # previous journal is kept until a task is recorded
+                self.assertEqual(len(RunJournal(path, resume=True)), 1)
+                journal.record(2)
+            self.assertEqual(len(RunJournal(path, resume=True)), 1)
+            self.assertIn(2, RunJournal(path, resume=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import astropy.units as u
+import numpy as np
+import unittest
+
+from vsopy.util import StageMetrics, metrics_table
+
+
+class StageMetricsTest(unittest.TestCase):
+
+    def test_stages(self):
+        metrics = StageMetrics(['read', 'measure'])
+        with metrics.stage('read'):
+            sum(range(1000))
+        data = metrics.to_dict()
+        self.assertGreaterEqual(data['read_wall'], 0)
+        self.assertGreaterEqual(data['read_cpu'], 0)
+        self.assertTrue(np.isnan(data['measure_wall']))
+        self.assertFalse(metrics.failed)
+
+    def test_failure(self):
+        metrics = StageMetrics(['read'])
+        with self.assertRaises(ValueError):
+            with metrics.stage('read'):
+                raise ValueError('bad frame')
+        metrics.fail(ValueError('bad frame'))
+        self.assertTrue(metrics.failed)
+        self.assertEqual(metrics['error'], 'ValueError')
+        self.assertEqual(metrics['message'], 'bad frame')
+        self.assertFalse(np.isnan(metrics['read_wall']))
+
+
+class MetricsTableTest(unittest.TestCase):
+
+    def test_table(self):
+        table = metrics_table([dict(image_id=1, read_wall=0.5, read_bytes=100, error=''),
+                               dict(image_id=2, read_wall=0.1, error='OSError')])
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table['read_wall'].unit, u.second)
+        self.assertEqual(table['read_bytes'].unit, u.byte)
+        self.assertTrue(np.isnan(table['read_bytes'][1]))
+        self.assertEqual(table['error'][1], 'OSError')
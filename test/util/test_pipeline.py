@@ -0,0 +1,94 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+from vsopy.util import Pipeline, Stage
+
+
+class PipelineTest(unittest.TestCase):
+
+    def make_pipeline(self, root, calls, params=None):
+        src, mid, out = root / 'src.txt', root / 'mid.txt', root / 'out.txt'
+
+        def stage(name, source, target):
+            def run():
+                calls.append(name)
+                target.write_text(source.read_text() + name)
+            return run
+
+        pipeline = Pipeline(root / 'pipeline.json')
+        # added out of order, ordered by data dependencies
+        pipeline.add(Stage('second', stage('second', mid, out), inputs=[mid], outputs=[out],
+                           params=params))
+        pipeline.add(Stage('first', stage('first', src, mid), inputs=[src], outputs=[mid]))
+        return pipeline
+
+    def test_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pipeline = self.make_pipeline(Path(tmp), [])
+            self.assertListEqual([s.name for s in pipeline.order()], ['first', 'second'])
+            self.assertListEqual([s.name for s in pipeline.order(['first'])], ['first'])
+            self.assertListEqual(pipeline.dependencies('second'), ['first'])
+            with self.assertRaises(KeyError):
+                pipeline.order(['third'])
+            with self.assertRaises(ValueError):
+                pipeline.add(Stage('third', lambda: None, outputs=[Path(tmp) / 'mid.txt']))
+
+    def test_cycle(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            a, b = Path(tmp) / 'a', Path(tmp) / 'b'
+            pipeline = Pipeline(Path(tmp) / 'pipeline.json')
+            pipeline.add(Stage('ab', lambda: None, inputs=[a], outputs=[b]))
+            pipeline.add(Stage('ba', lambda: None, inputs=[b], outputs=[a]))
+            with self.assertRaises(ValueError):
+                pipeline.order()
+
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / 'src.txt').write_text('src')
+            calls = []
+            self.assertListEqual(self.make_pipeline(root, calls).run(), ['first', 'second'])
+            self.assertEqual((root / 'out.txt').read_text(), 'srcfirstsecond')
+
+            # state persists between runs
+            pipeline = self.make_pipeline(root, calls)
+            self.assertListEqual(pipeline.run(dry_run=True), [])
+            self.assertListEqual(pipeline.run(), [])
+            self.assertListEqual(pipeline.run(force=['second']), ['second'])
+
+            # a changed parameter reruns its stage only
+            self.assertListEqual(self.make_pipeline(root, calls, params=dict(r=5)).run(), ['second'])
+
+            # a changed input propagates downstream
+            (root / 'src.txt').write_text('changed')
+            pipeline = self.make_pipeline(root, calls, params=dict(r=5))
+            self.assertListEqual(pipeline.run(dry_run=True), ['first', 'second'])
+            self.assertListEqual(pipeline.run(['first']), ['first'])
+            self.assertTrue(pipeline.is_stale('second'))
+            self.assertListEqual(pipeline.run(), ['second'])
+            self.assertEqual((root / 'out.txt').read_text(), 'changedfirstsecond')
+
+            # a missing output reruns its stage
+            (root / 'out.txt').unlink()
+            self.assertListEqual(pipeline.run(), ['second'])
+            self.assertListEqual(calls, ['first', 'second', 'second', 'second', 'first', 'second', 'second'])
+
+    def test_failure(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            out = root / 'out.txt'
+
+            def fail():
+                raise RuntimeError('failed')
+
+            pipeline = Pipeline(root / 'pipeline.json')
+            pipeline.add(Stage('fail', fail, outputs=[out]))
+            with self.assertRaises(RuntimeError):
+                pipeline.run()
+            self.assertFalse((root / 'pipeline.json').exists())
+            self.assertTrue(pipeline.is_stale('fail'))
+
+
+if __name__ == '__main__':
+    unittest.main()
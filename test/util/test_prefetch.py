@@ -0,0 +1,54 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+from vsopy.util import Prefetcher, PrefetchStats
+
+
+class PrefetcherTest(unittest.TestCase):
+
+    def test_prefetch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            master = root / 'master.fits'
+            master.write_bytes(b'm' * 100)
+            for n in range(6):
+                (root / f'light{n}.fits').write_bytes(b'l' * 10)
+            requested = []
+
+            def paths(task):
+                requested.append(task[0])
+                return [root / f'light{task[0]}.fits', master, None]
+
+            consumed = []
+            with Prefetcher(paths, ahead=2, max_workers=2, block_size=16) as prefetcher:
+                for task in prefetcher((n, 'x') for n in range(6)):
+                    # files of the task were read before it is handed out
+                    self.assertIn(task[0], requested)
+                    self.assertLessEqual(len(requested) - len(consumed), 3)
+                    consumed.append(task)
+            stats = prefetcher.stats
+
+        self.assertListEqual(consumed, [(n, 'x') for n in range(6)])
+        # the shared master is read once
+        self.assertEqual(stats.files, 7)
+        self.assertEqual(stats.bytes, 160)
+        self.assertGreaterEqual(stats.wall_seconds, stats.wait_seconds)
+
+    def test_missing(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with Prefetcher(lambda task: [Path(tmp) / 'missing.fits']) as prefetcher:
+                self.assertListEqual(list(prefetcher([(1,)])), [(1,)])
+            self.assertEqual(prefetcher.stats.files, 0)
+
+    def test_balance(self):
+        self.assertTrue(PrefetchStats(10, 0, 8., 5., 10., 1).io_bound)
+        stats = PrefetchStats(10, 0, 2., 0.5, 10., 2)
+        self.assertFalse(stats.io_bound)
+        self.assertAlmostEqual(stats.io_utilization, 0.1)
+        self.assertAlmostEqual(stats.stall, 0.05)
+        self.assertEqual(PrefetchStats(0, 0, 0., 0., 0., 2).stall, 0.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import argparse
+import io
+import json
+import math
+import tempfile
+import unittest
+
+from pathlib import Path
+from vsopy.util import ProgressReporter, StageMetrics, add_progress_arguments
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+class ProgressReporterTest(unittest.TestCase):
+
+    def test_progress(self):
+        clock = Clock()
+        stream = io.StringIO()
+        reporter = ProgressReporter(total=10, workers=2, interval=30, window=15,
+                                    name='frames', stream=stream, clock=clock)
+        for n in range(4):
+            clock.now += 5
+            reporter.update(metrics=dict(read_wall=1., measure_wall=3., solve_wall=math.nan, error=''))
+        failed = StageMetrics(['read'])
+        failed.fail(RuntimeError('no solution'))
+        clock.now += 5
+        reporter.update(metrics=failed.to_dict())
+        reporter.update(error='OSError')
+
+        progress = reporter.progress
+        self.assertEqual(progress.done, 6)
+        self.assertEqual(progress.failed, 2)
+        self.assertDictEqual(progress.errors, {'RuntimeError': 1, 'OSError': 1})
+        self.assertDictEqual(progress.stages, {'read': 4., 'measure': 12.})
+        self.assertAlmostEqual(progress.utilization, 16. / (25 * 2))
+        # estimated since the last task completed before the window
+        self.assertAlmostEqual(progress.rate, 5 / 20)
+        self.assertAlmostEqual(progress.eta, 4 / (5 / 20))
+        # nothing is printed before the interval
+        self.assertEqual(stream.getvalue(), '')
+
+        clock.now += 10
+        reporter.update()
+        line = stream.getvalue()
+        self.assertTrue(line.startswith('7/10 (70%) frames'))
+        self.assertIn('ETA', line)
+        self.assertIn('read 25%, measure 75%', line)
+        self.assertIn('2 failed: RuntimeError 1, OSError 1', line)
+
+    def test_log(self):
+        clock = Clock()
+        with tempfile.TemporaryDirectory() as tmp:
+            log = Path(tmp) / 'progress.jsonl'
+            with ProgressReporter(interval=0, log=log, stream=io.StringIO(), clock=clock) as reporter:
+                reporter.add_total(2)
+                clock.now += 1
+                reporter.update()
+                reporter.add_total(1)
+                clock.now += 1
+                reporter.update(count=0, metrics=dict(combine_wall=0.5))
+            records = [json.loads(line) for line in log.read_text().splitlines()]
+        # reports of both updates and the final one
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[-1]['done'], 1)
+        self.assertEqual(records[-1]['total'], 3)
+        self.assertDictEqual(records[-1]['stages'], {'combine': 0.5})
+        self.assertIsNone(ProgressReporter(stream=io.StringIO()).progress.eta)
+
+    def test_arguments(self):
+        parser = argparse.ArgumentParser()
+        add_progress_arguments(parser)
+        args = parser.parse_args([])
+        self.assertEqual((args.progress, args.progress_log), (30., None))
+        args = parser.parse_args(['--progress', '5', '--progress-log', 'run.jsonl'])
+        self.assertEqual((args.progress, args.progress_log), (5., 'run.jsonl'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import astropy.units as u
+import numpy as np
+import tempfile
+import unittest
+
+from astropy.table import QTable, vstack
+from pathlib import Path
+from vsopy.util import EcsvWriter, MagErrDtype
+
+
+def make_table(image_id, size):
+    return QTable(dict(
+        image_id=np.full(size, image_id),
+        auid=np.array([f'star-{n}' for n in range(size)], dtype='U10'),
+        M=np.array([(10. + n, 0.01) for n in range(size)], dtype=MagErrDtype) * u.mag,
+        flux=np.arange(size, dtype=float) * u.electron / u.second,
+    ))
+
+
+class EcsvWriterTest(unittest.TestCase):
+
+    def test_append(self):
+        tables = [make_table(1, 3), make_table(2, 0), make_table(3, 2)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'measured.ecsv'
+            with EcsvWriter(path) as writer:
+                writer.append(tables[0])
+                # readable after every append
+                self.assertEqual(len(QTable.read(path)), 3)
+                for table in tables[1:]:
+                    writer.append(table)
+            self.assertEqual(writer.rows, 5)
+            result = QTable.read(path)
+            expected = vstack(tables)
+
+        self.assertSequenceEqual(result.colnames, expected.colnames)
+        self.assertListEqual(list(result['auid']), list(expected['auid']))
+        np.testing.assert_array_equal(result['M']['mag'], expected['M']['mag'])
+        self.assertEqual(result['flux'].unit, u.electron / u.second)
+
+    def test_mismatch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with EcsvWriter(Path(tmp) / 'measured.ecsv') as writer:
+                writer.append(make_table(1, 2))
+                with self.assertRaises(ValueError):
+                    writer.append(make_table(2, 2)['image_id', 'auid'])
+
+    def test_overwrite(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'measured.ecsv'
+            path.write_text('old')
+            with self.assertRaises(OSError):
+                EcsvWriter(path)
+            with EcsvWriter(path, overwrite=True) as writer:
+                writer.append(make_table(1, 1))
+            self.assertEqual(len(QTable.read(path)), 1)
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'measured.ecsv'
+            with EcsvWriter(path) as writer:
+                writer.append(make_table(1, 3))
+                offset = writer.size
+                # rows of an unfinished task
+                writer.append(make_table(2, 2))
+            self.assertEqual(offset, len(path.read_bytes()) - (writer.size - offset))
+            with EcsvWriter(path, offset=offset) as writer:
+                self.assertEqual(writer.size, offset)
+                writer.append(make_table(3, 1))
+                with self.assertRaises(ValueError):
+                    writer.append(make_table(4, 1)['image_id', 'auid'])
+            result = QTable.read(path)
+
+        self.assertListEqual(list(result['image_id']), [1, 1, 1, 3])
+
+    def test_resume_lost_rows(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'measured.ecsv'
+            with EcsvWriter(path) as writer:
+                writer.append(make_table(1, 3))
+            size = path.stat().st_size
+            # the journal recorded more rows than reached the file
+            with self.assertRaises(ValueError):
+                EcsvWriter(path, offset=size + 10)
+            self.assertEqual(path.stat().st_size, size)
+
+
+if __name__ == '__main__':
+    unittest.main()
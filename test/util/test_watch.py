@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+
+from astropy.table import QTable
+from pathlib import Path
+from vsopy.util import BatchTracker, FrameWatcher
+
+
+class FrameWatcherTest(unittest.TestCase):
+
+    def test_poll(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / 'V').mkdir()
+            (root / 'V' / 'old.fits').write_bytes(b'old')
+            watcher = FrameWatcher(root, known=[root / 'V' / 'old.fits'])
+
+            (root / 'V' / 'a.fits').write_bytes(b'partial')
+            (root / 'V' / 'notes.txt').write_bytes(b'text')
+            # reported only once the size settles
+            self.assertListEqual(watcher.poll(), [])
+            (root / 'V' / 'a.fits').write_bytes(b'complete frame')
+            self.assertListEqual(watcher.poll(), [])
+            (root / 'R').mkdir()
+            (root / 'R' / 'b.fit').write_bytes(b'frame')
+            self.assertListEqual(watcher.poll(), [root / 'V' / 'a.fits'])
+            self.assertListEqual(watcher.poll(), [root / 'R' / 'b.fit'])
+            self.assertListEqual(watcher.poll(), [])
+
+
+class BatchTrackerTest(unittest.TestCase):
+
+    def test_ready(self):
+        batch_images = QTable(dict(batch_id=[1, 1, 2, 2, 3], image_id=[1, 2, 3, 4, 5]))
+        tracker = BatchTracker()
+        # frame 2 was measured before, frame 4 blacklisted before: neither is submitted
+        tracker.register([1, 2, 3], batch_images, outstanding={1, 3, 5})
+        self.assertListEqual(tracker.ready(), [])
+        tracker.discard(3)
+        self.assertListEqual(tracker.ready(), [2])
+        tracker.discard(1)
+        tracker.discard(5)
+        self.assertListEqual(tracker.ready(), [1, 3])
+        tracker.register([4], batch_images, outstanding=set())
+        self.assertListEqual(tracker.ready(), [4])
+
+
+if __name__ == '__main__':
+    unittest.main()
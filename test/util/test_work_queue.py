@@ -0,0 +1,175 @@
+import concurrent.futures as cf
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from pathlib import Path
+from vsopy.util import QueueExecutor, QueueWorker, make_executor, submit_bounded
+
+CONTEXT = []
+
+
+def setup(value):
+    CONTEXT.append(value)
+
+
+def scale(x):
+    return CONTEXT[-1] * x
+
+
+def fail(x):
+    raise ValueError(x)
+
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        CONTEXT.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'queue.db'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def start_workers(self, count, **kwargs):
+        def work():
+            worker = QueueWorker(self.path, poll_interval=0.01, **kwargs)
+            try:
+                worker.run(idle=0.5)
+            finally:
+                worker.close()
+        threads = [threading.Thread(target=work) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def test_results(self):
+        with QueueExecutor(self.path, initializer=setup, initargs=(3,), poll_interval=0.01) as executor:
+            threads = self.start_workers(2)
+            results = {}
+            for (x,), future in submit_bounded(executor, scale, [(x,) for x in range(10)], 4):
+                results[x] = future.result()
+            failed = executor.submit(fail, 5)
+            with self.assertRaises(ValueError):
+                failed.result(timeout=10)
+        for thread in threads:
+            thread.join()
+
+        self.assertDictEqual(results, {x: 3 * x for x in range(10)})
+        # the initializer runs once per worker which ran a task
+        self.assertIn(CONTEXT, [[3], [3, 3]])
+        with self.assertRaises(RuntimeError):
+            executor.submit(scale, 1)
+
+    def test_runs(self):
+        # workers switch between runs, initializing each
+        with QueueExecutor(self.path, initializer=setup, initargs=(2,), poll_interval=0.01) as first, \
+             QueueExecutor(self.path, initializer=setup, initargs=(5,), poll_interval=0.01) as second:
+            a = first.submit(scale, 1)
+            b = second.submit(scale, 1)
+            worker = QueueWorker(self.path)
+            self.assertEqual(worker.run(max_tasks=2), 2)
+            worker.close()
+            self.assertEqual(a.result(timeout=10), 2)
+            self.assertEqual(b.result(timeout=10), 5)
+
+    def test_lease(self):
+        with QueueExecutor(self.path, initializer=setup, initargs=(1,), poll_interval=0.01) as executor:
+            future = executor.submit(scale, 7)
+            # a worker dies after claiming the task
+            dead = QueueWorker(self.path, name='dead', lease=0.2)
+            self.assertIsNotNone(dead.claim())
+            dead.close()
+            worker = QueueWorker(self.path, lease=0.2)
+            self.assertIsNone(worker.claim())
+            time.sleep(0.3)
+            self.assertEqual(worker.run(max_tasks=1), 1)
+            worker.close()
+            self.assertEqual(future.result(timeout=10), 7)
+
+    def test_stale_result(self):
+        with QueueExecutor(self.path, initializer=setup, initargs=(1,), poll_interval=0.01) as executor:
+            future = executor.submit(scale, 7)
+            slow = QueueWorker(self.path, name='slow', lease=0.2)
+            task = slow.claim()
+            time.sleep(0.3)
+            # the task is handed over while the first worker still runs it
+            worker = QueueWorker(self.path, name='fast', lease=0.2)
+            self.assertEqual(worker.claim(), task)
+            CONTEXT.append(100)
+            slow.execute(*task)
+            with sqlite3.connect(self.path) as connection:
+                row = connection.execute('SELECT status, worker FROM tasks WHERE id = ?',
+                                         (task[0],)).fetchone()
+            self.assertEqual(row, ('running', 'fast'))
+            CONTEXT.append(1)
+            worker.execute(*task)
+            self.assertEqual(future.result(timeout=10), 7)
+            slow.close()
+            worker.close()
+
+    def test_abandoned_run(self):
+        with QueueExecutor(self.path, initializer=setup, initargs=(1,), poll_interval=0.01) as executor:
+            future = executor.submit(scale, 2)
+            with sqlite3.connect(self.path) as connection:
+                # the executor of another run died a while ago
+                connection.execute("INSERT INTO runs (run, setup, lease, heartbeat) "
+                                   "VALUES ('dead', NULL, 1, ?)", (time.time() - 10,))
+                connection.execute("INSERT INTO tasks (id, run, payload) VALUES (0, 'dead', x'00')")
+            worker = QueueWorker(self.path)
+            self.assertEqual(worker.run(max_tasks=1), 1)
+            self.assertIsNone(worker.claim())
+            worker.close()
+            self.assertEqual(future.result(timeout=10), 2)
+            with sqlite3.connect(self.path) as connection:
+                self.assertEqual(connection.execute(
+                    "SELECT COUNT(*) FROM runs WHERE run = 'dead'").fetchone()[0], 0)
+
+    def test_expired_run(self):
+        executor = QueueExecutor(self.path, poll_interval=0.01, lease=0.2)
+        future = executor.submit(scale, 1)
+        with sqlite3.connect(self.path) as connection:
+            # workers deleted the run while the executor was silent
+            connection.execute('DELETE FROM runs')
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=10)
+        with self.assertRaises(RuntimeError):
+            executor.submit(scale, 1)
+        executor.shutdown()
+
+    def test_shutdown_nowait(self):
+        executor = QueueExecutor(self.path, poll_interval=0.01)
+        executor.shutdown(wait=False)
+        executor.collector_.join(timeout=10)
+        with sqlite3.connect(self.path) as connection:
+            self.assertEqual(connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0], 0)
+
+    def test_cancel(self):
+        executor = QueueExecutor(self.path, poll_interval=0.01)
+        futures = [executor.submit(scale, x) for x in range(3)]
+        executor.shutdown(cancel_futures=True)
+        self.assertTrue(all(future.cancelled() for future in futures))
+        worker = QueueWorker(self.path)
+        self.assertIsNone(worker.claim())
+        worker.close()
+
+    def test_make_executor(self):
+        with make_executor('thread', max_workers=2) as executor:
+            self.assertIsInstance(executor, cf.ThreadPoolExecutor)
+            self.assertEqual(executor.submit(pow, 2, 3).result(), 8)
+        with make_executor('process', max_workers=1) as executor:
+            self.assertIsInstance(executor, cf.ProcessPoolExecutor)
+        with make_executor('queue', queue=self.path) as executor:
+            self.assertIsInstance(executor, QueueExecutor)
+        self.assertTrue(os.path.exists(self.path))
+        with self.assertRaises(ValueError):
+            make_executor('queue')
+        with self.assertRaises(ValueError):
+            make_executor('cluster')
+
+
+if __name__ == '__main__':
+    unittest.main()